@@ -0,0 +1,144 @@
+"""
+Agendador alinhado ao fechamento dos candles.
+Calcula o próximo fechamento de cada timeframe (múltiplos do intervalo desde
+a época, em UTC) e desperta exatamente nele, mais uma pequena folga para a
+corretora consolidar o candle, informando só os timeframes (e seus ativos)
+cujo candle fechou. Vários timeframes podem ser agendados no mesmo processo.
+"""
+
+import asyncio
+import time
+
+import pandas as pd
+from config import FLUXO_CONFIG
+
+
+def passo_ms(timeframe):
+    """
+    Duração de um candle do timeframe, em ms.
+
+    Args:
+        timeframe (str): Intervalo dos candles (ex.: '15min', '1h')
+
+    Returns:
+        int: Duração em ms
+    """
+    return int(pd.Timedelta(timeframe).total_seconds() * 1000)
+
+
+def proximo_fechamento(timeframe, agora_ms=None):
+    """
+    Instante (ms) do próximo fechamento de candle do timeframe.
+
+    Args:
+        timeframe (str): Intervalo dos candles
+        agora_ms (float, optional): Instante de referência (padrão: agora)
+
+    Returns:
+        int: Próximo múltiplo do intervalo, estritamente após 'agora_ms'
+    """
+    passo = passo_ms(timeframe)
+    agora_ms = time.time() * 1000 if agora_ms is None else agora_ms
+    return (int(agora_ms) // passo + 1) * passo
+
+
+class AgendadorFechamentos:
+    """
+    Agenda o despertar no fechamento dos candles de um ou mais timeframes.
+
+    Cada fechamento é informado uma única vez. Se o processo ficar parado
+    por mais de um candle, só o fechamento mais recente de cada timeframe é
+    informado; quem consome deve buscar os candles desde o último recebido.
+
+    Attributes:
+        assinaturas (dict): Timeframe -> lista de ativos
+        folga (float): Segundos de espera após o fechamento
+    """
+
+    def __init__(self, assinaturas, folga=None):
+        """
+        Inicializa o agendador a partir do instante atual.
+
+        Args:
+            assinaturas (dict): Timeframe -> lista de ativos
+            folga (float, optional): Segundos após o fechamento (padrão:
+                FLUXO_CONFIG['folga_fechamento'])
+        """
+        self.assinaturas = {timeframe: list(simbolos) for timeframe, simbolos in assinaturas.items()}
+        self.folga = FLUXO_CONFIG['folga_fechamento'] if folga is None else folga
+        self._passos = {timeframe: passo_ms(timeframe) for timeframe in self.assinaturas}
+        # Fechamentos anteriores à criação (mesmo dentro da folga) não são informados
+        agora_ms = time.time() * 1000
+        self._ultimo = {timeframe: int(agora_ms) // passo * passo for timeframe, passo in self._passos.items()}
+
+    def _agora_ms(self):
+        """Instante atual descontada a folga, em ms."""
+        return time.time() * 1000 - self.folga * 1000
+
+    def espera(self):
+        """
+        Segundos até o próximo despertar (fechamento mais próximo + folga).
+
+        Returns:
+            float: Segundos, nunca negativo
+        """
+        proximo = min(self._ultimo[tf] + passo for tf, passo in self._passos.items())
+        return max((proximo - self._agora_ms()) / 1000, 0.0)
+
+    def vencidos(self):
+        """
+        Fechamentos ocorridos desde a última consulta, já descontada a folga.
+
+        Returns:
+            list: Um dicionário por timeframe que fechou, com 'timeframe',
+                'simbolos', 'fechamento' (ms) e 'candle' (timestamp de
+                abertura, em ms, do candle que fechou)
+        """
+        agora_ms = self._agora_ms()
+        fechados = []
+        for timeframe, passo in self._passos.items():
+            fechamento = int(agora_ms) // passo * passo
+            if fechamento > self._ultimo[timeframe]:
+                self._ultimo[timeframe] = fechamento
+                fechados.append({'timeframe': timeframe, 'simbolos': self.assinaturas[timeframe],
+                                 'fechamento': fechamento, 'candle': fechamento - passo})
+        return fechados
+
+    def aguardar(self, parar=None):
+        """
+        Bloqueia até o próximo fechamento (mais a folga).
+
+        Args:
+            parar (threading.Event, optional): Interrompe a espera quando sinalizado
+
+        Returns:
+            list: Fechamentos ocorridos (ver vencidos); vazia se interrompido
+        """
+        while parar is None or not parar.is_set():
+            espera = self.espera()
+            if espera > 0:
+                if parar is None:
+                    time.sleep(espera)
+                elif parar.wait(espera):
+                    break
+            fechados = self.vencidos()
+            if fechados:
+                return fechados
+        return []
+
+    async def aguardar_async(self, parar=None):
+        """
+        Versão assíncrona de aguardar.
+
+        A espera é feita em trechos de até 1 s para que 'parar' seja
+        percebido sem atraso.
+        """
+        while parar is None or not parar.is_set():
+            espera = self.espera()
+            if espera > 0:
+                await asyncio.sleep(min(espera, 1.0))
+                continue
+            fechados = self.vencidos()
+            if fechados:
+                return fechados
+        return []
@@ -0,0 +1,316 @@
+"""
+Agendador das requisições à corretora.
+Aplica limite de taxa por endpoint (token bucket), repete GETs idempotentes
+após falhas transitórias com backoff exponencial limitado e jitter, e abre um
+disjuntor (circuit breaker) quando a corretora falha seguidamente, para que o
+robô não insista em uma API fora do ar. Expõe métricas de fila, retentativas
+e latência por endpoint.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+from logger import logger
+from config import AGENDADOR_CONFIG
+
+# Status HTTP tratados como falha transitória
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+class CircuitoAberto(ConnectionError):
+    """
+    Requisição recusada porque o disjuntor está aberto.
+
+    Attributes:
+        espera (float): Segundos até o disjuntor aceitar uma nova tentativa
+    """
+
+    def __init__(self, espera):
+        super().__init__(f"Disjuntor aberto; nova tentativa em {espera:.1f}s")
+        self.espera = espera
+
+
+class BaldeTokens:
+    """
+    Limite de taxa por token bucket.
+
+    Cada requisição reserva um token; se o balde estiver vazio, a reserva fica
+    negativa e a chamada espera o tempo de reposição, o que mantém a ordem de
+    chegada entre threads.
+
+    Attributes:
+        taxa (float): Tokens repostos por segundo
+        capacidade (float): Tamanho máximo do balde (rajada)
+    """
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade)
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """
+        Reserva um token.
+
+        Returns:
+            float: Segundos a esperar antes de usar o token
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            self._tokens -= 1.0
+            return max(-self._tokens / self.taxa, 0.0)
+
+
+class Disjuntor:
+    """
+    Disjuntor de falhas consecutivas.
+
+    'fechado': requisições passam. Após 'limite_falhas' falhas transitórias
+    seguidas, fica 'aberto' e recusa tudo por 'tempo_recuperacao' segundos;
+    então passa a 'semi_aberto' e libera uma única requisição de teste, cujo
+    resultado fecha ou reabre o disjuntor.
+
+    Attributes:
+        limite_falhas (int): Falhas seguidas que abrem o disjuntor
+        tempo_recuperacao (float): Segundos em aberto antes do teste
+        estado (str): 'fechado', 'aberto' ou 'semi_aberto'
+        falhas_consecutivas (int): Falhas desde o último sucesso
+        aberturas (int): Vezes que o disjuntor abriu
+    """
+
+    def __init__(self, limite_falhas, tempo_recuperacao):
+        self.limite_falhas = limite_falhas
+        self.tempo_recuperacao = tempo_recuperacao
+        self.estado = 'fechado'
+        self.falhas_consecutivas = 0
+        self.aberturas = 0
+        self._aberto_em = 0.0
+        self._testando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Verifica se uma requisição pode ser enviada.
+
+        Raises:
+            CircuitoAberto: Se o disjuntor estiver aberto ou já houver uma
+                requisição de teste em andamento
+        """
+        with self._lock:
+            if self.estado == 'fechado':
+                return
+            espera = self._aberto_em + self.tempo_recuperacao - time.monotonic()
+            if self.estado == 'aberto' and espera <= 0:
+                self.estado = 'semi_aberto'
+                self._testando = False
+            if self.estado == 'semi_aberto' and not self._testando:
+                self._testando = True
+                return
+            raise CircuitoAberto(max(espera, 0.0))
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self.estado != 'fechado':
+                logger.info("Disjuntor da corretora fechado")
+            self.estado = 'fechado'
+            self.falhas_consecutivas = 0
+            self._testando = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas_consecutivas += 1
+            if self.estado == 'semi_aberto' or self.falhas_consecutivas >= self.limite_falhas:
+                if self.estado != 'aberto':
+                    self.aberturas += 1
+                    logger.warning(f"Disjuntor da corretora aberto após {self.falhas_consecutivas} "
+                                   f"falhas seguidas; nova tentativa em {self.tempo_recuperacao}s")
+                self.estado = 'aberto'
+                self._aberto_em = time.monotonic()
+                self._testando = False
+
+
+def _transitoria(erro):
+    """
+    Indica se uma exceção de requisição é transitória (vale repetir).
+    """
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(erro, requests.HTTPError) and erro.response is not None:
+        return erro.response.status_code in STATUS_TRANSITORIOS
+    return False
+
+
+def _retry_after(erro):
+    """
+    Segundos pedidos pelo cabeçalho Retry-After de uma resposta 429/503, se houver.
+    """
+    resposta = getattr(erro, 'response', None)
+    try:
+        return float(resposta.headers['Retry-After'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AgendadorRequisicoes:
+    """
+    Agendador de requisições com limite de taxa, retentativas e disjuntor.
+
+    Attributes:
+        limites (dict): Endpoint -> (taxa por segundo, rajada); a chave
+            'padrao' vale para os endpoints não listados
+        tentativas (int): Máximo de tentativas de uma requisição idempotente
+        backoff_base (float): Espera base da primeira retentativa, em segundos
+        backoff_max (float): Teto da espera entre tentativas
+        disjuntor (Disjuntor): Estado do disjuntor da corretora
+    """
+
+    def __init__(self, limites=None, tentativas=None, backoff_base=None, backoff_max=None,
+                 limite_falhas=None, tempo_recuperacao=None):
+        """
+        Inicializa o agendador; parâmetros omitidos vêm de AGENDADOR_CONFIG.
+
+        Args:
+            limites (dict, optional): Endpoint -> (taxa por segundo, rajada)
+            tentativas (int, optional): Máximo de tentativas dos GETs
+            backoff_base (float, optional): Espera base entre tentativas
+            backoff_max (float, optional): Teto da espera entre tentativas
+            limite_falhas (int, optional): Falhas seguidas que abrem o disjuntor
+            tempo_recuperacao (float, optional): Segundos em aberto antes do teste
+        """
+        self.limites = dict(AGENDADOR_CONFIG['limites'], **(limites or {}))
+        self.tentativas = tentativas or AGENDADOR_CONFIG['tentativas']
+        self.backoff_base = backoff_base or AGENDADOR_CONFIG['backoff_base']
+        self.backoff_max = backoff_max or AGENDADOR_CONFIG['backoff_max']
+        self.disjuntor = Disjuntor(limite_falhas or AGENDADOR_CONFIG['limite_falhas'],
+                                   tempo_recuperacao or AGENDADOR_CONFIG['tempo_recuperacao'])
+        self._baldes = {}
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        """
+        Balde e métricas de um endpoint, criados no primeiro uso.
+        """
+        with self._lock:
+            if endpoint not in self._baldes:
+                taxa, rajada = self.limites.get(endpoint, self.limites['padrao'])
+                self._baldes[endpoint] = BaldeTokens(taxa, rajada)
+                self._metricas[endpoint] = {
+                    'requisicoes': 0, 'falhas': 0, 'retentativas': 0, 'recusadas': 0,
+                    'fila': 0, 'fila_max': 0, 'espera_fila': 0.0,
+                    'latencias': deque(maxlen=AGENDADOR_CONFIG['janela_latencias'])
+                }
+            return self._baldes[endpoint], self._metricas[endpoint]
+
+    def _backoff(self, tentativa):
+        """
+        Espera antes da tentativa seguinte (full jitter sobre o exponencial limitado).
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativa))
+
+    def executar(self, endpoint, funcao, idempotente=False):
+        """
+        Executa uma requisição respeitando o limite de taxa e o disjuntor.
+
+        Falhas transitórias (conexão, timeout, HTTP 429 e 5xx) de requisições
+        idempotentes são repetidas até 'tentativas' vezes, com espera
+        aleatória entre 0 e min(backoff_max, backoff_base * 2^n), ou o
+        Retry-After da resposta quando maior. Requisições não idempotentes
+        (ex.: ordens) são enviadas uma única vez.
+
+        Args:
+            endpoint (str): Caminho do endpoint (ex.: '/position')
+            funcao (callable): Envia a requisição e devolve a resposta; é
+                chamada de novo a cada tentativa
+            idempotente (bool): Se a requisição pode ser repetida
+
+        Returns:
+            Resultado de 'funcao'
+
+        Raises:
+            CircuitoAberto: Se o disjuntor recusar a requisição
+        """
+        balde, metricas = self._endpoint(endpoint)
+        tentativas = self.tentativas if idempotente else 1
+
+        for tentativa in range(tentativas):
+            try:
+                self.disjuntor.permitir()
+            except CircuitoAberto:
+                with self._lock:
+                    metricas['recusadas'] += 1
+                raise
+
+            espera = balde.reservar()
+            if espera > 0:
+                with self._lock:
+                    metricas['fila'] += 1
+                    metricas['fila_max'] = max(metricas['fila_max'], metricas['fila'])
+                    metricas['espera_fila'] += espera
+                time.sleep(espera)
+                with self._lock:
+                    metricas['fila'] -= 1
+
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao()
+            except Exception as e:
+                with self._lock:
+                    metricas['requisicoes'] += 1
+                    metricas['falhas'] += 1
+                    metricas['latencias'].append(time.perf_counter() - inicio)
+                if not _transitoria(e):
+                    self.disjuntor.registrar_sucesso()
+                    raise
+                self.disjuntor.registrar_falha()
+                if tentativa + 1 >= tentativas:
+                    raise
+
+                pausa = max(self._backoff(tentativa), _retry_after(e) or 0.0)
+                logger.warning(f"Falha transitória em {endpoint} ({str(e)}); "
+                               f"tentativa {tentativa + 2}/{tentativas} em {pausa:.2f}s")
+                with self._lock:
+                    metricas['retentativas'] += 1
+                time.sleep(pausa)
+                continue
+
+            with self._lock:
+                metricas['requisicoes'] += 1
+                metricas['latencias'].append(time.perf_counter() - inicio)
+            self.disjuntor.registrar_sucesso()
+            return resultado
+
+    def metricas(self):
+        """
+        Métricas acumuladas por endpoint e estado do disjuntor.
+
+        Returns:
+            dict: 'endpoints' (endpoint -> requisições, falhas, retentativas,
+                recusadas, fila atual e máxima, espera total na fila em
+                segundos e latências p50/p99 em ms) e 'disjuntor' (estado,
+                falhas consecutivas e aberturas)
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, m in self._metricas.items():
+                latencias = np.asarray(m['latencias'])
+                endpoints[endpoint] = {k: v for k, v in m.items() if k != 'latencias'}
+                endpoints[endpoint]['p50_ms'] = float(np.percentile(latencias, 50) * 1000) if len(latencias) else 0.0
+                endpoints[endpoint]['p99_ms'] = float(np.percentile(latencias, 99) * 1000) if len(latencias) else 0.0
+
+        return {
+            'endpoints': endpoints,
+            'disjuntor': {
+                'estado': self.disjuntor.estado,
+                'falhas_consecutivas': self.disjuntor.falhas_consecutivas,
+                'aberturas': self.disjuntor.aberturas
+            }
+        }
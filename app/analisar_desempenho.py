@@ -8,60 +8,73 @@ import numpy as np
 from sklearn.metrics import confusion_matrix
 from datetime import datetime
 from logger import logger
+from registro_trades import TIPOS_SAIDA, nomes_tipos_saida
 
 
-def calculo_desempenho(retornos, tipos_saida, limiar=1e-6):
-    """Analisa o desempenho da estratégia com métricas avançadas"""
+def metricas_retornos(retornos, tipos_saida=None, limiar=1e-6, capital_inicial=10000):
+    """
+    Núcleo vetorizado das métricas de desempenho sobre arrays.
 
-    if len(retornos) != len(tipos_saida):
-        raise ValueError("⚠️ 'retornos' e 'tipos_saida' devem ter o mesmo tamanho.")
+    Calcula taxa de acerto, ganhos e perdas médios, profit factor, drawdown
+    da curva composta, Sharpe, Sortino e expectativa por tipo de saída em
+    poucas passagens sobre os retornos, sem DataFrames nem laços em Python.
 
-    df_resultados = pd.DataFrame({
-        'retorno': [float(r) for r in retornos],
-        'tipo_saida': tipos_saida
-    })
+    Args:
+        retornos (np.array): Retorno de cada trade
+        tipos_saida (np.array, optional): Tipo de saída de cada trade, como
+            nomes ou códigos do registro de trades
+        limiar (float): Retornos com módulo até o limiar são ignorados
+        capital_inicial (float): Capital inicial da curva composta
 
-    df_validos = df_resultados[np.abs(df_resultados['retorno']) > limiar]
-    total_trades = len(df_validos)
+    Returns:
+        dict: Métricas de desempenho
+    """
+    r = np.asarray(retornos, dtype=float)
+    validos = np.abs(r) > limiar
+    r = r[validos]
+    total_trades = len(r)
 
     if total_trades == 0:
         return {'total_trades': 0}
 
-    trades_ganhos = df_validos[df_validos['retorno'] > 0]
-    trades_perdas = df_validos[df_validos['retorno'] < 0]
+    ganhos = r[r > 0]
+    perdas = r[r < 0]
+    soma_perdas = perdas.sum()
 
-    win_rate = len(trades_ganhos) / total_trades
-    avg_gain = trades_ganhos['retorno'].mean() if not trades_ganhos.empty else 0
-    avg_loss = trades_perdas['retorno'].mean() if not trades_perdas.empty else 0
-    profit_factor = abs(trades_ganhos['retorno'].sum() / trades_perdas['retorno'].sum()) if not trades_perdas.empty else float('inf')
+    win_rate = len(ganhos) / total_trades
+    avg_gain = ganhos.mean() if len(ganhos) else 0
+    avg_loss = perdas.mean() if len(perdas) else 0
+    profit_factor = abs(ganhos.sum() / soma_perdas) if len(perdas) else float('inf')
 
-    # Curva de capital
-    capital_acumulado = [10000]
-    for r in df_validos['retorno']:
-        capital_acumulado.append(capital_acumulado[-1] * (1 + r))
-    capital_acumulado = np.array(capital_acumulado)
-
-    # Max drawdown
+    # Curva de capital composta e max drawdown
+    capital_acumulado = np.cumprod(np.concatenate(([capital_inicial], 1 + r)))
     peak = np.maximum.accumulate(capital_acumulado)
-    drawdowns = (peak - capital_acumulado) / peak
-    max_drawdown = np.max(drawdowns)
-
-    # Sharpe Ratio
-    retornos_log = np.log1p(df_validos['retorno'])
-    sharpe = np.mean(retornos_log) / np.std(retornos_log) * np.sqrt(252) if np.std(retornos_log) > 0 else 0
-
-    # Sortino Ratio
-    downside_risk = np.std(retornos_log[retornos_log < 0])
-    sortino = np.mean(retornos_log) / downside_risk * np.sqrt(252) if downside_risk > 0 else 0
+    max_drawdown = np.max((peak - capital_acumulado) / peak)
 
-    # Expectancy por tipo
-    expectancy_tipo = df_validos.groupby('tipo_saida')['retorno'].mean().to_dict()
+    # Sharpe e Sortino sobre retornos logarítmicos
+    retornos_log = np.log1p(r)
+    media_log = retornos_log.mean()
+    desvio_log = retornos_log.std()
+    sharpe = media_log / desvio_log * np.sqrt(252) if desvio_log > 0 else 0
+    negativos = retornos_log[retornos_log < 0]
+    downside_risk = negativos.std() if len(negativos) else np.nan
+    sortino = media_log / downside_risk * np.sqrt(252) if downside_risk > 0 else 0
 
-    # Matriz de confusão simples (contagem por tipo)
-    tipo_labels = sorted(df_validos['tipo_saida'].unique())
-    matriz_confusao = dict(zip(tipo_labels, df_validos['tipo_saida'].value_counts().to_dict().items()))
+    # Expectativa e contagem por tipo de saída
+    expectancy_tipo, contagem_tipo = {}, {}
+    if tipos_saida is not None:
+        tipos = np.asarray(tipos_saida)[validos]
+        if tipos.dtype.kind in 'iu':
+            rotulos, codigos = np.unique(tipos, return_inverse=True)
+            rotulos = nomes_tipos_saida(rotulos)
+        else:
+            rotulos, codigos = np.unique(tipos.astype(str), return_inverse=True)
+        contagens = np.bincount(codigos, minlength=len(rotulos))
+        somas = np.bincount(codigos, weights=r, minlength=len(rotulos))
+        expectancy_tipo = {str(t): s / c for t, s, c in zip(rotulos, somas.tolist(), contagens.tolist())}
+        contagem_tipo = {str(t): c for t, c in zip(rotulos, contagens.tolist())}
 
-    metricas = {
+    return {
         'total_trades': total_trades,
         'win_rate': win_rate,
         'avg_gain': avg_gain,
@@ -72,20 +85,234 @@ def calculo_desempenho(retornos, tipos_saida, limiar=1e-6):
         'sharpe_ratio': sharpe,
         'sortino_ratio': sortino,
         'expectancy_por_tipo': expectancy_tipo,
-        'matriz_tipos': matriz_confusao
+        'matriz_tipos': contagem_tipo
     }
-    
-    # Gerar relatório amigável
-    gerar_relatorio_amigavel(metricas)
-    
+
+
+def achatar_series(series):
+    """
+    Concatena várias séries de retornos no formato plano com offsets.
+
+    Args:
+        series (list): Sequências de retornos, uma por execução
+
+    Returns:
+        tuple: (valores, offsets), com a série k em valores[offsets[k]:offsets[k + 1]]
+    """
+    tamanhos = [len(x) for x in series]
+    offsets = np.zeros(len(tamanhos) + 1, dtype=np.int64)
+    np.cumsum(tamanhos, out=offsets[1:])
+    valores = np.concatenate([np.asarray(x, dtype=float) for x in series]) if series else np.empty(0)
+    return valores, offsets
+
+
+def metricas_lote(valores, offsets, tipos_saida=None, limiar=1e-6, capital_inicial=10000,
+                  nomes=None):
+    """
+    Calcula as métricas de metricas_retornos para muitas séries de uma vez.
+
+    As séries ficam concatenadas em 'valores' e delimitadas por 'offsets';
+    todas as métricas são obtidas por operações de segmento (bincount,
+    reduceat e acumulados com deslocamento por segmento), sem laço por série.
+
+    Args:
+        valores (np.array): Retornos de todas as séries concatenados
+        offsets (np.array): Início de cada série e o fim da última (tamanho n_series + 1)
+        tipos_saida (np.array, optional): Códigos de tipo de saída alinhados a 'valores'
+        limiar (float): Retornos com módulo até o limiar são ignorados
+        capital_inicial (float): Capital inicial da curva composta
+        nomes (list, optional): Rótulos das séries para o índice da tabela
+
+    Returns:
+        pd.DataFrame: Uma linha por série com as métricas e a expectativa por tipo de saída
+    """
+    valores = np.asarray(valores, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_series = len(offsets) - 1
+    segmento = np.repeat(np.arange(n_series), np.diff(offsets))
+
+    validos = np.abs(valores) > limiar
+    r = valores[validos]
+    seg = segmento[validos]
+    total = np.bincount(seg, minlength=n_series)
+    inicio = np.concatenate(([0], np.cumsum(total)[:-1]))
+    nao_vazios = total > 0
+
+    def soma(pesos, mascara=None):
+        # Segmentos contíguos: reduceat sobre os não vazios
+        if mascara is not None:
+            pesos = np.where(mascara, pesos, 0.0)
+        resultado = np.zeros(n_series)
+        if nao_vazios.any():
+            resultado[nao_vazios] = np.add.reduceat(pesos, inicio[nao_vazios])
+        return resultado
+
+    def razao(a, b):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return a / b
+
+    ganho = r > 0
+    perda = r < 0
+    n_ganhos = soma(ganho.astype(float))
+    n_perdas = soma(perda.astype(float))
+    soma_ganhos = soma(r, ganho)
+    soma_perdas = soma(r, perda)
+
+    win_rate = razao(n_ganhos, total)
+    avg_gain = np.where(n_ganhos > 0, razao(soma_ganhos, n_ganhos), 0.0)
+    avg_loss = np.where(n_perdas > 0, razao(soma_perdas, n_perdas), 0.0)
+    profit_factor = np.where(n_perdas > 0, np.abs(razao(soma_ganhos, soma_perdas)), np.inf)
+
+    # Curva composta em escala log; o deslocamento por segmento isola os
+    # acumulados de cada série dentro de um único cumsum/maximum.accumulate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retornos_log = np.log1p(r)
+    quebra = r <= -1
+    acumulado = np.cumsum(np.where(quebra, 0.0, retornos_log))
+    base = np.concatenate(([0.0], acumulado))[inicio]
+    log_capital = acumulado - base[seg]
+    amplitude = (np.abs(log_capital).max() * 2 + 1) if len(r) else 1.0
+    deslocado = log_capital + seg * amplitude
+    # O pico inclui o capital inicial (log 0, deslocado para seg * amplitude)
+    pico = np.maximum(np.maximum.accumulate(deslocado), seg * amplitude)
+    pior = np.zeros(n_series)
+    if nao_vazios.any():
+        pior[nao_vazios] = np.minimum.reduceat(deslocado - pico, inicio[nao_vazios])
+    max_drawdown = 1 - np.exp(np.minimum(pior, 0.0))
+
+    # Retornos <= -1 (resultados absolutos ou quebra) não têm log; essas
+    # séries usam a curva composta direta, como metricas_retornos
+    for k in np.flatnonzero(np.bincount(seg[quebra], minlength=n_series)):
+        capital = np.cumprod(np.concatenate(([capital_inicial], 1 + r[inicio[k]:inicio[k] + total[k]])))
+        pico_k = np.maximum.accumulate(capital)
+        max_drawdown[k] = np.max((pico_k - capital) / pico_k)
+
+    # Sharpe e Sortino
+    media_log = razao(soma(retornos_log), total)
+    desvio_log = np.sqrt(razao(soma((retornos_log - media_log[seg]) ** 2), total))
+    negativo = retornos_log < 0
+    n_neg = soma(negativo.astype(float))
+    media_neg = razao(soma(retornos_log, negativo), n_neg)
+    desvio_neg = np.sqrt(razao(soma((retornos_log - media_neg[seg]) ** 2, negativo), n_neg))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(desvio_log > 0, media_log / desvio_log * np.sqrt(252), 0.0)
+        sortino = np.where(desvio_neg > 0, media_log / desvio_neg * np.sqrt(252), 0.0)
+
+    tabela = pd.DataFrame({
+        'total_trades': total,
+        'win_rate': win_rate,
+        'avg_gain': avg_gain,
+        'avg_loss': avg_loss,
+        'profit_factor': profit_factor,
+        'max_drawdown': max_drawdown,
+        'expectancy': win_rate * avg_gain - (1 - win_rate) * np.abs(avg_loss),
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino
+    }, index=nomes)
+
+    if tipos_saida is not None:
+        codigos = np.asarray(tipos_saida, dtype=np.int64)[validos]
+        n_tipos = len(TIPOS_SAIDA)
+        chave = seg * n_tipos + codigos
+        contagens = np.bincount(chave, minlength=n_series * n_tipos).reshape(n_series, n_tipos)
+        somas = np.bincount(chave, weights=r, minlength=n_series * n_tipos).reshape(n_series, n_tipos)
+        for codigo, tipo in enumerate(TIPOS_SAIDA):
+            tabela[f'expectancy_{tipo}'] = razao(somas[:, codigo], contagens[:, codigo])
+
+    # Séries sem trades válidos ficam só com a contagem, como em metricas_retornos
+    tabela.loc[~nao_vazios, tabela.columns.drop('total_trades')] = np.nan
+    return tabela
+
+
+def calculo_desempenho(retornos, tipos_saida, limiar=1e-6, relatorio=False):
+    """Analisa o desempenho da estratégia com métricas avançadas.
+
+    Aceita listas ou as colunas 'resultado' e 'tipo_saida' do registro de trades.
+    O relatório amigável só é escrito no log com relatorio=True; em laços de
+    otimização use o padrão e chame gerar_relatorio_amigavel apenas no final.
+    """
+
+    if len(retornos) != len(tipos_saida):
+        raise ValueError("⚠️ 'retornos' e 'tipos_saida' devem ter o mesmo tamanho.")
+
+    metricas = metricas_retornos(retornos, tipos_saida, limiar=limiar)
+
+    if relatorio and metricas['total_trades'] > 0:
+        gerar_relatorio_amigavel(metricas)
+
     return metricas
 
-def calcular_metricas(df_trades):
+def _sequencias(vitorias):
+    """
+    Comprimentos das sequências de vitórias e derrotas por run-length encoding.
+
+    Args:
+        vitorias (np.array): Máscara booleana de trades vencedores, em ordem
+
+    Returns:
+        dict: Sequência final e maior sequência de vitórias e de derrotas
+    """
+    sequencias = {'sequencia_vitorias': 0, 'sequencia_derrotas': 0,
+                  'maior_sequencia_vitorias': 0, 'maior_sequencia_derrotas': 0}
+    if len(vitorias) == 0:
+        return sequencias
+
+    inicios = np.flatnonzero(np.concatenate(([True], vitorias[1:] != vitorias[:-1])))
+    comprimentos = np.diff(np.append(inicios, len(vitorias)))
+    valores = vitorias[inicios]
+
+    if valores[-1]:
+        sequencias['sequencia_vitorias'] = int(comprimentos[-1])
+    else:
+        sequencias['sequencia_derrotas'] = int(comprimentos[-1])
+    if valores.any():
+        sequencias['maior_sequencia_vitorias'] = int(comprimentos[valores].max())
+    if not valores.all():
+        sequencias['maior_sequencia_derrotas'] = int(comprimentos[~valores].max())
+    return sequencias
+
+
+def _drawdown_colunar(resultado, datas):
+    """
+    Drawdown do capital acumulado a partir das colunas de resultado e data.
+    """
+    capital_acumulado = np.cumsum(resultado)
+    drawdown = capital_acumulado - np.maximum.accumulate(capital_acumulado)
+    pior = int(np.argmin(drawdown))
+    return {
+        'max_drawdown': drawdown[pior],
+        'drawdown_atual': drawdown[-1],
+        'tempo_max_drawdown': datas[pior]
+    }
+
+
+def _risco_colunar(resultado, datas, capital_inicial):
+    """
+    Métricas de risco a partir das colunas de resultado e data.
+    """
+    retorno = resultado / capital_inicial
+    volatilidade = retorno.std(ddof=1) if len(retorno) > 1 else np.nan
+    dias, grupo = np.unique(datas.normalize().asi8, return_inverse=True)
+    return {
+        'volatilidade': volatilidade,
+        'sharpe_ratio': retorno.mean() / volatilidade if volatilidade > 0 else 0,
+        'var_95': np.quantile(retorno, 0.05),
+        'max_loss_diario': np.bincount(grupo, weights=resultado, minlength=len(dias)).min()
+    }
+
+
+def calcular_metricas(df_trades, capital_inicial=None):
     """
     Calcula métricas de desempenho a partir dos trades realizados.
+
+    As métricas são obtidas das colunas inteiras, sem iterar linha a linha.
+    Quando o DataFrame traz 'resultado' e 'data', inclui também a análise de
+    drawdown ('drawdown') e, com 'capital_inicial', a de risco ('risco'),
+    nos mesmos formatos de analisar_drawdown e analisar_risco.
     
     Args:
         df_trades (pd.DataFrame): DataFrame com informações dos trades
+        capital_inicial (float, optional): Capital inicial para as métricas de risco
         
     Returns:
         dict: Dicionário com as métricas calculadas
@@ -93,41 +320,36 @@ def calcular_metricas(df_trades):
     logger.info("Calculando métricas de desempenho")
     
     try:
-        # Inicializar métricas
+        resultado = (df_trades['preco_saida'].to_numpy(dtype=float)
+                     - df_trades['preco_entrada'].to_numpy(dtype=float))
+        vitorias = resultado > 0
+        ganhos = resultado[vitorias]
+        perdas = resultado[~vitorias]
+
+        # Somas acumuladas em ordem, como na soma trade a trade
         metricas = {
             'total_trades': len(df_trades),
-            'trades_lucrativos': 0,
-            'trades_prejuizo': 0,
-            'lucro_total': 0,
-            'prejuizo_total': 0,
-            'maior_lucro': 0,
-            'maior_prejuizo': 0,
-            'sequencia_vitorias': 0,
-            'sequencia_derrotas': 0
+            'trades_lucrativos': len(ganhos),
+            'trades_prejuizo': len(perdas),
+            'lucro_total': float(np.cumsum(ganhos)[-1]) if len(ganhos) else 0,
+            'prejuizo_total': float(np.cumsum(np.abs(perdas))[-1]) if len(perdas) else 0,
+            'maior_lucro': max(0, float(ganhos.max())) if len(ganhos) else 0,
+            'maior_prejuizo': min(0, float(perdas.min())) if len(perdas) else 0
         }
-        
-        # Calcular métricas básicas
-        for _, trade in df_trades.iterrows():
-            resultado = trade['preco_saida'] - trade['preco_entrada']
-            
-            if resultado > 0:
-                metricas['trades_lucrativos'] += 1
-                metricas['lucro_total'] += resultado
-                metricas['maior_lucro'] = max(metricas['maior_lucro'], resultado)
-                metricas['sequencia_vitorias'] += 1
-                metricas['sequencia_derrotas'] = 0
-            else:
-                metricas['trades_prejuizo'] += 1
-                metricas['prejuizo_total'] += abs(resultado)
-                metricas['maior_prejuizo'] = min(metricas['maior_prejuizo'], resultado)
-                metricas['sequencia_derrotas'] += 1
-                metricas['sequencia_vitorias'] = 0
+        metricas.update(_sequencias(vitorias))
         
         # Calcular métricas derivadas
         metricas['win_rate'] = metricas['trades_lucrativos'] / metricas['total_trades']
         metricas['profit_factor'] = metricas['lucro_total'] / metricas['prejuizo_total'] if metricas['prejuizo_total'] > 0 else float('inf')
         metricas['retorno_total'] = metricas['lucro_total'] - metricas['prejuizo_total']
         metricas['retorno_medio'] = metricas['retorno_total'] / metricas['total_trades']
+
+        if 'resultado' in df_trades and 'data' in df_trades:
+            resultado_trades = df_trades['resultado'].to_numpy(dtype=float)
+            datas = pd.DatetimeIndex(df_trades['data'])
+            metricas['drawdown'] = _drawdown_colunar(resultado_trades, datas)
+            if capital_inicial is not None:
+                metricas['risco'] = _risco_colunar(resultado_trades, datas, capital_inicial)
         
         logger.info("Métricas calculadas com sucesso")
         return metricas
@@ -149,19 +371,8 @@ def analisar_drawdown(df_trades):
     logger.info("Analisando drawdown")
     
     try:
-        # Calcular evolução do capital
-        df_trades['capital_acumulado'] = df_trades['resultado'].cumsum()
-        
-        # Calcular drawdown
-        df_trades['max_capital'] = df_trades['capital_acumulado'].cummax()
-        df_trades['drawdown'] = df_trades['capital_acumulado'] - df_trades['max_capital']
-        
-        # Calcular métricas de drawdown
-        drawdown_info = {
-            'max_drawdown': df_trades['drawdown'].min(),
-            'drawdown_atual': df_trades['drawdown'].iloc[-1],
-            'tempo_max_drawdown': df_trades.loc[df_trades['drawdown'].idxmin(), 'data']
-        }
+        drawdown_info = _drawdown_colunar(df_trades['resultado'].to_numpy(dtype=float),
+                                          pd.DatetimeIndex(df_trades['data']))
         
         logger.info("Análise de drawdown concluída")
         return drawdown_info
@@ -184,16 +395,8 @@ def analisar_risco(df_trades, capital_inicial):
     logger.info("Analisando métricas de risco")
     
     try:
-        # Calcular retornos
-        df_trades['retorno'] = df_trades['resultado'] / capital_inicial
-        
-        # Calcular métricas de risco
-        risco_info = {
-            'volatilidade': df_trades['retorno'].std(),
-            'sharpe_ratio': df_trades['retorno'].mean() / df_trades['retorno'].std() if df_trades['retorno'].std() > 0 else 0,
-            'var_95': df_trades['retorno'].quantile(0.05),
-            'max_loss_diario': df_trades.groupby(df_trades['data'].dt.date)['resultado'].sum().min()
-        }
+        risco_info = _risco_colunar(df_trades['resultado'].to_numpy(dtype=float),
+                                    pd.DatetimeIndex(df_trades['data']), capital_inicial)
         
         logger.info("Análise de risco concluída")
         return risco_info
@@ -66,3 +66,32 @@ def aplicar_filtros_tecnicos(df):
     
     return df
 
+
+
+def filtros_tecnicos_barra(valores, atr_media_20, volume_media_20, obv_anterior):
+    """
+    Avalia os filtros de aplicar_filtros_tecnicos para uma única barra.
+
+    Usada no loop ao vivo, que mantém os indicadores em um buffer e não
+    monta um DataFrame a cada candle. As regras e limiares são os mesmos de
+    aplicar_filtros_tecnicos e devem ser alterados junto com eles.
+
+    Args:
+        valores (dict): Valores da barra (close, sma_20, ema_20, rsi, macd,
+            macd_signal, bb_upper, bb_lower, atr, volume, obv e adx)
+        atr_media_20 (float): Média do ATR nas últimas 20 barras
+        volume_media_20 (float): Média do volume nas últimas 20 barras
+        obv_anterior (float): OBV da barra anterior
+
+    Returns:
+        bool: Se a barra passa nos filtros
+    """
+    close = valores['close']
+    tendencia_ok = close > valores['sma_20'] or close > valores['ema_20']
+    momentum_ok = (25 < valores['rsi'] < 75) or valores['macd'] > valores['macd_signal']
+    volatilidade_ok = ((valores['bb_lower'] < close < valores['bb_upper'])
+                       or valores['atr'] > atr_media_20 * 0.4)
+    volume_geral_ok = valores['volume'] > volume_media_20 * 0.4 or valores['obv'] > obv_anterior
+    adx_ok = valores['adx'] > 15
+
+    return bool(tendencia_ok and (momentum_ok or volatilidade_ok) and volume_geral_ok and adx_ok)
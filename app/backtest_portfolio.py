@@ -0,0 +1,232 @@
+"""
+Módulo de backtest de portfólio multiativos.
+Simula vários ativos disputando um único capital, com limite de posições
+simultâneas e dimensionamento pelo risco por trade, reaproveitando as regras
+de stop loss, take profit e trailing stop do motor de backtest.
+"""
+
+import numpy as np
+import pandas as pd
+from logger import logger
+from cache_backtest import cache_backtest, gerar_chave
+from motor_backtest import permite_cache
+from registro_trades import RegistroTrades, TRADE_DTYPE_PORTFOLIO, CODIGO_TIPO_SAIDA, preencher_datas
+
+# Bytes por célula (barra x ativo) nos blocos: close float64, prob float32 e sinal bool
+_BYTES_POR_CELULA = 8 + 4 + 1
+
+
+def _alinhar_eixo(indices):
+    """
+    Constrói o eixo temporal comum (união ordenada) sem concatenar todos os ativos.
+
+    Args:
+        indices (list): Lista de arrays int64 de timestamps por ativo
+
+    Returns:
+        np.array: Eixo temporal comum em int64
+    """
+    eixo = np.empty(0, dtype=np.int64)
+    for ts in indices:
+        eixo = np.union1d(eixo, ts)
+    return eixo
+
+
+def _linhas_por_bloco(n_ativos, memoria_max_mb):
+    """
+    Calcula quantas barras cabem em um bloco dentro do orçamento de memória.
+    """
+    return max(1, int(memoria_max_mb * 2**20) // (n_ativos * _BYTES_POR_CELULA))
+
+
+def backtest_portfolio(dados, probs, estrategia, capital_inicial=10000,
+                       risco_por_trade=0.02, max_posicoes=10, memoria_max_mb=256,
+                       usar_cache=True):
+    """
+    Executa um backtest de portfólio com capital compartilhado entre ativos.
+
+    Os ativos são alinhados em um eixo temporal comum e processados em blocos
+    de barras vetorizados sobre os ativos; o tamanho do bloco é limitado por
+    'memoria_max_mb'. O orçamento cobre apenas as matrizes densas de cada
+    bloco (barras x ativos): os DataFrames de entrada continuam com quem
+    chama, e os arrays por ativo (timestamps, preços, sinais e
+    probabilidades) e a curva de patrimônio ocupam memória proporcional ao
+    histórico completo. Em cada barra as saídas são verificadas antes das
+    entradas. Cada entrada arrisca 'risco_por_trade' do patrimônio até o
+    stop loss, limitada pelo caixa livre; havendo mais sinais do que vagas,
+    entram primeiro os de maior probabilidade.
+
+    Args:
+        dados (dict): Ticker -> DataFrame com índice temporal e as colunas usadas pela estratégia
+        probs (dict): Ticker -> probabilidades alinhadas ao DataFrame do ativo
+        estrategia (Estrategia): Estratégia do motor de backtest aplicada a todos os ativos
+        capital_inicial (float): Capital inicial compartilhado
+        risco_por_trade (float): Fração do patrimônio arriscada por trade
+        max_posicoes (int): Máximo de posições abertas simultaneamente
+        memoria_max_mb (float): Orçamento de memória das matrizes de cada bloco
+            de barras (não inclui os dados de entrada nem os arrays por ativo)
+        usar_cache (bool): Reaproveitar resultados de entradas idênticas
+
+    Returns:
+        dict: Registro colunar de trades (campo 'ativo' indexa 'tickers'), curva
+            de patrimônio, capital final e retorno total
+    """
+    logger.info(f"Iniciando backtest de portfólio com {len(dados)} ativos")
+
+    try:
+        if usar_cache and permite_cache([estrategia]):
+            colunas = estrategia.colunas()
+            chave = gerar_chave('backtest_portfolio',
+                                {t: dados[t][colunas] for t in dados},
+                                {t: np.asarray(probs[t], dtype=float) for t in probs},
+                                estrategia, capital_inicial, risco_por_trade, max_posicoes)
+            resultado = cache_backtest.executar(chave, lambda: _simular_portfolio(
+                dados, probs, estrategia, capital_inicial, risco_por_trade, max_posicoes, memoria_max_mb))
+        else:
+            resultado = _simular_portfolio(dados, probs, estrategia, capital_inicial,
+                                           risco_por_trade, max_posicoes, memoria_max_mb)
+
+        logger.info(f"Backtest de portfólio concluído: {len(resultado['trades'])} trades")
+        return resultado
+
+    except Exception as e:
+        logger.error(f"Erro durante o backtest de portfólio: {str(e)}")
+        raise
+
+
+def _simular_portfolio(dados, probs, estrategia, capital_inicial, risco_por_trade,
+                       max_posicoes, memoria_max_mb):
+    """
+    Núcleo do backtest de portfólio; ver backtest_portfolio.
+    """
+    tickers = list(dados)
+    n_ativos = len(tickers)
+
+    # Arrays por ativo: timestamps, preços, sinais e probabilidades
+    indices, closes, sinais, probabilidades = [], [], [], []
+    for ticker in tickers:
+        df = dados[ticker]
+        p = np.asarray(probs[ticker], dtype=float)
+        if len(p) != len(df):
+            raise ValueError(f"'probs' de {ticker} deve ter o mesmo tamanho dos dados.")
+        indices.append(pd.DatetimeIndex(df.index).as_unit('ns').asi8)
+        closes.append(df['close'].to_numpy(dtype=float))
+        sinais.append(estrategia.sinal_entrada(df, p))
+        probabilidades.append(p.astype(np.float32))
+
+    eixo = _alinhar_eixo(indices)
+    n_barras = len(eixo)
+    linhas_bloco = _linhas_por_bloco(n_ativos, memoria_max_mb)
+    cursores = np.zeros(n_ativos, dtype=np.int64)
+
+    alavancagem = estrategia.alavancagem
+    stop_loss_pct = estrategia.stop_loss_pct / alavancagem
+    take_profit_pct = estrategia.take_profit_pct / alavancagem
+    trailing = estrategia.trailing_stop_offset
+    slippage = estrategia.custos.slippage
+    fator_saida = estrategia.custos.fator_saida()
+
+    # Estado das posições, um elemento por ativo
+    aberta = np.zeros(n_ativos, dtype=bool)
+    idx_entrada = np.zeros(n_ativos, dtype=np.int64)
+    preco_entrada = np.zeros(n_ativos)
+    quantidade = np.zeros(n_ativos)
+    stop_loss = np.zeros(n_ativos)
+    take_profit = np.zeros(n_ativos)
+    max_price_since_entry = np.zeros(n_ativos)
+    ultimo_close = np.full(n_ativos, np.nan)
+
+    caixa = float(capital_inicial)
+    equity = np.empty(n_barras)
+    registro = RegistroTrades(dtype=TRADE_DTYPE_PORTFOLIO)
+
+    for inicio in range(0, n_barras, linhas_bloco):
+        fim = min(inicio + linhas_bloco, n_barras)
+        close_bloco = np.full((fim - inicio, n_ativos), np.nan)
+        prob_bloco = np.zeros((fim - inicio, n_ativos), dtype=np.float32)
+        sinal_bloco = np.zeros((fim - inicio, n_ativos), dtype=bool)
+
+        for a in range(n_ativos):
+            lo = cursores[a]
+            hi = np.searchsorted(indices[a], eixo[fim - 1], side='right')
+            if hi > lo:
+                pos = np.searchsorted(eixo[inicio:fim], indices[a][lo:hi])
+                close_bloco[pos, a] = closes[a][lo:hi]
+                prob_bloco[pos, a] = probabilidades[a][lo:hi]
+                sinal_bloco[pos, a] = sinais[a][lo:hi]
+            cursores[a] = hi
+
+        for linha in range(fim - inicio):
+            t = inicio + linha
+            precos = close_bloco[linha]
+            valido = ~np.isnan(precos)
+            ultimo_close[valido] = precos[valido]
+
+            if aberta.any():
+                ativo = aberta & valido
+                if trailing is not None:
+                    sobe = ativo & (precos > max_price_since_entry)
+                    if sobe.any():
+                        max_price_since_entry[sobe] = precos[sobe]
+                        stop_loss[sobe] = np.maximum(stop_loss[sobe],
+                                                     precos[sobe] * (1 - trailing))
+
+                saida_sl = ativo & (precos <= stop_loss)
+                saida_tp = ativo & ~saida_sl & (precos >= take_profit)
+                for saindo, tipo, niveis in ((np.flatnonzero(saida_sl), CODIGO_TIPO_SAIDA['stop_loss'], stop_loss),
+                                             (np.flatnonzero(saida_tp), CODIGO_TIPO_SAIDA['take_profit'], take_profit)):
+                    for i in saindo:
+                        resultado = ((niveis[i] - preco_entrada[i]) * quantidade[i]
+                                     * fator_saida * alavancagem)
+                        caixa += preco_entrada[i] * quantidade[i] + resultado
+                        registro.adicionar(idx_entrada[i], t, 0, 0, preco_entrada[i], niveis[i],
+                                           tipo, resultado, i, quantidade[i])
+                aberta &= ~(saida_sl | saida_tp)
+
+            candidatos = np.flatnonzero(~aberta & valido & sinal_bloco[linha])
+            vagas = max_posicoes - int(aberta.sum())
+            if len(candidatos) and vagas > 0 and caixa > 0:
+                candidatos = candidatos[np.argsort(-prob_bloco[linha, candidatos], kind='stable')][:vagas]
+                patrimonio = caixa + np.sum(
+                    (preco_entrada[aberta] + (ultimo_close[aberta] - preco_entrada[aberta]) * alavancagem)
+                    * quantidade[aberta]
+                )
+                pe = precos[candidatos] * (1 + slippage)
+                # Margem que arrisca 'risco_por_trade' do patrimônio até o stop
+                margem = np.full(len(candidatos), patrimonio * risco_por_trade / estrategia.stop_loss_pct)
+                margem = np.minimum(margem, caixa)
+                aceitos = np.cumsum(margem) <= caixa
+                candidatos, pe, margem = candidatos[aceitos], pe[aceitos], margem[aceitos]
+                if len(candidatos):
+                    aberta[candidatos] = True
+                    idx_entrada[candidatos] = t
+                    preco_entrada[candidatos] = pe
+                    quantidade[candidatos] = margem / pe
+                    stop_loss[candidatos] = pe * (1 - stop_loss_pct)
+                    take_profit[candidatos] = pe * (1 + take_profit_pct)
+                    max_price_since_entry[candidatos] = pe
+                    caixa -= float(margem.sum())
+
+            equity[t] = caixa + np.sum(
+                (preco_entrada[aberta] + (ultimo_close[aberta] - preco_entrada[aberta]) * alavancagem)
+                * quantidade[aberta]
+            )
+
+    eixo_datas = pd.to_datetime(eixo, unit='ns')
+    tz = getattr(dados[tickers[0]].index, 'tz', None) if tickers else None
+    if tz is not None:
+        eixo_datas = eixo_datas.tz_localize('UTC').tz_convert(tz)
+    trades = registro.trades
+    preencher_datas(trades, eixo_datas)
+
+    capital_final = equity[-1] if n_barras else float(capital_inicial)
+    resultado = {
+        'trades': trades,
+        'tickers': tickers,
+        'equity': pd.Series(equity, index=eixo_datas, name='equity'),
+        'posicoes_abertas': [tickers[i] for i in np.flatnonzero(aberta)],
+        'capital_final': capital_final,
+        'retorno_total': (capital_final - capital_inicial) / capital_inicial
+    }
+
+    return resultado
@@ -7,6 +7,9 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from logger import logger
+from analisar_desempenho import calcular_metricas
+from motor_backtest import estrategia_do_modo, executar_estrategia
+from registro_trades import entradas_saidas
 
 def backtest_avancado(df, probs, capital_inicial=10000, 
                      stop_loss_pct=0.02, take_profit_pct=0.04,
@@ -29,68 +32,31 @@ def backtest_avancado(df, probs, capital_inicial=10000,
     logger.info("Iniciando backtest avançado")
     
     try:
-        # Inicializar variáveis
-        capital = capital_inicial
-        posicao_aberta = False
-        preco_entrada = 0
-        stop_loss = 0
-        take_profit = 0
-        
-        # Listas para armazenar trades
-        trades = []
-        entradas = []
-        saidas = []
-        
-        # Iterar sobre os dados
-        for i in range(len(df)):
-            preco_atual = df['close'].iloc[i]
-            
-            # Verificar stop loss e take profit
-            if posicao_aberta:
-                if preco_atual <= stop_loss:
-                    # Stop loss atingido
-                    resultado = (stop_loss - preco_entrada) * (1 - comissao - slippage)
-                    capital += resultado
-                    trades.append({
-                        'data': df.index[i],
-                        'tipo': 'venda',
-                        'preco_entrada': preco_entrada,
-                        'preco_saida': stop_loss,
-                        'resultado': resultado
-                    })
-                    saidas.append((df.index[i], stop_loss))
-                    posicao_aberta = False
-                    
-                elif preco_atual >= take_profit:
-                    # Take profit atingido
-                    resultado = (take_profit - preco_entrada) * (1 - comissao - slippage)
-                    capital += resultado
-                    trades.append({
-                        'data': df.index[i],
-                        'tipo': 'venda',
-                        'preco_entrada': preco_entrada,
-                        'preco_saida': take_profit,
-                        'resultado': resultado
-                    })
-                    saidas.append((df.index[i], take_profit))
-                    posicao_aberta = False
-
-            # Verificar sinais de entrada
-            if not posicao_aberta and probs[i] > 0.6:
-                # Entrar na posição
-                preco_entrada = preco_atual * (1 + slippage)
-                stop_loss = preco_entrada * (1 - stop_loss_pct)
-                take_profit = preco_entrada * (1 + take_profit_pct)
-                posicao_aberta = True
-                entradas.append((df.index[i], preco_entrada))
+        estrategia = estrategia_do_modo(
+            'padrao',
+            stop_loss_pct=stop_loss_pct,
+            take_profit_pct=take_profit_pct,
+            comissao=comissao,
+            slippage=slippage
+        )
+        resultado = executar_estrategia(df, probs, estrategia, capital_inicial=capital_inicial)
+        
+        trades = resultado['trades']
+        entradas, saidas = entradas_saidas(trades, df.index, resultado['entrada_aberta'])
         
         # Converter trades para DataFrame
-        df_trades = pd.DataFrame(trades)
+        df_trades = pd.DataFrame({
+            'data': df.index[trades['idx_saida']],
+            'tipo': 'venda',
+            'preco_entrada': trades['preco_entrada'],
+            'preco_saida': trades['preco_saida'],
+            'resultado': trades['resultado']
+        })
         
         # Calcular métricas
-        metricas = calcular_metricas(df_trades)
-        metricas['capital_final'] = capital
-        metricas['retorno_total'] = (capital - capital_inicial) / capital_inicial
+        metricas = calcular_metricas(df_trades, capital_inicial=capital_inicial)
+        metricas['capital_final'] = resultado['capital_final']
+        metricas['retorno_total'] = resultado['retorno_total']
         
         logger.info("Backtest concluído com sucesso")
         return metricas, df_trades, entradas, saidas
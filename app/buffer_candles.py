@@ -0,0 +1,327 @@
+"""
+Módulo de buffer circular de candles para a operação ao vivo.
+Mantém, por ativo, um array NumPy pré-alocado com OHLCV e os indicadores do
+modelo, atualizados de forma incremental a cada candle, para que o loop ao
+vivo leia janelas sem cópia em vez de reconstruir um DataFrame a cada tick.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from aplicar_filtros import filtros_tecnicos_barra
+from walk_forward import FEATURES_MODELO
+
+# Colunas do buffer: as features do modelo, na mesma ordem de matriz_features
+COLUNAS_BUFFER = list(FEATURES_MODELO)
+_COL = {coluna: k for k, coluna in enumerate(COLUNAS_BUFFER)}
+
+# Janelas dos indicadores (as mesmas de RoboTrading.adicionar_indicadores)
+_JANELA_RSI = 14
+_JANELA_ATR = 14
+_JANELA_ADX = 14
+_JANELA_MEDIA = 20
+_SPAN_MACD = (12, 26, 9)
+
+# Candles necessários até todos os indicadores e filtros estarem definidos
+CANDLES_AQUECIMENTO = max(2 * _JANELA_ADX, _SPAN_MACD[1] + _SPAN_MACD[2] - 1, 2 * _JANELA_MEDIA - 1)
+
+
+def _variacao(atual, anterior):
+    """
+    Variação relativa com a mesma convenção de pct_change (x/0 = inf, 0/0 = NaN).
+    """
+    if anterior == 0:
+        return math.nan if atual == 0 else math.copysign(math.inf, atual)
+    return atual / anterior - 1
+
+
+class _EMA:
+    """
+    Média móvel exponencial sem ajuste (ewm(adjust=False)) com período mínimo.
+    """
+
+    __slots__ = ('alpha', 'min_periodos', 'valor', 'n')
+
+    def __init__(self, alpha, min_periodos):
+        self.alpha = alpha
+        self.min_periodos = min_periodos
+        self.valor = math.nan
+        self.n = 0
+
+    def atualizar(self, x):
+        self.valor = x if self.n == 0 else self.valor + self.alpha * (x - self.valor)
+        self.n += 1
+        return self.valor if self.n >= self.min_periodos else math.nan
+
+
+class BufferCandles:
+    """
+    Buffer circular de candles com indicadores incrementais.
+
+    Cada linha é gravada duas vezes (posições i e i + capacidade), de modo
+    que as últimas k linhas formam sempre uma fatia contígua: janela() e
+    features() devolvem views, sem cópia. Os indicadores seguem exatamente
+    as fórmulas da biblioteca 'ta' usadas em adicionar_indicadores, com
+    estado O(1) por candle; como as médias exponenciais dependem de todo o
+    passado, os valores coincidem com o cálculo em lote sobre o mesmo
+    histórico desde o primeiro candle carregado.
+
+    Attributes:
+        capacidade (int): Máximo de candles mantidos
+        total (int): Candles recebidos desde a criação
+    """
+
+    def __init__(self, capacidade=500):
+        """
+        Inicializa o buffer vazio.
+
+        Args:
+            capacidade (int): Máximo de candles mantidos (mínimo de uma janela de médias + 1)
+        """
+        if capacidade <= _JANELA_MEDIA:
+            raise ValueError(f"A capacidade deve ser maior que {_JANELA_MEDIA}.")
+
+        self.capacidade = capacidade
+        self.total = 0
+        self._dados = np.full((2 * capacidade, len(COLUNAS_BUFFER)), np.nan)
+        self._tempos = np.zeros(2 * capacidade, dtype=np.int64)
+        self._linha = np.empty(len(COLUNAS_BUFFER))
+
+        # Estado dos indicadores
+        self._close_anterior = math.nan
+        self._high_anterior = math.nan
+        self._low_anterior = math.nan
+        self._volume_anterior = math.nan
+        self._rsi_alta = _EMA(1 / _JANELA_RSI, _JANELA_RSI)
+        self._rsi_baixa = _EMA(1 / _JANELA_RSI, _JANELA_RSI)
+        self._ema_rapida = _EMA(2 / (_SPAN_MACD[0] + 1), _SPAN_MACD[0])
+        self._ema_lenta = _EMA(2 / (_SPAN_MACD[1] + 1), _SPAN_MACD[1])
+        self._ema_sinal = _EMA(2 / (_SPAN_MACD[2] + 1), _SPAN_MACD[2])
+        self._ema_20 = _EMA(2 / (_JANELA_MEDIA + 1), _JANELA_MEDIA)
+        self._soma_tr = 0.0
+        self._atr = 0.0
+        self._obv = 0.0
+        self._trs = self._dip = self._din = 0.0
+        self._soma_dx = 0.0
+        self._adx = 0.0
+
+    def __len__(self):
+        return min(self.total, self.capacidade)
+
+    @property
+    def pronto(self):
+        """Se já há candles suficientes para todos os indicadores e filtros."""
+        return self.total >= CANDLES_AQUECIMENTO
+
+    def _fim(self):
+        return (self.total - 1) % self.capacidade + self.capacidade + 1
+
+    def adicionar(self, timestamp, abertura, maxima, minima, fechamento, volume):
+        """
+        Acrescenta um candle fechado e atualiza os indicadores no próprio buffer.
+
+        Args:
+            timestamp (int): Abertura do candle em ms
+            abertura, maxima, minima, fechamento, volume (float): OHLCV do candle
+        """
+        n = self.total
+        c_ant = self._close_anterior
+        linha = self._linha
+
+        linha[0] = abertura
+        linha[1] = maxima
+        linha[2] = minima
+        linha[3] = fechamento
+        linha[4] = volume
+
+        # RSI (Wilder): médias exponenciais das altas e baixas
+        diferenca = fechamento - c_ant if n else math.nan
+        alta = self._rsi_alta.atualizar(diferenca if diferenca > 0 else 0.0)
+        baixa = self._rsi_baixa.atualizar(-diferenca if diferenca < 0 else 0.0)
+        linha[5] = 100.0 if baixa == 0 else 100 - 100 / (1 + alta / baixa)
+
+        # MACD: o sinal só começa quando o MACD passa a existir
+        macd = self._ema_rapida.atualizar(fechamento) - self._ema_lenta.atualizar(fechamento)
+        linha[6] = macd
+        linha[7] = self._ema_sinal.atualizar(macd) if macd == macd else math.nan
+
+        # Média simples, exponencial e bandas de Bollinger (desvio populacional)
+        linha[9] = self._ema_20.atualizar(fechamento)
+        self._gravar(timestamp)
+        if n + 1 >= _JANELA_MEDIA:
+            janela = self._dados[self._fim() - _JANELA_MEDIA:self._fim(), 3]
+            media = janela.mean()
+            desvio = janela.std()
+            linha[8] = media
+            linha[10] = media + 2 * desvio
+            linha[11] = media - 2 * desvio
+        else:
+            linha[8] = linha[10] = linha[11] = math.nan
+
+        # ATR: média das primeiras janelas de true range e depois suavização de Wilder
+        if n:
+            tr = max(maxima - minima, abs(maxima - c_ant), abs(minima - c_ant))
+        else:
+            tr = maxima - minima
+        if n < _JANELA_ATR:
+            self._soma_tr += tr
+            self._atr = self._soma_tr / _JANELA_ATR if n == _JANELA_ATR - 1 else 0.0
+        else:
+            self._atr = (self._atr * (_JANELA_ATR - 1) + tr) / _JANELA_ATR
+        linha[12] = self._atr
+
+        # Variação do volume e OBV
+        linha[13] = _variacao(volume, self._volume_anterior) if n else math.nan
+        self._obv += -volume if fechamento < c_ant else volume
+        linha[14] = self._obv
+
+        # ADX: somas suavizadas de true range e movimentos direcionais a partir do 2º candle
+        linha[15] = self._atualizar_adx(n, maxima, minima, c_ant)
+
+        self._dados[self._fim() - 1] = linha
+        self._dados[self._fim() - 1 - self.capacidade] = linha
+
+        self._close_anterior = fechamento
+        self._high_anterior = maxima
+        self._low_anterior = minima
+        self._volume_anterior = volume
+
+    def _gravar(self, timestamp):
+        """
+        Avança o buffer e grava o candle corrente (OHLCV) antes das médias por janela.
+        """
+        self.total += 1
+        fim = self._fim()
+        self._tempos[fim - 1] = self._tempos[fim - 1 - self.capacidade] = timestamp
+        self._dados[fim - 1, :5] = self._linha[:5]
+        self._dados[fim - 1 - self.capacidade, :5] = self._linha[:5]
+
+    def _atualizar_adx(self, n, maxima, minima, c_ant):
+        janela = _JANELA_ADX
+        if n == 0:
+            return 0.0
+
+        dm = max(maxima, c_ant) - min(minima, c_ant)
+        sobe = maxima - self._high_anterior
+        desce = self._low_anterior - minima
+        positivo = sobe if (sobe > desce and sobe > 0) else 0.0
+        negativo = desce if (desce > sobe and desce > 0) else 0.0
+
+        if n <= janela:
+            self._trs += dm
+            self._dip += positivo
+            self._din += negativo
+            if n < janela:
+                return 0.0
+        else:
+            self._trs += dm - self._trs / janela
+            self._dip += positivo - self._dip / janela
+            self._din += negativo - self._din / janela
+
+        di_pos = 100 * self._dip / self._trs if self._trs != 0 else 0.0
+        di_neg = 100 * self._din / self._trs if self._trs != 0 else 0.0
+        dx = 100 * abs((di_pos - di_neg) / (di_pos + di_neg)) if di_pos + di_neg != 0 else 0.0
+
+        # O ADX começa como a média dos primeiros DX e segue por suavização de Wilder
+        if n < 2 * janela:
+            self._soma_dx += dx
+            if n == 2 * janela - 1:
+                self._adx = self._soma_dx / janela
+                return self._adx
+            return 0.0
+        self._adx = (self._adx * (janela - 1) + dx) / janela
+        return self._adx
+
+    def carregar(self, df):
+        """
+        Acrescenta candles históricos em ordem (ex.: a carga inicial do loop ao vivo).
+
+        Args:
+            df (pd.DataFrame): Colunas 'timestamp' (ms, opcional se o índice for
+                datetime), 'open', 'high', 'low', 'close' e 'volume'
+        """
+        if 'timestamp' in df.columns:
+            tempos = df['timestamp'].to_numpy(dtype=np.int64)
+        else:
+            tempos = pd.DatetimeIndex(df.index).as_unit('ms').asi8
+        ohlcv = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype=float)
+        for t, (o, h, lo, c, v) in zip(tempos, ohlcv):
+            self.adicionar(int(t), o, h, lo, c, v)
+
+    def janela(self, n=None):
+        """
+        View das últimas 'n' linhas (todas as colunas de COLUNAS_BUFFER), sem cópia.
+
+        Args:
+            n (int, optional): Número de linhas (padrão: todas as disponíveis)
+
+        Returns:
+            np.array: Array (n, len(COLUNAS_BUFFER)) somente leitura
+        """
+        n = len(self) if n is None else min(n, len(self))
+        fim = self._fim() if self.total else self.capacidade
+        view = self._dados[fim - n:fim]
+        view.flags.writeable = False
+        return view
+
+    def coluna(self, nome, n=None):
+        """
+        View das últimas 'n' posições de uma coluna, sem cópia.
+        """
+        return self.janela(n)[:, _COL[nome]]
+
+    def tempos(self, n=None):
+        """
+        View dos timestamps (ms) das últimas 'n' linhas, sem cópia.
+        """
+        n = len(self) if n is None else min(n, len(self))
+        fim = self._fim() if self.total else self.capacidade
+        return self._tempos[fim - n:fim]
+
+    def features(self):
+        """
+        View (1, n_features) do último candle, na ordem de FEATURES_MODELO.
+        """
+        return self.janela(1)
+
+    def filtros_ok(self):
+        """
+        Avalia os filtros técnicos de aplicar_filtros_tecnicos no último candle.
+
+        Returns:
+            bool: Se o último candle passa nos filtros
+        """
+        if len(self) < _JANELA_MEDIA:
+            return False
+        ultimas = self.janela(_JANELA_MEDIA + 1)
+        return filtros_tecnicos_barra(
+            dict(zip(COLUNAS_BUFFER, ultimas[-1].tolist())),
+            atr_media_20=ultimas[-_JANELA_MEDIA:, _COL['atr']].mean(),
+            volume_media_20=ultimas[-_JANELA_MEDIA:, _COL['volume']].mean(),
+            obv_anterior=ultimas[-2, _COL['obv']] if len(ultimas) > 1 else math.nan
+        )
+
+    def barra_atual(self):
+        """
+        Último candle como mapeamento coluna -> view de 1 elemento, mais 'filtros_ok'.
+
+        É a entrada das regras de Estrategia.sinal_entrada no loop ao vivo.
+
+        Returns:
+            dict: Colunas de COLUNAS_BUFFER e 'filtros_ok'
+        """
+        ultima = self.janela(1)
+        barra = {coluna: ultima[:, k] for k, coluna in enumerate(COLUNAS_BUFFER)}
+        barra['filtros_ok'] = np.array([self.filtros_ok()])
+        return barra
+
+    def para_dataframe(self):
+        """
+        Cópia do conteúdo do buffer como DataFrame indexado pela data (UTC).
+
+        Returns:
+            pd.DataFrame: Candles e indicadores
+        """
+        return pd.DataFrame(self.janela().copy(), columns=COLUNAS_BUFFER,
+                            index=pd.to_datetime(self.tempos(), unit='ms', utc=True))
@@ -0,0 +1,247 @@
+"""
+Módulo de cache de resultados de backtest.
+Implementa um cache endereçado por conteúdo: a chave é o hash dos arrays de
+preço, das probabilidades, dos filtros e de todos os parâmetros, com uma
+camada LRU em memória e uma camada opcional em disco com despejo por tamanho.
+"""
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from logger import logger
+from config import CACHE_CONFIG
+
+
+def _atualizar_hash(h, parte):
+    """
+    Alimenta o hash com uma parte da chave, de forma determinística.
+    """
+    if isinstance(parte, pd.DataFrame):
+        h.update(b'DataFrame')
+        _atualizar_hash(h, parte.index)
+        for coluna in parte.columns:
+            _atualizar_hash(h, str(coluna))
+            _atualizar_hash(h, parte[coluna])
+    elif isinstance(parte, (pd.Series, pd.Index)):
+        if pd.api.types.is_datetime64_any_dtype(parte.dtype):
+            h.update(str(parte.dtype).encode('utf-8'))
+            valores = pd.DatetimeIndex(parte).as_unit('ns').asi8
+        else:
+            valores = parte.to_numpy()
+            if valores.dtype == object:
+                valores = pd.util.hash_pandas_object(pd.Series(valores), index=False).to_numpy()
+        _atualizar_hash(h, valores)
+    elif isinstance(parte, np.ndarray):
+        h.update(f"ndarray{parte.dtype.str}{parte.shape}".encode('utf-8'))
+        if parte.dtype.kind == 'O':
+            h.update(repr(parte.tolist()).encode('utf-8'))
+        else:
+            h.update(np.ascontiguousarray(parte).view(np.uint8))
+    elif isinstance(parte, dict):
+        h.update(b'dict')
+        for k in sorted(parte, key=repr):
+            _atualizar_hash(h, k)
+            _atualizar_hash(h, parte[k])
+    elif isinstance(parte, (list, tuple)):
+        h.update(type(parte).__name__.encode('utf-8'))
+        for item in parte:
+            _atualizar_hash(h, item)
+    else:
+        h.update(repr(parte).encode('utf-8'))
+    h.update(b'|')
+
+
+def gerar_chave(*partes):
+    """
+    Gera a chave de cache a partir do conteúdo das partes.
+
+    Args:
+        *partes: Arrays, DataFrames, séries, dicionários ou objetos com repr estável
+
+    Returns:
+        str: Hash hexadecimal da chave
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for parte in partes:
+        _atualizar_hash(h, parte)
+    return h.hexdigest()
+
+
+class CacheBacktest:
+    """
+    Cache de resultados de backtest com camadas em memória e em disco.
+
+    Attributes:
+        max_itens (int): Máximo de resultados na camada em memória
+        diretorio (str or None): Pasta da camada em disco (None desativa)
+        max_bytes_disco (int): Tamanho máximo da camada em disco
+        acertos (int): Consultas atendidas pelo cache
+        falhas (int): Consultas que precisaram executar o backtest
+    """
+
+    def __init__(self, max_itens=128, diretorio=None, max_mb_disco=512):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_itens (int): Máximo de resultados na camada em memória
+            diretorio (str, optional): Pasta da camada em disco
+            max_mb_disco (float): Tamanho máximo da camada em disco em MB
+        """
+        self.max_itens = max_itens
+        self.diretorio = diretorio
+        self.max_bytes_disco = int(max_mb_disco * 2**20)
+        self.acertos = 0
+        self.falhas = 0
+        self._memoria = OrderedDict()
+
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.pkl")
+
+    def obter(self, chave):
+        """
+        Busca um resultado pela chave, primeiro na memória e depois no disco.
+
+        Args:
+            chave (str): Chave gerada por gerar_chave
+
+        Returns:
+            tuple: (encontrado, valor)
+        """
+        if chave in self._memoria:
+            self._memoria.move_to_end(chave)
+            self.acertos += 1
+            return True, self._memoria[chave]
+
+        if self.diretorio and os.path.exists(self._caminho(chave)):
+            try:
+                with open(self._caminho(chave), 'rb') as f:
+                    valor = pickle.load(f)
+                os.utime(self._caminho(chave))
+                self._guardar_memoria(chave, valor)
+                self.acertos += 1
+                return True, valor
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"Entrada de cache em disco inválida {chave}: {str(e)}")
+
+        self.falhas += 1
+        return False, None
+
+    def _guardar_memoria(self, chave, valor):
+        self._memoria[chave] = valor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens:
+            self._memoria.popitem(last=False)
+
+    def guardar(self, chave, valor):
+        """
+        Guarda um resultado nas camadas em memória e em disco.
+
+        Args:
+            chave (str): Chave gerada por gerar_chave
+            valor: Resultado do backtest
+        """
+        self._guardar_memoria(chave, valor)
+
+        if self.diretorio:
+            try:
+                temporario = self._caminho(chave) + '.tmp'
+                with open(temporario, 'wb') as f:
+                    pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, self._caminho(chave))
+                self._despejar_disco()
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar o cache em disco: {str(e)}")
+
+    def _despejar_disco(self):
+        """
+        Remove as entradas usadas há mais tempo até caber no tamanho máximo.
+        """
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith('.pkl'):
+                caminho = os.path.join(self.diretorio, nome)
+                info = os.stat(caminho)
+                entradas.append((info.st_mtime, info.st_size, caminho))
+
+        total = sum(e[1] for e in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.max_bytes_disco:
+                break
+            os.remove(caminho)
+            total -= tamanho
+
+    def executar(self, chave, funcao):
+        """
+        Retorna o resultado em cache ou executa a função e guarda o resultado.
+
+        O resultado devolvido é compartilhado entre as consultas e não deve
+        ser modificado.
+
+        Args:
+            chave (str): Chave gerada por gerar_chave
+            funcao (callable): Função sem argumentos que executa o backtest
+
+        Returns:
+            Resultado do backtest
+        """
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            logger.info(f"Resultado de backtest obtido do cache (taxa de acertos: {self.taxa_acertos:.1%})")
+            return valor
+
+        valor = funcao()
+        self.guardar(chave, valor)
+        return valor
+
+    @property
+    def taxa_acertos(self):
+        """Fração das consultas atendidas pelo cache."""
+        total = self.acertos + self.falhas
+        return self.acertos / total if total else 0.0
+
+    def estatisticas(self):
+        """
+        Resume o uso do cache.
+
+        Returns:
+            dict: Acertos, falhas, taxa de acertos e ocupação das camadas
+        """
+        bytes_disco = 0
+        if self.diretorio and os.path.isdir(self.diretorio):
+            bytes_disco = sum(os.path.getsize(os.path.join(self.diretorio, nome))
+                              for nome in os.listdir(self.diretorio) if nome.endswith('.pkl'))
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acertos': self.taxa_acertos,
+            'itens_memoria': len(self._memoria),
+            'bytes_disco': bytes_disco
+        }
+
+    def limpar(self):
+        """
+        Esvazia as camadas em memória e em disco e zera as estatísticas.
+        """
+        self._memoria.clear()
+        self.acertos = 0
+        self.falhas = 0
+        if self.diretorio and os.path.isdir(self.diretorio):
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith('.pkl'):
+                    os.remove(os.path.join(self.diretorio, nome))
+
+
+# Cache global usado pelos pontos de entrada do backtest
+cache_backtest = CacheBacktest(
+    max_itens=CACHE_CONFIG['max_itens'],
+    diretorio=CACHE_CONFIG['diretorio'],
+    max_mb_disco=CACHE_CONFIG['max_mb_disco']
+)
@@ -0,0 +1,272 @@
+"""
+Classe assíncrona para gerenciar a conexão e operações com a corretora.
+Mesma API e mesmo esquema de assinatura de ConexaoCorretora, mas sobre asyncio
+e aiohttp, para que dados de mercado, posições e saldo de vários ativos sejam
+consultados em paralelo sobre um pool de conexões HTTP/1.1 keep-alive.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+from logger import logger
+from config import CONEXAO_CONFIG
+from classeConexaoCorretora import gerar_assinatura
+from decodificar_candles import CargaHistorico
+
+
+class ConexaoCorretoraAssincrona:
+    """
+    Classe para gerenciar a conexão assíncrona com a corretora.
+
+    A sessão HTTP é criada na primeira requisição (ou ao entrar no bloco
+    'async with') e mantém até 'max_conexoes' conexões abertas, reaproveitadas
+    entre as requisições. Todo método aceita um 'timeout' próprio, que
+    substitui o padrão da conexão.
+
+    Attributes:
+        api_key (str): Chave da API
+        api_secret (str): Segredo da API
+        base_url (str): URL base da API
+        timeout (float): Timeout padrão por requisição, em segundos
+        max_conexoes (int): Máximo de conexões simultâneas no pool
+        keepalive (float): Segundos que uma conexão ociosa permanece aberta
+        session (aiohttp.ClientSession): Sessão HTTP (None até ser aberta)
+    """
+
+    def __init__(self, api_key, api_secret, base_url=None, timeout=None,
+                 max_conexoes=None, keepalive=None):
+        """
+        Inicializa a conexão; parâmetros omitidos vêm de CONEXAO_CONFIG.
+
+        Args:
+            api_key (str): Chave da API
+            api_secret (str): Segredo da API
+            base_url (str, optional): URL base da API
+            timeout (float, optional): Timeout padrão por requisição
+            max_conexoes (int, optional): Máximo de conexões simultâneas
+            keepalive (float, optional): Tempo de vida das conexões ociosas
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.base_url = base_url or CONEXAO_CONFIG['base_url']
+        self.timeout = timeout or CONEXAO_CONFIG['timeout']
+        self.max_conexoes = max_conexoes or CONEXAO_CONFIG['max_conexoes']
+        self.keepalive = keepalive or CONEXAO_CONFIG['keepalive']
+        self.session = None
+
+        logger.info("Conexão assíncrona com corretora inicializada")
+
+    async def abrir(self):
+        """
+        Abre a sessão HTTP e o pool de conexões, se ainda não estiverem abertos.
+        """
+        if self.session is None or self.session.closed:
+            conector = aiohttp.TCPConnector(limit=self.max_conexoes,
+                                            keepalive_timeout=self.keepalive)
+            self.session = aiohttp.ClientSession(
+                connector=conector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def fechar(self):
+        """
+        Fecha a sessão HTTP e todas as conexões do pool.
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        await self.abrir()
+        return self
+
+    async def __aexit__(self, *excecao):
+        await self.fechar()
+
+    def _assinar(self, params):
+        """
+        Acrescenta o timestamp e a assinatura aos parâmetros.
+        """
+        params['timestamp'] = int(time.time() * 1000)
+        params['signature'] = gerar_assinatura(self.api_secret, params)
+        return params
+
+    async def _requisitar(self, metodo, caminho, params, timeout=None, bruto=False):
+        """
+        Envia uma requisição assinada e devolve o corpo JSON da resposta.
+
+        Args:
+            metodo (str): 'GET' ou 'POST'
+            caminho (str): Caminho do endpoint (ex.: '/position')
+            params (dict): Parâmetros da requisição, sem timestamp e assinatura
+            timeout (float, optional): Timeout desta requisição
+            bruto (bool): Devolver o corpo sem decodificar
+
+        Returns:
+            dict or list or bytes: Resposta decodificada, ou o corpo bruto
+        """
+        await self.abrir()
+        params = self._assinar(params)
+        argumentos = {'params': params} if metodo == 'GET' else {'json': params}
+        if timeout is not None:
+            argumentos['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+        async with self.session.request(metodo, f"{self.base_url}{caminho}", **argumentos) as response:
+            response.raise_for_status()
+            if bruto:
+                return await response.read()
+            return await response.json()
+
+    async def obter_dados_mercado(self, simbolo, timeframe, limite=1000, desde=None, timeout=None):
+        """
+        Obtém dados históricos do mercado.
+
+        Mesma decodificação colunar e paginação de ConexaoCorretora.obter_dados_mercado.
+
+        Args:
+            simbolo (str): Símbolo do ativo (ex: 'BTC-USD')
+            timeframe (str): Intervalo de tempo (ex: '15min')
+            limite (int): Número máximo de candles
+            desde (int, optional): Só candles com timestamp (ms) a partir deste
+            timeout (float, optional): Timeout desta requisição
+
+        Returns:
+            pd.DataFrame: DataFrame com os dados históricos (timestamp int64 e
+                OHLCV float64)
+        """
+        logger.info(f"Obtendo dados de {simbolo} no timeframe {timeframe}")
+
+        try:
+            carga = CargaHistorico(timeframe, limite, desde, CONEXAO_CONFIG['candles_por_pagina'])
+            pedido = carga.proxima()
+            while pedido is not None:
+                params = {'symbol': simbolo, 'timeframe': timeframe, 'limit': pedido['limit']}
+                if 'since' in pedido:
+                    params['since'] = pedido['since']
+                carga.receber(await self._requisitar('GET', '/market/history', params, timeout, bruto=True))
+                pedido = carga.proxima()
+            dados = carga.para_dataframe()
+
+            if desde is None and len(dados) < limite:
+                logger.warning(f"Histórico de {simbolo} em {timeframe} com apenas {len(dados)} "
+                               f"dos {limite} candles pedidos")
+            logger.info(f"Dados obtidos com sucesso: {len(dados)} candles em {carga.requisicoes} requisições")
+            return dados
+
+        except Exception as e:
+            logger.error(f"Erro ao obter dados: {str(e)}")
+            raise
+
+    async def enviar_ordem(self, simbolo, tipo, quantidade, preco=None,
+                           stop_loss=None, take_profit=None, timeout=None):
+        """
+        Envia uma ordem para a corretora.
+
+        Args:
+            simbolo (str): Símbolo do ativo
+            tipo (str): Tipo de ordem ('compra' ou 'venda')
+            quantidade (float): Quantidade a ser negociada
+            preco (float, optional): Preço limite
+            stop_loss (float, optional): Preço do stop loss
+            take_profit (float, optional): Preço do take profit
+            timeout (float, optional): Timeout desta requisição
+
+        Returns:
+            dict: Resposta da corretora
+        """
+        logger.info(f"Enviando ordem de {tipo} para {simbolo}")
+
+        params = {
+            'symbol': simbolo,
+            'side': tipo.upper(),
+            'quantity': quantidade
+        }
+
+        if preco:
+            params['price'] = preco
+            params['type'] = 'LIMIT'
+        else:
+            params['type'] = 'MARKET'
+
+        if stop_loss:
+            params['stopLoss'] = stop_loss
+        if take_profit:
+            params['takeProfit'] = take_profit
+
+        try:
+            resultado = await self._requisitar('POST', '/order', params, timeout)
+
+            logger.info(f"Ordem enviada com sucesso: {resultado['orderId']}")
+            return resultado
+
+        except Exception as e:
+            logger.error(f"Erro ao enviar ordem: {str(e)}")
+            raise
+
+    async def verificar_posicoes(self, timeout=None):
+        """
+        Verifica as posições abertas.
+
+        Args:
+            timeout (float, optional): Timeout desta requisição
+
+        Returns:
+            list: Lista de posições abertas
+        """
+        logger.info("Verificando posições abertas...")
+
+        try:
+            posicoes = await self._requisitar('GET', '/position', {}, timeout)
+
+            logger.info(f"Posições encontradas: {len(posicoes)}")
+            return posicoes
+
+        except Exception as e:
+            logger.error(f"Erro ao verificar posições: {str(e)}")
+            raise
+
+    async def obter_saldo(self, timeout=None):
+        """
+        Obtém o saldo da conta.
+
+        Args:
+            timeout (float, optional): Timeout desta requisição
+
+        Returns:
+            dict: Saldo da conta
+        """
+        logger.info("Obtendo saldo da conta...")
+
+        try:
+            saldo = await self._requisitar('GET', '/account/balance', {}, timeout)
+
+            logger.info("Saldo obtido com sucesso")
+            return saldo
+
+        except Exception as e:
+            logger.error(f"Erro ao obter saldo: {str(e)}")
+            raise
+
+    async def obter_estado(self, simbolos, timeframe, limite=100, timeout=None):
+        """
+        Consulta em paralelo os dados de mercado de vários ativos, as posições e o saldo.
+
+        Args:
+            simbolos (list): Símbolos dos ativos
+            timeframe (str): Intervalo de tempo dos candles
+            limite (int): Número máximo de candles por ativo
+            timeout (float, optional): Timeout de cada requisição
+
+        Returns:
+            dict: 'dados' (símbolo -> DataFrame), 'posicoes' e 'saldo'
+        """
+        tarefas = [self.obter_dados_mercado(simbolo, timeframe, limite, timeout=timeout) for simbolo in simbolos]
+        tarefas += [self.verificar_posicoes(timeout), self.obter_saldo(timeout)]
+        *dados, posicoes, saldo = await asyncio.gather(*tarefas)
+
+        return {
+            'dados': dict(zip(simbolos, dados)),
+            'posicoes': posicoes,
+            'saldo': saldo
+        }
@@ -3,12 +3,46 @@ Classe para gerenciar a conexão e operações com a corretora.
 Implementa todas as funcionalidades necessárias para interagir com a API da corretora.
 """
 
+import copy
 import requests
+import threading
 import time
 import hmac
 import hashlib
+import json
 from datetime import datetime
 from logger import logger
+from config import CONEXAO_CONFIG
+from decodificar_candles import CargaHistorico
+from agendador_requisicoes import AgendadorRequisicoes
+
+
+def gerar_assinatura(api_secret, params):
+    """
+    Gera assinatura HMAC-SHA256 para autenticação.
+
+    Compartilhada pelos clientes síncrono e assíncrono e pela corretora
+    simulada. Valores que são listas ou dicionários (ex.: 'orders' do lote)
+    entram como JSON compacto com chaves ordenadas, a mesma forma obtida dos
+    dois lados a partir do corpo da requisição.
+
+    Args:
+        api_secret (str): Segredo da API
+        params (dict): Parâmetros da requisição
+
+    Returns:
+        str: Assinatura gerada
+    """
+    query_string = '&'.join([
+        f"{k}={json.dumps(v, separators=(',', ':'), sort_keys=True) if isinstance(v, (list, dict)) else v}"
+        for k, v in sorted(params.items())
+    ])
+    return hmac.new(
+        api_secret.encode('utf-8'),
+        query_string.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
 
 class ConexaoCorretora:
     """
@@ -20,14 +54,25 @@ class ConexaoCorretora:
     - Envio de ordens
     - Consulta de posições e saldo
     
+    Toda requisição passa pelo agendador: limite de taxa por endpoint,
+    retentativas com backoff para os GETs e disjuntor.
+    
+    Posições e saldo ficam em cache por 'ttl_estado' segundos. O cache é
+    invalidado pelas ordens enviadas por esta conexão e pelas notificações de
+    execução (invalidar_estado), pois só elas mudam o estado da conta.
+    
     Attributes:
         api_key (str): Chave da API
         api_secret (str): Segredo da API
         base_url (str): URL base da API
+        timeout (float): Timeout por requisição, em segundos
+        agendador (AgendadorRequisicoes): Limite de taxa, retentativas e disjuntor
+        ttl_estado (float): Validade, em segundos, de posições e saldo em cache
         session (requests.Session): Sessão HTTP
     """
     
-    def __init__(self, api_key, api_secret, base_url='https://api.exchange.com'):
+    def __init__(self, api_key, api_secret, base_url='https://api.exchange.com', timeout=None,
+                 agendador=None, ttl_estado=None):
         """
         Inicializa a conexão com a corretora.
         
@@ -35,11 +80,23 @@ class ConexaoCorretora:
             api_key (str): Chave da API
             api_secret (str): Segredo da API
             base_url (str): URL base da API
+            timeout (float, optional): Timeout por requisição, em segundos
+                (padrão: CONEXAO_CONFIG['timeout'])
+            agendador (AgendadorRequisicoes, optional): Agendador a usar
+                (padrão: um novo, com AGENDADOR_CONFIG)
+            ttl_estado (float, optional): Validade do cache de posições e saldo
+                (padrão: CONEXAO_CONFIG['ttl_estado']; 0 desativa o cache)
         """
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = base_url
+        self.timeout = timeout or CONEXAO_CONFIG['timeout']
+        self.agendador = agendador or AgendadorRequisicoes()
+        self.ttl_estado = CONEXAO_CONFIG['ttl_estado'] if ttl_estado is None else ttl_estado
         self.session = requests.Session()
+        self._estado = {}
+        self._geracao_estado = 0
+        self._lock_estado = threading.Lock()
         
         logger.info("Conexão com corretora inicializada")
     
@@ -53,73 +110,128 @@ class ConexaoCorretora:
         Returns:
             str: Assinatura gerada
         """
-        query_string = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
-        return hmac.new(
-            self.api_secret.encode('utf-8'),
-            query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        return gerar_assinatura(self.api_secret, params)
     
-    def obter_dados_mercado(self, simbolo, timeframe, limite=1000):
+    def _requisitar(self, metodo, caminho, params):
         """
-        Obtém dados históricos do mercado.
+        Envia uma requisição assinada pelo agendador.
+        
+        O timestamp e a assinatura são refeitos a cada tentativa; só os GETs
+        são repetidos após falhas transitórias.
         
         Args:
-            simbolo (str): Símbolo do ativo (ex: 'BTC-USD')
-            timeframe (str): Intervalo de tempo (ex: '15min')
-            limite (int): Número máximo de candles
+            metodo (str): 'GET' ou 'POST'
+            caminho (str): Caminho do endpoint (ex.: '/position')
+            params (dict): Parâmetros da requisição, sem timestamp e assinatura
             
         Returns:
-            pd.DataFrame: DataFrame com os dados históricos
+            requests.Response: Resposta bem-sucedida
         """
-        logger.info(f"Obtendo dados de {simbolo} no timeframe {timeframe}")
+        def enviar():
+            assinados = dict(params, timestamp=int(time.time() * 1000))
+            assinados['signature'] = self._gerar_assinatura(assinados)
+            argumentos = {'params': assinados} if metodo == 'GET' else {'json': assinados}
+            response = self.session.request(metodo, f"{self.base_url}{caminho}",
+                                            timeout=self.timeout, **argumentos)
+            response.raise_for_status()
+            return response
         
-        endpoint = f"{self.base_url}/market/history"
+        return self.agendador.executar(caminho, enviar, idempotente=(metodo == 'GET'))
+    
+    def _estado_em_cache(self, chave):
+        """
+        Valor em cache de um estado da conta, ou None se ausente ou vencido.
+        """
+        with self._lock_estado:
+            item = self._estado.get(chave)
+            if item is None or time.monotonic() - item[0] >= self.ttl_estado:
+                return None
+            return copy.copy(item[1])
+    
+    def _guardar_estado(self, chave, valor, geracao):
+        """
+        Guarda um estado da conta, a menos que o cache tenha sido invalidado
+        enquanto a consulta estava em andamento.
+        """
+        with self._lock_estado:
+            if geracao == self._geracao_estado:
+                self._estado[chave] = (time.monotonic(), copy.copy(valor))
+    
+    def invalidar_estado(self):
+        """
+        Descarta posições e saldo em cache.
+        
+        Chamado após cada ordem desta conexão; deve ser chamado também ao
+        receber uma notificação de execução (ex.: stop disparado).
+        """
+        with self._lock_estado:
+            self._geracao_estado += 1
+            self._estado.clear()
+    
+    def _pagina_historico(self, simbolo, timeframe, limite, desde=None):
+        """
+        Baixa uma página de /market/history e devolve o corpo bruto da resposta.
+        """
         params = {
             'symbol': simbolo,
             'timeframe': timeframe,
-            'limit': limite,
-            'timestamp': int(time.time() * 1000)
+            'limit': limite
         }
+        if desde is not None:
+            params['since'] = int(desde)
         
-        params['signature'] = self._gerar_assinatura(params)
+        return self._requisitar('GET', '/market/history', params).content
+    
+    def obter_dados_mercado(self, simbolo, timeframe, limite=1000, desde=None):
+        """
+        Obtém dados históricos do mercado.
+        
+        As respostas são decodificadas direto em colunas tipadas. Acima de
+        CONEXAO_CONFIG['candles_por_pagina'] candles, o histórico é baixado em
+        páginas com 'since' (ver CargaHistorico); sem 'desde', o início é
+        recuado até reunir 'limite' candles mesmo em mercados com pausas.
+        Se o histórico disponível tiver menos candles, um aviso é registrado.
+        
+        Args:
+            simbolo (str): Símbolo do ativo (ex: 'BTC-USD')
+            timeframe (str): Intervalo de tempo (ex: '15min')
+            limite (int): Número máximo de candles
+            desde (int, optional): Só candles com timestamp (ms) a partir deste
+            
+        Returns:
+            pd.DataFrame: DataFrame com os dados históricos (timestamp int64 e
+                OHLCV float64)
+        """
+        logger.info(f"Obtendo dados de {simbolo} no timeframe {timeframe}")
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            dados = response.json()
+            carga = CargaHistorico(timeframe, limite, desde, CONEXAO_CONFIG['candles_por_pagina'])
+            pedido = carga.proxima()
+            while pedido is not None:
+                carga.receber(self._pagina_historico(simbolo, timeframe, pedido['limit'], pedido.get('since')))
+                pedido = carga.proxima()
+            dados = carga.para_dataframe()
             
-            logger.info(f"Dados obtidos com sucesso: {len(dados)} candles")
-            return pd.DataFrame(dados)
+            if desde is None and len(dados) < limite:
+                logger.warning(f"Histórico de {simbolo} em {timeframe} com apenas {len(dados)} "
+                               f"dos {limite} candles pedidos")
+            logger.info(f"Dados obtidos com sucesso: {len(dados)} candles em {carga.requisicoes} requisições")
+            return dados
             
         except Exception as e:
             logger.error(f"Erro ao obter dados: {str(e)}")
             raise
     
-    def enviar_ordem(self, simbolo, tipo, quantidade, preco=None, 
-                    stop_loss=None, take_profit=None):
+    @staticmethod
+    def _parametros_ordem(simbolo, tipo, quantidade, preco=None, stop_loss=None,
+                          take_profit=None, id_cliente=None):
         """
-        Envia uma ordem para a corretora.
-        
-        Args:
-            simbolo (str): Símbolo do ativo
-            tipo (str): Tipo de ordem ('compra' ou 'venda')
-            quantidade (float): Quantidade a ser negociada
-            preco (float, optional): Preço limite
-            stop_loss (float, optional): Preço do stop loss
-            take_profit (float, optional): Preço do take profit
-            
-        Returns:
-            dict: Resposta da corretora
+        Monta os parâmetros de uma ordem na convenção da API.
         """
-        logger.info(f"Enviando ordem de {tipo} para {simbolo}")
-        
-        endpoint = f"{self.base_url}/order"
         params = {
             'symbol': simbolo,
             'side': tipo.upper(),
-            'quantity': quantidade,
-            'timestamp': int(time.time() * 1000)
+            'quantity': quantidade
         }
         
         if preco:
@@ -132,13 +244,35 @@ class ConexaoCorretora:
             params['stopLoss'] = stop_loss
         if take_profit:
             params['takeProfit'] = take_profit
+        if id_cliente:
+            params['clientOrderId'] = id_cliente
+        return params
+    
+    def enviar_ordem(self, simbolo, tipo, quantidade, preco=None, 
+                    stop_loss=None, take_profit=None, id_cliente=None):
+        """
+        Envia uma ordem para a corretora.
+        
+        Args:
+            simbolo (str): Símbolo do ativo
+            tipo (str): Tipo de ordem ('compra' ou 'venda')
+            quantidade (float): Quantidade a ser negociada
+            preco (float, optional): Preço limite
+            stop_loss (float, optional): Preço do stop loss
+            take_profit (float, optional): Preço do take profit
+            id_cliente (str, optional): Id da ordem atribuído pelo cliente
+                (clientOrderId), devolvido na confirmação e nas execuções
             
-        params['signature'] = self._gerar_assinatura(params)
+        Returns:
+            dict: Resposta da corretora
+        """
+        logger.info(f"Enviando ordem de {tipo} para {simbolo}")
+        
+        params = self._parametros_ordem(simbolo, tipo, quantidade, preco, stop_loss,
+                                        take_profit, id_cliente)
         
         try:
-            response = self.session.post(endpoint, json=params)
-            response.raise_for_status()
-            resultado = response.json()
+            resultado = self._requisitar('POST', '/order', params).json()
             
             logger.info(f"Ordem enviada com sucesso: {resultado['orderId']}")
             return resultado
@@ -146,27 +280,88 @@ class ConexaoCorretora:
         except Exception as e:
             logger.error(f"Erro ao enviar ordem: {str(e)}")
             raise
+        
+        finally:
+            # Mesmo sem resposta a ordem pode ter sido executada
+            self.invalidar_estado()
     
-    def verificar_posicoes(self):
+    def consultar_ordem(self, id_cliente):
+        """
+        Consulta uma ordem pelo clientOrderId.
+        
+        Usada para saber se uma ordem cujo envio terminou sem resposta (timeout
+        ou queda da conexão) chegou à corretora.
+        
+        Args:
+            id_cliente (str): clientOrderId da ordem
+            
+        Returns:
+            dict or None: Confirmação da ordem, ou None se a corretora não a conhece
+        """
+        try:
+            return self._requisitar('GET', '/order', {'clientOrderId': id_cliente}).json()
+            
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            logger.error(f"Erro ao consultar a ordem {id_cliente}: {str(e)}")
+            raise
+            
+        except Exception as e:
+            logger.error(f"Erro ao consultar a ordem {id_cliente}: {str(e)}")
+            raise
+    
+    def enviar_ordens_lote(self, ordens):
+        """
+        Envia várias ordens em uma única requisição ao endpoint de lote.
+        
+        Args:
+            ordens (list): Dicionários com os argumentos de enviar_ordem
+                ('simbolo', 'tipo', 'quantidade' e os opcionais); cada um deve
+                ter 'id_cliente' para que as confirmações sejam associadas
+            
+        Returns:
+            list: Confirmação de cada ordem, com 'clientOrderId' e 'status'
+                ('FILLED', ou 'REJECTED' com 'message')
+        """
+        logger.info(f"Enviando lote de {len(ordens)} ordens")
+        
+        params = {'orders': [self._parametros_ordem(**ordem) for ordem in ordens]}
+        
+        try:
+            resultados = self._requisitar('POST', '/orders/batch', params).json()
+            
+            logger.info(f"Lote enviado com sucesso: {len(resultados)} confirmações")
+            return resultados
+            
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote de ordens: {str(e)}")
+            raise
+        
+        finally:
+            self.invalidar_estado()
+    
+    def verificar_posicoes(self, usar_cache=True):
         """
         Verifica as posições abertas.
         
+        Args:
+            usar_cache (bool): Aceitar as posições em cache dentro do TTL
+        
         Returns:
             list: Lista de posições abertas
         """
         logger.info("Verificando posições abertas...")
         
-        endpoint = f"{self.base_url}/position"
-        params = {
-            'timestamp': int(time.time() * 1000)
-        }
-        
-        params['signature'] = self._gerar_assinatura(params)
+        posicoes = self._estado_em_cache('posicoes') if usar_cache else None
+        if posicoes is not None:
+            logger.info(f"Posições em cache: {len(posicoes)}")
+            return posicoes
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            posicoes = response.json()
+            geracao = self._geracao_estado
+            posicoes = self._requisitar('GET', '/position', {}).json()
+            self._guardar_estado('posicoes', posicoes, geracao)
             
             logger.info(f"Posições encontradas: {len(posicoes)}")
             return posicoes
@@ -175,26 +370,27 @@ class ConexaoCorretora:
             logger.error(f"Erro ao verificar posições: {str(e)}")
             raise
     
-    def obter_saldo(self):
+    def obter_saldo(self, usar_cache=True):
         """
         Obtém o saldo da conta.
         
+        Args:
+            usar_cache (bool): Aceitar o saldo em cache dentro do TTL
+        
         Returns:
             dict: Saldo da conta
         """
         logger.info("Obtendo saldo da conta...")
         
-        endpoint = f"{self.base_url}/account/balance"
-        params = {
-            'timestamp': int(time.time() * 1000)
-        }
-        
-        params['signature'] = self._gerar_assinatura(params)
+        saldo = self._estado_em_cache('saldo') if usar_cache else None
+        if saldo is not None:
+            logger.info("Saldo em cache")
+            return saldo
         
         try:
-            response = self.session.get(endpoint, params=params)
-            response.raise_for_status()
-            saldo = response.json()
+            geracao = self._geracao_estado
+            saldo = self._requisitar('GET', '/account/balance', {}).json()
+            self._guardar_estado('saldo', saldo, geracao)
             
             logger.info(f"Saldo obtido com sucesso")
             return saldo
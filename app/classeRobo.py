@@ -3,6 +3,8 @@ Classe principal do robô de trading.
 Implementa a lógica de negociação e gerenciamento de operações.
 """
 
+import pickle
+
 import ta
 import numpy as np
 import pandas as pd
@@ -14,8 +16,12 @@ import xgboost as xgb
 
 from logger import logger
 from aplicar_filtros import aplicar_filtros_tecnicos
-from backtest_agressivo import backtest_agressivo
-from backtest_utils import backtest_avancado
+from motor_backtest import estrategia_do_modo, executar_estrategia, comparar_estrategias
+from backtest_portfolio import backtest_portfolio
+from walk_forward import WalkForward, FEATURES_MODELO, matriz_features
+from registro_trades import RegistroTrades, CODIGO_TIPO_SAIDA, data_utc, entradas_saidas, nomes_tipos_saida
+from metricas_online import MetricasOnline
+from buffer_candles import BufferCandles
 from analisar_desempenho import calculo_desempenho, analisar_drawdown, analisar_risco
 
 class RoboTrading:
@@ -36,7 +42,8 @@ class RoboTrading:
         trailing_stop (bool): Trailing stop
         modelo (RandomForestClassifier): Modelo de machine learning
         scaler (StandardScaler): Normalizador de dados
-        historico_trades (list): Lista de trades realizados
+        historico_trades (RegistroTrades): Registro colunar dos trades realizados
+        metricas_online (MetricasOnline): Métricas incrementais dos trades ao vivo
     """
     
     def __init__(self, capital_inicial=10000, risco_por_trade=0.02,
@@ -58,7 +65,10 @@ class RoboTrading:
         self.trailing_stop = trailing_stop
         self.modelo = None
         self.scaler = StandardScaler()
-        self.historico_trades = []
+        self.historico_trades = RegistroTrades()
+        self.metricas_online = MetricasOnline(capital_inicial)
+        self._entradas_ao_vivo = {}
+        self._x_ao_vivo = np.empty((1, len(FEATURES_MODELO)))
         
         logger.info(f"Robô inicializado com capital: R${capital_inicial:.2f}")
         logger.info(f"Risco por trade: {risco_por_trade*100:.1f}%")
@@ -116,10 +126,7 @@ class RoboTrading:
         """
         logger.info("Iniciando treinamento do modelo...")
         
-        features = ['open', 'high', 'low', 'close', 'volume', 'rsi', 'macd', 'macd_signal',
-                   'sma_20', 'ema_20', 'bb_upper', 'bb_lower', 'atr', 'volume_change',
-                   'obv', 'adx']
-        X = df[features].replace([np.inf, -np.inf], np.nan).fillna(0)
+        X = matriz_features(df).to_numpy(dtype=float)
         y = df['target_class']
         X_train, X_test, y_train, y_test = train_test_split(X, y, shuffle=False, test_size=0.2)
         X_train_scaled = self.scaler.fit_transform(X_train)
@@ -146,14 +153,64 @@ class RoboTrading:
         logger.info("Modelo treinado com sucesso!")
         return probs
 
-    def executar_backtest(self, df, probs, modo="padrao"):
+    def salvar_modelo(self, caminho):
+        """
+        Salva o modelo e o scaler treinados em um arquivo.
+
+        Args:
+            caminho (str): Arquivo de destino
+        """
+        if self.modelo is None:
+            raise ValueError("O modelo precisa ser treinado antes de ser salvo.")
+
+        with open(caminho, 'wb') as f:
+            pickle.dump({'modelo': self.modelo, 'scaler': self.scaler}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logger.info(f"Modelo salvo em {caminho}")
+
+    def carregar_modelo(self, caminho):
+        """
+        Carrega o modelo e o scaler salvos com salvar_modelo.
+
+        Args:
+            caminho (str): Arquivo salvo
+        """
+        with open(caminho, 'rb') as f:
+            salvo = pickle.load(f)
+        self.modelo, self.scaler = salvo['modelo'], salvo['scaler']
+        logger.info(f"Modelo carregado de {caminho}")
+
+    def _estrategia(self, modo):
+        """
+        Monta a estratégia do motor de backtest com os parâmetros do robô.
+
+        Args:
+            modo (str): Preset do motor de backtest
+
+        Returns:
+            Estrategia: Estratégia configurada
+        """
+        estrategia = estrategia_do_modo(
+            modo,
+            stop_loss_pct=self.stop_loss,
+            take_profit_pct=self.take_profit
+        )
+        if not self.trailing_stop:
+            estrategia = estrategia.com_parametros(trailing_stop_offset=None)
+        return estrategia
+
+    def executar_backtest(self, df, probs, modo="padrao", intrabar=False, sub_barras=None,
+                          timeframe=None):
         """
         Executa backtest com os dados e previsões.
         
         Args:
             df (pd.DataFrame): DataFrame com dados históricos
             probs (np.array): Probabilidades de previsão
-            modo (str): Modo de operação ('super_agressivo' ou 'conservador')
+            modo (str): Preset do motor de backtest ('padrao', 'agressivo' ou 'super_agressivo')
+            intrabar (bool): Resolver as saídas pela máxima e mínima de cada barra
+            sub_barras (pd.DataFrame, optional): Barras de 1 minuto para desempatar
+                barras que tocam o stop loss e o take profit
+            timeframe (str, optional): Duração das barras de 'df' (ex.: '15min')
             
         Returns:
             tuple: (métricas, DataFrame de teste, entradas, saídas)
@@ -171,63 +228,277 @@ class RoboTrading:
         print("✅ Sinais de compra:", df_test['sinal_compra'].sum())
         print("✅ Combinação válida (compra + filtro):", ((df_test['sinal_compra'] == 1) & (df_test['filtros_ok'])).sum())
 
-        if modo in ["agressivo", "super_agressivo"]:
-            retornos, entradas, saidas, tipos_saida = backtest_agressivo(
-                df_test,
-                probs,
-                capital_inicial=self.capital,
-                stop_loss_pct=self.stop_loss,
-                take_profit_pct=self.take_profit
-            )
-        else:
-            retornos, entradas, saidas, tipos_saida = backtest_avancado(
-                df_test,
-                probs,
-                capital_inicial=self.capital,
-                stop_loss_pct=self.stop_loss,
-                take_profit_pct=self.take_profit
-            )
-
-        if not (len(retornos) == len(entradas) == len(saidas) == len(tipos_saida)):
-            print("⚠️ Inconsistência nos resultados do backtest. Ignorando histórico.")
-        else:
-            for i, retorno in enumerate(retornos):
-                if retorno != 0:
-                    self.historico_trades.append({
-                        'data_entrada': entradas[i][0],
-                        'data_saida': saidas[i][0],
-                        'tipo_saida': tipos_saida[i],
-                        'retorno': retorno
-                    })
-
-        if len(retornos) == len(tipos_saida):
-            print(f"📦 Total retornos: {len(retornos)}")
-            print(f"📦 Total tipos_saida: {len(tipos_saida)}")
-            print(f"📦 Trades positivos: {sum([1 for r in retornos if r != 0])}")
-            print(f"📦 Tipos únicos: {set(tipos_saida)}")
-            print(f"✅ Verificação manual dos retornos > 0: {[r for r in retornos if r > 0]}")
-
-            metricas = calculo_desempenho(retornos, tipos_saida)
-        else:
-            print("⚠️ Não foi possível calcular métricas — listas inconsistentes.")
-            metricas = {'total_trades': 0}
+        resultado = executar_estrategia(df_test, probs, self._estrategia(modo), capital_inicial=self.capital,
+                                        intrabar=intrabar, sub_barras=sub_barras, timeframe=timeframe)
+        trades = resultado['trades']
+        entradas, saidas = entradas_saidas(trades, df_test.index, resultado['entrada_aberta'])
+
+        self.historico_trades.estender(trades[trades['resultado'] != 0])
+
+        print(f"📦 Total retornos: {len(trades)}")
+        print(f"📦 Trades positivos: {np.count_nonzero(trades['resultado'])}")
+        print(f"📦 Tipos únicos: {set(nomes_tipos_saida(np.unique(trades['tipo_saida'])))}")
+
+        metricas = calculo_desempenho(trades['resultado'], trades['tipo_saida'], relatorio=True)
 
         logger.info("Backtest concluído!")
         return metricas, df_test, entradas, saidas
 
-    def monitorar_mercado(self, dados_atuais):
+    def comparar_modos(self, df, probs, modos=("padrao", "agressivo", "super_agressivo"),
+                       limiares=None):
+        """
+        Compara vários modos de backtest em uma única passagem pelos dados.
+
+        Args:
+            df (pd.DataFrame): DataFrame com dados históricos
+            probs (np.array): Probabilidades de previsão
+            modos (tuple): Presets do motor de backtest a comparar
+            limiares (list, optional): Limiares de probabilidade a testar em cada modo
+
+        Returns:
+            pd.DataFrame: Tabela de métricas lado a lado, uma linha por variante
+        """
+        logger.info(f"Comparando modos {', '.join(modos)}...")
+
+        df_test = df.iloc[-len(probs):]
+        estrategias = [self._estrategia(modo) for modo in modos]
+        tabela = comparar_estrategias(df_test, probs, estrategias, limiares=limiares,
+                                      capital_inicial=self.capital)
+
+        logger.info("Comparação de modos concluída!")
+        return tabela
+
+    def executar_backtest_portfolio(self, dados, probs, modo="padrao", max_posicoes=10,
+                                    memoria_max_mb=256):
+        """
+        Executa backtest de vários ativos compartilhando o capital do robô.
+
+        Args:
+            dados (dict): Ticker -> DataFrame com dados históricos e filtros
+            probs (dict): Ticker -> probabilidades de previsão alinhadas aos dados
+            modo (str): Preset do motor de backtest
+            max_posicoes (int): Máximo de posições abertas simultaneamente
+            memoria_max_mb (float): Orçamento de memória das matrizes de cada bloco de barras
+
+        Returns:
+            dict: Trades, curva de patrimônio, capital final e retorno total
+        """
+        logger.info(f"Iniciando backtest de portfólio no modo {modo}...")
+
+        resultado = backtest_portfolio(
+            dados,
+            probs,
+            self._estrategia(modo),
+            capital_inicial=self.capital,
+            risco_por_trade=self.risco_por_trade,
+            max_posicoes=max_posicoes,
+            memoria_max_mb=memoria_max_mb
+        )
+
+        logger.info("Backtest de portfólio concluído!")
+        return resultado
+
+    def executar_walk_forward(self, df, modo="padrao", **parametros):
+        """
+        Executa a avaliação walk-forward sobre todo o histórico preparado.
+
+        Args:
+            df (pd.DataFrame): DataFrame preparado por preparar_dados
+            modo (str): Preset do motor de backtest
+            **parametros: Parâmetros do WalkForward (tamanho_treino, tamanho_teste, passo, ...)
+
+        Returns:
+            dict: Resultado de WalkForward.executar, com a curva de patrimônio fora da amostra
+        """
+        logger.info(f"Iniciando walk-forward no modo {modo}...")
+
+        resultado = WalkForward(**parametros).executar(df, self._estrategia(modo),
+                                                       capital_inicial=self.capital)
+
+        logger.info("Walk-forward concluído!")
+        return resultado
+
+    def registrar_trade(self, data_entrada, data_saida, preco_entrada, preco_saida,
+                        tipo_saida, resultado):
+        """
+        Registra um trade fechado na operação ao vivo.
+
+        Acrescenta o trade ao histórico e atualiza as métricas incrementais,
+        sem recalcular o histórico inteiro.
+
+        Args:
+            data_entrada (datetime): Data da entrada
+            data_saida (datetime): Data da saída
+            preco_entrada (float): Preço de entrada
+            preco_saida (float): Preço de saída
+            tipo_saida (str): 'stop_loss' ou 'take_profit'
+            resultado (float): Resultado financeiro do trade
+
+        Returns:
+            dict: Resumo atualizado das métricas
+        """
+        # Trades ao vivo não têm índice de barra (-1)
+        self.historico_trades.adicionar(-1, -1, data_utc(data_entrada), data_utc(data_saida),
+                                        preco_entrada, preco_saida, CODIGO_TIPO_SAIDA[tipo_saida], resultado)
+        self.metricas_online.registrar(resultado, tipo_saida)
+
+        resumo = self.metricas_online.resumo()
+        logger.info(f"Trade registrado: resultado R${resultado:.2f}, "
+                    f"win rate {resumo['win_rate']*100:.1f}%, drawdown {resumo['drawdown_atual']*100:.1f}%")
+        return resumo
+
+    def registrar_execucao(self, execucao, ordem=None):
+        """
+        Acompanha as execuções da corretora e registra os trades fechados.
+
+        Uma compra abre a entrada do ativo; a venda seguinte a fecha e chama
+        registrar_trade com o resultado (preço de saída menos o de entrada,
+        vezes a quantidade da entrada). O tipo de saída vem da comparação do
+        preço de saída com o stop loss e o take profit da ordem de entrada,
+        quando conhecidos, ou do sinal do resultado. Execuções parciais não
+        são agregadas: cada compra substitui a entrada em aberto do ativo.
+
+        Args:
+            execucao (dict): Execução da corretora (evento 'execucao' do
+                FluxoMercado), com 'symbol', 'side', 'quantity', 'price' e
+                'timestamp' em ms
+            ordem (dict, optional): Argumentos da ordem de origem
+                (OrdemDespachada.ordem), com 'stop_loss' e 'take_profit'
+
+        Returns:
+            dict or None: Resumo das métricas se a execução fechou um trade
+        """
+        simbolo = execucao['symbol']
+        data = pd.Timestamp(int(execucao['timestamp']), unit='ms', tz='UTC')
+        preco = float(execucao['price'])
+
+        if str(execucao['side']).upper() in ('BUY', 'COMPRA'):
+            ordem = ordem or {}
+            self._entradas_ao_vivo[simbolo] = {
+                'data': data,
+                'preco': preco,
+                'quantidade': float(execucao['quantity']),
+                'stop_loss': ordem.get('stop_loss'),
+                'take_profit': ordem.get('take_profit')
+            }
+            return None
+
+        entrada = self._entradas_ao_vivo.pop(simbolo, None)
+        if entrada is None:
+            logger.warning(f"Venda de {simbolo} sem entrada conhecida; trade não registrado")
+            return None
+
+        resultado = (preco - entrada['preco']) * entrada['quantidade']
+        if entrada['stop_loss'] is not None and preco <= entrada['stop_loss']:
+            tipo_saida = 'stop_loss'
+        elif entrada['take_profit'] is not None and preco >= entrada['take_profit']:
+            tipo_saida = 'take_profit'
+        else:
+            tipo_saida = 'take_profit' if resultado > 0 else 'stop_loss'
+        return self.registrar_trade(entrada['data'], data, entrada['preco'], preco, tipo_saida, resultado)
+
+    def monitorar_mercado(self, dados_atuais, ativo=None, modo="padrao"):
         """
         Monitora o mercado em tempo real e gera sinais.
-        
+
+        Prevê a probabilidade de alta do último candle e avalia as regras de
+        entrada da estratégia do modo. Com um BufferCandles, os indicadores
+        e filtros já estão atualizados no buffer e são lidos sem cópia; com
+        um DataFrame, são calculados sobre os dados recebidos. O preço de
+        entrada inclui o slippage e os níveis de stop loss e take profit
+        seguem o motor de backtest. O tamanho da posição arrisca
+        'risco_por_trade' do capital até o stop, limitado ao capital.
+
         Args:
-            dados_atuais (pd.DataFrame): Dados atuais do mercado
-            
+            dados_atuais (BufferCandles or pd.DataFrame): Buffer do ativo ou
+                dados atuais do mercado (OHLCV), com candles suficientes para
+                os indicadores
+            ativo (str, optional): Símbolo do ativo, repassado no sinal
+            modo (str): Preset do motor de backtest
+
         Returns:
             dict or None: Sinal de operação ou None se não houver sinal
         """
         logger.info("Monitorando mercado...")
-        
-        # Implementar lógica de monitoramento aqui
-        # ...
-        
-        return sinal
\ No newline at end of file
+
+        if self.modelo is None:
+            raise ValueError("O modelo precisa ser treinado antes de monitorar o mercado.")
+
+        if isinstance(dados_atuais, BufferCandles):
+            if not dados_atuais.pronto:
+                return None
+            barra = dados_atuais.barra_atual()
+            data = pd.Timestamp(int(dados_atuais.tempos(1)[0]), unit='ms', tz='UTC')
+            # Mesma transformação de matriz_features + scaler, sobre um array reaproveitado
+            x = self._x_ao_vivo
+            np.copyto(x, dados_atuais.features())
+            np.nan_to_num(x, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+            x -= self.scaler.mean_
+            x /= self.scaler.scale_
+        else:
+            barra = aplicar_filtros_tecnicos(self.adicionar_indicadores(dados_atuais.copy())).iloc[-1:]
+            data = barra.index[0]
+            x = self.scaler.transform(matriz_features(barra).to_numpy(dtype=float))
+        prob = self.modelo.predict_proba(x)[:, 1]
+
+        estrategia = self._estrategia(modo)
+        if not estrategia.sinal_entrada(barra, prob)[0]:
+            return None
+        return self._montar_sinal(estrategia, barra, data, float(prob[0]), ativo)
+
+    def _montar_sinal(self, estrategia, barra, data, probabilidade, ativo):
+        """
+        Monta o sinal de compra de uma barra que passou nas regras de entrada.
+        """
+        preco_entrada = estrategia.custos.preco_entrada(float(np.asarray(barra['close'])[0]))
+        sinal = {
+            'ativo': ativo,
+            'data': data,
+            'probabilidade': probabilidade,
+            'preco_entrada': preco_entrada,
+            'stop_loss': preco_entrada * (1 - estrategia.stop_loss_pct / estrategia.alavancagem),
+            'take_profit': preco_entrada * (1 + estrategia.take_profit_pct / estrategia.alavancagem),
+            'tamanho_posicao': min(self.capital, self.capital * self.risco_por_trade / estrategia.stop_loss_pct)
+        }
+
+        logger.info(f"Sinal de compra gerado: probabilidade {sinal['probabilidade']:.2f}, "
+                    f"entrada {preco_entrada:.2f}")
+        return sinal
+
+    def avaliar_buffers(self, buffers, modo="padrao"):
+        """
+        Avalia de uma vez o último candle de vários ativos.
+
+        Equivale a chamar monitorar_mercado para cada buffer, mas as features
+        de todos os ativos prontos formam uma única matriz e o modelo faz uma
+        só previsão, o que reduz o custo por ativo quando muitos candles
+        fecham ao mesmo tempo.
+
+        Args:
+            buffers (dict): Símbolo -> BufferCandles
+            modo (str): Preset do motor de backtest
+
+        Returns:
+            dict: Símbolo -> sinal, só para os ativos com sinal
+        """
+        if self.modelo is None:
+            raise ValueError("O modelo precisa ser treinado antes de monitorar o mercado.")
+
+        prontos = [(simbolo, buffer) for simbolo, buffer in buffers.items() if buffer.pronto]
+        if not prontos:
+            return {}
+
+        x = np.vstack([buffer.features() for _, buffer in prontos])
+        np.nan_to_num(x, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        x -= self.scaler.mean_
+        x /= self.scaler.scale_
+        probs = self.modelo.predict_proba(x)[:, 1]
+
+        estrategia = self._estrategia(modo)
+        sinais = {}
+        for (simbolo, buffer), prob in zip(prontos, probs):
+            barra = buffer.barra_atual()
+            if estrategia.sinal_entrada(barra, np.array([prob]))[0]:
+                data = pd.Timestamp(int(buffer.tempos(1)[0]), unit='ms', tz='UTC')
+                sinais[simbolo] = self._montar_sinal(estrategia, barra, data, float(prob), simbolo)
+        return sinais
@@ -49,6 +49,78 @@ BACKTEST_CONFIG = {
     'alavancagem': 2.0           # Mantida alavancagem de 2x
 }
 
+# Configurações do cache de resultados de backtest
+CACHE_CONFIG = {
+    'max_itens': 128,             # Resultados mantidos em memória (LRU)
+    'diretorio': None,            # Pasta do cache em disco (None desativa)
+    'max_mb_disco': 512           # Tamanho máximo do cache em disco
+}
+
+# Configurações do backtest walk-forward
+WALK_FORWARD_CONFIG = {
+    'tamanho_treino': 2000,       # Barras de treino por janela
+    'tamanho_teste': 500,         # Barras de teste (fora da amostra) por janela
+    'passo': None,                # Deslocamento entre janelas (None = tamanho_teste)
+    'processos': None,            # Processos de treino (None = todos os núcleos)
+    'max_janelas_memoria': 64,    # Modelos de janelas mantidos em memória
+    'diretorio_cache': None       # Pasta para persistir os modelos das janelas
+}
+
+# Configurações da conexão com a corretora
+CONEXAO_CONFIG = {
+    'base_url': 'https://api.exchange.com',
+    'timeout': 10,                # Timeout padrão por requisição (segundos)
+    'max_conexoes': 20,           # Conexões keep-alive simultâneas no pool
+    'keepalive': 30,              # Segundos que uma conexão ociosa fica aberta
+    'candles_por_pagina': 1000,   # Candles por requisição nas cargas de histórico paginadas
+    'ttl_estado': 30              # Segundos que posições e saldo ficam em cache (0 desativa)
+}
+
+# Configurações do agendador de requisições da corretora (limite de taxa, retentativas e disjuntor)
+AGENDADOR_CONFIG = {
+    'limites': {                  # Endpoint -> (requisições por segundo, rajada)
+        'padrao': (10, 20),
+        '/market/history': (10, 20),
+        '/order': (5, 10)
+    },
+    'tentativas': 4,              # Tentativas de GETs idempotentes após falhas transitórias
+    'backoff_base': 0.5,          # Espera base (s) da primeira retentativa, dobrada a cada nova
+    'backoff_max': 8,             # Teto (s) da espera entre tentativas
+    'limite_falhas': 5,           # Falhas transitórias seguidas que abrem o disjuntor
+    'tempo_recuperacao': 30,      # Segundos com o disjuntor aberto antes da requisição de teste
+    'janela_latencias': 1000      # Latências mantidas por endpoint para p50/p99
+}
+
+# Configurações do despacho assíncrono de ordens
+DESPACHO_CONFIG = {
+    'lote_max': 10,               # Máximo de ordens por requisição ao endpoint de lote
+    'espera_lote': 0.0,           # Segundos aguardando mais ordens (0 = só as já enfileiradas)
+    'usar_lote': True,            # Usar /orders/batch (desligado sozinho se a corretora responder 404)
+    'prefixo_id': 'robo',         # Prefixo dos clientOrderId gerados
+    'historico_ordens': 1000,     # Ordens mantidas para associar execuções pelo clientOrderId
+    'intervalo_reconciliacao': 1.0,   # Segundos até consultar uma ordem com envio sem resposta
+    'intervalo_reconciliacao_max': 30.0,  # Teto (s) do intervalo, dobrado a cada consulta sem resposta
+    'janela_latencias': 1000      # Latências mantidas para p50/p99
+}
+
+# Configurações da execução ao vivo de vários ativos em processos
+EXECUTOR_CONFIG = {
+    'processos': 4,               # Processos (shards); None = núcleos da máquina
+    'candles_iniciais': 500,      # Candles baixados por ativo para aquecer os indicadores
+    'janela_agrupamento': 0.05,   # Segundos agrupando candles que fecham juntos em uma avaliação
+    'intervalo_metricas': 10,     # Segundos entre relatórios de cada shard
+    'janela_latencias': 1000      # Atrasos mantidos por shard para p50/p99
+}
+
+# Configurações do fluxo de dados de mercado ao vivo
+FLUXO_CONFIG = {
+    'modo': 'auto',               # 'websocket', 'polling' ou 'auto' (websocket com fallback)
+    'caminho_ws': '/ws',          # Endpoint do websocket na base_url
+    'intervalo_polling': 5,       # Segundos entre novas consultas de candles ainda não consolidados
+    'tentativas_fechamento': 6,   # Consultas por fechamento antes de desistir (ex.: mercado sem negócios)
+    'folga_fechamento': 0.5       # Segundos após o fechamento do candle antes de consultar
+}
+
 # Configurações de Visualização
 VISUALIZATION_CONFIG = {
     'show_plots': True,
@@ -0,0 +1,334 @@
+"""
+Decodificação colunar das respostas de candles da corretora.
+Converte o corpo JSON de /market/history direto em colunas tipadas (timestamp
+int64 e OHLCV float64), com verificação de esquema, sem montar o DataFrame a
+partir de uma lista de dicionários. Respostas paginadas são gravadas em
+sequência em buffers pré-alocados; cargas longas sem 'since' recuam o início
+até reunir os candles pedidos. Usa orjson quando instalado.
+"""
+
+import json
+import time
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COLUNAS_CANDLE = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TIPOS_CANDLE = {coluna: np.float64 for coluna in COLUNAS_CANDLE}
+TIPOS_CANDLE['timestamp'] = np.int64
+
+
+def carregar_json(corpo):
+    """
+    Decodifica um corpo JSON com orjson, ou com o módulo json se ele não estiver instalado.
+
+    Args:
+        corpo (bytes or str): Corpo da resposta
+
+    Returns:
+        dict or list: Conteúdo decodificado
+    """
+    if orjson is not None:
+        return orjson.loads(corpo)
+    return json.loads(corpo)
+
+
+def inicio_historico(timeframe, limite, agora_ms):
+    """
+    Timestamp (ms) do primeiro dos últimos 'limite' candles, incluindo o corrente.
+
+    Ponto de partida de uma carga de histórico paginada para a frente com
+    'since'. Em mercados com pausas (ex.: ações fora do pregão) há menos
+    candles que 'limite' a partir dele; CargaHistorico recua o início
+    até completá-los.
+
+    Args:
+        timeframe (str): Intervalo dos candles (ex.: '15min')
+        limite (int): Número de candles
+        agora_ms (int): Instante atual em ms
+
+    Returns:
+        int: Timestamp inicial em ms
+    """
+    passo_ms = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+    return (int(agora_ms) // passo_ms - limite + 1) * passo_ms
+
+
+class ColunasCandles:
+    """
+    Buffer pré-alocado de candles em colunas tipadas.
+
+    Cada página decodificada é gravada logo após a anterior; as colunas só
+    são copiadas ao gerar o DataFrame final.
+
+    Attributes:
+        capacidade (int): Número máximo de candles
+        tamanho (int): Candles gravados
+        colunas (dict): Coluna -> array de 'capacidade' posições
+    """
+
+    def __init__(self, capacidade):
+        """
+        Aloca as colunas.
+
+        Args:
+            capacidade (int): Número máximo de candles
+        """
+        self.capacidade = int(capacidade)
+        self.tamanho = 0
+        self.colunas = {c: np.empty(self.capacidade, dtype=TIPOS_CANDLE[c]) for c in COLUNAS_CANDLE}
+
+    @property
+    def livre(self):
+        """Posições ainda disponíveis."""
+        return self.capacidade - self.tamanho
+
+    @property
+    def ultimo_timestamp(self):
+        """Timestamp (ms) do último candle gravado, ou None se vazio."""
+        return int(self.colunas['timestamp'][self.tamanho - 1]) if self.tamanho else None
+
+    def acrescentar(self, corpo):
+        """
+        Decodifica uma resposta de candles e a grava após os candles existentes.
+
+        Aceita uma lista de candles (objetos), um objeto de colunas
+        ({'timestamp': [...], 'open': [...], ...}) ou qualquer dos dois em um
+        envelope {'data': ...}. Campos além de COLUNAS_CANDLE são ignorados.
+
+        Args:
+            corpo (bytes or str or list or dict): Corpo JSON da resposta, ou já decodificado
+
+        Returns:
+            int: Número de candles gravados
+
+        Raises:
+            ValueError: Se faltar um campo, houver valor não numérico ou não
+                finito, colunas de tamanhos diferentes, timestamps fora de
+                ordem ou repetidos, ou se o buffer não comportar a página
+        """
+        dados = carregar_json(corpo) if isinstance(corpo, (bytes, bytearray, str)) else corpo
+        if isinstance(dados, dict) and 'data' in dados:
+            dados = dados['data']
+
+        if isinstance(dados, dict):
+            faltando = [c for c in COLUNAS_CANDLE if c not in dados]
+            if faltando:
+                raise ValueError(f"Resposta de candles sem as colunas {faltando}")
+            n = len(dados['timestamp'])
+            if any(len(dados[c]) != n for c in COLUNAS_CANDLE):
+                raise ValueError("Colunas de candles com tamanhos diferentes")
+            valores = {c: dados[c] for c in COLUNAS_CANDLE}
+        elif isinstance(dados, list):
+            n = len(dados)
+            valores = {c: map(itemgetter(c), dados) for c in COLUNAS_CANDLE}
+        else:
+            raise ValueError(f"Resposta de candles inesperada: {type(dados).__name__}")
+
+        if n > self.livre:
+            raise ValueError(f"Página de {n} candles excede o espaço livre do buffer ({self.livre})")
+
+        fim = self.tamanho + n
+        for coluna in COLUNAS_CANDLE:
+            try:
+                self.colunas[coluna][self.tamanho:fim] = np.fromiter(valores[coluna], TIPOS_CANDLE[coluna], count=n)
+            except KeyError:
+                raise ValueError(f"Candle sem o campo '{coluna}'") from None
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Campo '{coluna}' com valor inválido: {str(e)}") from None
+
+        tempos = self.colunas['timestamp'][max(self.tamanho - 1, 0):fim]
+        if np.any(tempos[1:] <= tempos[:-1]):
+            raise ValueError("Timestamps de candles fora de ordem ou repetidos")
+        for coluna in COLUNAS_CANDLE[1:]:
+            if not np.isfinite(self.colunas[coluna][self.tamanho:fim]).all():
+                raise ValueError(f"Campo '{coluna}' com valor não finito")
+
+        self.tamanho = fim
+        return n
+
+    def para_dataframe(self):
+        """
+        DataFrame com os candles gravados, nas colunas de COLUNAS_CANDLE.
+
+        Returns:
+            pd.DataFrame: Candles com timestamp int64 e OHLCV float64
+        """
+        # O construtor do DataFrame copia as colunas (e agrupa as float64 em um bloco)
+        return pd.DataFrame({c: self.colunas[c][:self.tamanho] for c in COLUNAS_CANDLE})
+
+
+class CargaHistorico:
+    """
+    Plano de páginas de uma carga de histórico com 'since'.
+
+    Com 'desde', ou até uma página de candles, as páginas seguem para a
+    frente a partir dele. Sem 'desde', a carga parte de inicio_historico e,
+    se vierem menos que 'limite' candles (pausas do mercado), recua o início
+    em janelas dimensionadas pela densidade de candles já observada, cada
+    uma paginada para a frente até o início da anterior. Janelas vazias
+    dobram de largura; uma janela vazia de MAX_RECUO * 'limite' períodos
+    marca o início do histórico. O cliente pede cada página com proxima e
+    entrega o corpo da resposta com receber:
+
+        carga = CargaHistorico('15min', 5000)
+        pedido = carga.proxima()
+        while pedido is not None:
+            carga.receber(baixar(limit=pedido['limit'], since=pedido.get('since')))
+            pedido = carga.proxima()
+        dados = carga.para_dataframe()
+
+    Attributes:
+        limite (int): Número de candles pedidos
+        pagina (int): Candles por requisição
+        requisicoes (int): Páginas pedidas até agora
+    """
+
+    MAX_RECUO = 8
+
+    def __init__(self, timeframe, limite, desde=None, pagina=1000, agora_ms=None):
+        """
+        Prepara a primeira janela da carga.
+
+        Args:
+            timeframe (str): Intervalo dos candles (ex.: '15min')
+            limite (int): Número de candles
+            desde (int, optional): Só candles com timestamp (ms) a partir deste
+            pagina (int): Candles por requisição
+            agora_ms (int, optional): Instante atual em ms (padrão: agora)
+        """
+        self.limite = int(limite)
+        self.pagina = int(pagina)
+        self.requisicoes = 0
+        self._passo = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+        self._recuar = desde is None and self.limite > self.pagina
+        self._terminada = False
+        # (buffer, fim exclusivo da janela ou None), da janela mais antiga para a mais recente
+        self._janelas = []
+
+        if self._recuar:
+            agora_ms = time.time() * 1000 if agora_ms is None else agora_ms
+            self._inicio = inicio_historico(timeframe, self.limite, agora_ms)
+            self._fim_carga = self._inicio + self.limite * self._passo
+            self._abrir(self._inicio, self.limite, None)
+        else:
+            self._abrir(desde, self.limite, None)
+
+    def _abrir(self, inicio, capacidade, fim):
+        """Abre a janela [inicio, fim), paginada para a frente a partir de 'inicio'."""
+        self._atual = ColunasCandles(capacidade)
+        self._fim = fim
+        self._cursor = inicio
+        self._janelas.insert(0, (self._atual, fim))
+
+    @staticmethod
+    def _antes_do_fim(buffer, fim):
+        """Candles do buffer anteriores a 'fim' (todos, se 'fim' for None)."""
+        if fim is None:
+            return buffer.tamanho
+        return int(np.searchsorted(buffer.colunas['timestamp'][:buffer.tamanho], fim))
+
+    @property
+    def obtidos(self):
+        """Candles reunidos até agora."""
+        return sum(self._antes_do_fim(buffer, fim) for buffer, fim in self._janelas)
+
+    @property
+    def completa(self):
+        """Se a carga terminou com todos os candles pedidos (sem 'desde')."""
+        return self._terminada and self.obtidos >= self.limite
+
+    def proxima(self):
+        """
+        Parâmetros da próxima página.
+
+        Returns:
+            dict or None: {'limit': ..., 'since': ...} ('since' ausente na
+                carga de uma só página sem 'desde'), ou None se a carga terminou
+        """
+        if self._terminada:
+            return None
+        self._pedido = min(self.pagina, self._atual.livre)
+        self.requisicoes += 1
+        if self._cursor is None:
+            return {'limit': self._pedido}
+        return {'limit': self._pedido, 'since': int(self._cursor)}
+
+    def receber(self, corpo):
+        """
+        Grava a página pedida por proxima e prepara a seguinte.
+
+        Args:
+            corpo (bytes or str or list or dict): Corpo JSON da resposta, ou já decodificado
+
+        Returns:
+            int: Candles da página
+        """
+        n = self._atual.acrescentar(corpo)
+        if n == self._pedido and self._atual.livre and (
+                self._fim is None or self._atual.ultimo_timestamp < self._fim):
+            self._cursor = self._atual.ultimo_timestamp + 1
+        elif self._recuar:
+            self._recuar_inicio()
+        else:
+            self._terminada = True
+        return n
+
+    def _recuar_inicio(self):
+        """Abre uma janela antes da atual se ainda faltarem candles."""
+        obtidos = self.obtidos
+        faltam = self.limite - obtidos
+        largura = ((self._fim_carga if self._fim is None else self._fim) - self._inicio) // self._passo
+        vazia = self._antes_do_fim(self._atual, self._fim) == 0
+        if faltam <= 0 or (vazia and largura >= self.MAX_RECUO * self.limite):
+            self._terminada = True
+            return
+
+        if vazia:
+            janela = 2 * largura
+        else:
+            # Períodos necessários na densidade de candles observada até aqui
+            periodos = (self._fim_carga - self._inicio) // self._passo
+            janela = -(-faltam * periodos // obtidos)
+        janela = min(max(janela, faltam), self.MAX_RECUO * self.limite)
+        fim, self._inicio = self._inicio, self._inicio - janela * self._passo
+        self._abrir(self._inicio, janela, fim)
+
+    def para_dataframe(self):
+        """
+        DataFrame com os últimos 'limite' candles reunidos, em ordem.
+
+        Returns:
+            pd.DataFrame: Candles com timestamp int64 e OHLCV float64
+        """
+        if len(self._janelas) == 1:
+            return self._atual.para_dataframe()
+        partes = [(buffer, self._antes_do_fim(buffer, fim)) for buffer, fim in self._janelas]
+        return pd.DataFrame({
+            c: np.concatenate([buffer.colunas[c][:n] for buffer, n in partes])[-self.limite:]
+            for c in COLUNAS_CANDLE
+        })
+
+
+def decodificar_candles(corpo):
+    """
+    Decodifica uma única resposta de candles em um DataFrame tipado.
+
+    Args:
+        corpo (bytes or str or list or dict): Corpo JSON da resposta, ou já decodificado
+
+    Returns:
+        pd.DataFrame: Candles com timestamp int64 e OHLCV float64
+    """
+    dados = carregar_json(corpo) if isinstance(corpo, (bytes, bytearray, str)) else corpo
+    conteudo = dados['data'] if isinstance(dados, dict) and 'data' in dados else dados
+    n = len(conteudo['timestamp']) if isinstance(conteudo, dict) and 'timestamp' in conteudo else len(conteudo)
+    colunas = ColunasCandles(n)
+    colunas.acrescentar(dados)
+    return colunas.para_dataframe()
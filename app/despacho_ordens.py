@@ -0,0 +1,373 @@
+"""
+Despacho assíncrono de ordens.
+As ordens geradas pelos sinais entram em uma fila e são enviadas à corretora
+por uma thread de fundo, em lotes quando a corretora aceita, para que a
+avaliação de sinais nunca espere pela rede. Cada ordem recebe um
+clientOrderId, usado para associar confirmações e execuções à ordem de origem
+e para reconciliar as ordens cujo envio terminou sem resposta.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import numpy as np
+import requests
+from logger import logger
+from config import DESPACHO_CONFIG
+
+
+def _resultado_incerto(erro):
+    """
+    Indica se a ordem pode ter chegado à corretora apesar do erro no envio
+    (timeout, queda da conexão ou HTTP 5xx).
+    """
+    if isinstance(erro, requests.HTTPError):
+        return erro.response is not None and erro.response.status_code >= 500
+    return isinstance(erro, (requests.ConnectionError, requests.Timeout))
+
+
+class OrdemDespachada(Future):
+    """
+    Future da confirmação de uma ordem enfileirada.
+
+    O resultado é a confirmação da corretora; em caso de falha ou rejeição,
+    a exceção correspondente.
+
+    Attributes:
+        id_cliente (str): clientOrderId atribuído à ordem
+        ordem (dict): Argumentos de ConexaoCorretora.enviar_ordem
+        enfileirada (float): Instante (perf_counter) da entrada na fila
+        enviada (float): Instante do envio à corretora (None até lá)
+        execucoes (list): Notificações de execução recebidas para a ordem
+    """
+
+    def __init__(self, id_cliente, ordem):
+        super().__init__()
+        self.id_cliente = id_cliente
+        self.ordem = ordem
+        self.enfileirada = time.perf_counter()
+        self.enviada = None
+        self.execucoes = []
+        self._concluida = False
+
+
+class DespachoOrdens:
+    """
+    Fila de envio de ordens com thread de fundo.
+
+    A thread retira da fila a próxima ordem e as demais já enfileiradas (até
+    'lote_max', aguardando no máximo 'espera_lote' segundos por mais) e as
+    envia em uma única requisição ao endpoint de lote. Se a corretora não
+    tiver esse endpoint (404/405), passa a enviar uma ordem por requisição.
+    As confirmações são associadas às ordens pelo clientOrderId, nunca pela
+    posição na resposta.
+
+    Se o envio terminar sem resposta (timeout, queda da conexão ou HTTP 5xx),
+    a ordem pode ter sido executada: ela continua pendente (tem_pendente) e
+    a thread a consulta pelo clientOrderId, em intervalos crescentes até
+    'intervalo_reconciliacao_max', até a corretora confirmá-la ou responder
+    que não a conhece; só então a ordem falha. Uma execução notificada com o
+    clientOrderId também a resolve.
+
+    Attributes:
+        conexao (ConexaoCorretora): Conexão usada para os envios
+        lote_max (int): Máximo de ordens por requisição
+        espera_lote (float): Segundos aguardando mais ordens para o lote
+        usar_lote (bool): Se o endpoint de lote está disponível
+        prefixo_id (str): Prefixo dos clientOrderId gerados
+    """
+
+    def __init__(self, conexao, lote_max=None, espera_lote=None, usar_lote=None, prefixo_id=None):
+        """
+        Inicializa o despacho; parâmetros omitidos vêm de DESPACHO_CONFIG.
+
+        Args:
+            conexao (ConexaoCorretora): Conexão usada para os envios
+            lote_max (int, optional): Máximo de ordens por requisição
+            espera_lote (float, optional): Espera por mais ordens para o lote
+            usar_lote (bool, optional): Usar o endpoint de lote da corretora
+            prefixo_id (str, optional): Prefixo dos clientOrderId
+        """
+        self.conexao = conexao
+        self.lote_max = lote_max or DESPACHO_CONFIG['lote_max']
+        self.espera_lote = DESPACHO_CONFIG['espera_lote'] if espera_lote is None else espera_lote
+        self.usar_lote = DESPACHO_CONFIG['usar_lote'] if usar_lote is None else usar_lote
+        self.prefixo_id = prefixo_id or DESPACHO_CONFIG['prefixo_id']
+        self._fila = queue.Queue()
+        self._ordens = OrderedDict()
+        # clientOrderId -> [ordem, erro do envio, instante da próxima consulta, intervalo]
+        self._incertas = OrderedDict()
+        self._lock = threading.Lock()
+        self._tempos_fila = deque(maxlen=DESPACHO_CONFIG['janela_latencias'])
+        self._tempos_total = deque(maxlen=DESPACHO_CONFIG['janela_latencias'])
+        self._contagem = {'enfileiradas': 0, 'confirmadas': 0, 'falhas': 0, 'requisicoes': 0,
+                          'reconciliadas': 0}
+        self._thread = None
+
+    def iniciar(self):
+        """
+        Inicia a thread de envio.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout=10):
+        """
+        Envia as ordens ainda na fila e encerra a thread de envio.
+        """
+        if self._thread is not None:
+            self._fila.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enviar(self, simbolo, tipo, quantidade, preco=None, stop_loss=None, take_profit=None):
+        """
+        Enfileira uma ordem e retorna imediatamente.
+
+        Args:
+            simbolo (str): Símbolo do ativo
+            tipo (str): Tipo de ordem ('compra' ou 'venda')
+            quantidade (float): Quantidade a ser negociada
+            preco (float, optional): Preço limite
+            stop_loss (float, optional): Preço do stop loss
+            take_profit (float, optional): Preço do take profit
+
+        Returns:
+            OrdemDespachada: Future da confirmação, com o clientOrderId
+        """
+        ordem = OrdemDespachada(f"{self.prefixo_id}-{uuid.uuid4().hex[:20]}", {
+            'simbolo': simbolo, 'tipo': tipo, 'quantidade': quantidade, 'preco': preco,
+            'stop_loss': stop_loss, 'take_profit': take_profit
+        })
+        with self._lock:
+            self._ordens[ordem.id_cliente] = ordem
+            while len(self._ordens) > DESPACHO_CONFIG['historico_ordens']:
+                antiga = next(iter(self._ordens))
+                if not self._ordens[antiga].done():
+                    break
+                del self._ordens[antiga]
+            self._contagem['enfileiradas'] += 1
+        self._fila.put(ordem)
+        logger.info(f"Ordem {ordem.id_cliente} de {tipo} para {simbolo} enfileirada")
+        return ordem
+
+    def tem_pendente(self, simbolo):
+        """
+        Indica se há ordem do símbolo ainda sem confirmação.
+        """
+        with self._lock:
+            return any(o.ordem['simbolo'] == simbolo and not o.done() for o in self._ordens.values())
+
+    def registrar_execucao(self, execucao):
+        """
+        Associa uma notificação de execução à ordem de origem pelo clientOrderId.
+
+        Uma ordem ainda sem confirmação (ex.: envio sem resposta) é
+        confirmada pela execução.
+
+        Args:
+            execucao (dict): Execução da corretora (ex.: evento 'execucao' do FluxoMercado)
+
+        Returns:
+            OrdemDespachada or None: Ordem de origem, ou None se a execução
+                não veio deste despacho (ex.: stop disparado pela corretora)
+        """
+        with self._lock:
+            ordem = self._ordens.get(execucao.get('clientOrderId'))
+            if ordem is not None:
+                ordem.execucoes.append(execucao)
+        if ordem is not None and not ordem.done():
+            logger.info(f"Ordem {ordem.id_cliente} confirmada pela execução {execucao.get('orderId')}")
+            self._concluir(ordem, dict(execucao, status='FILLED'))
+        return ordem
+
+    # ------------------------------------------------------------------
+    # Thread de envio
+    # ------------------------------------------------------------------
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            try:
+                ordem = self._fila.get(timeout=self._espera_reconciliacao())
+            except queue.Empty:
+                self._reconciliar()
+                continue
+            if ordem is None:
+                break
+
+            lote = [ordem]
+            prazo = time.perf_counter() + self.espera_lote
+            while len(lote) < self.lote_max:
+                try:
+                    proxima = self._fila.get(timeout=max(prazo - time.perf_counter(), 0)) \
+                        if self.espera_lote > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proxima is None:
+                    encerrar = True
+                    break
+                lote.append(proxima)
+
+            try:
+                self._enviar_lote(lote)
+            except Exception as e:
+                self._falha_envio(lote, e)
+            self._reconciliar()
+
+        # Ao encerrar, uma última consulta das ordens ainda incertas
+        self._reconciliar(todas=True)
+
+    def _enviar_lote(self, lote):
+        """
+        Envia um lote de ordens e resolve as confirmações de cada uma.
+        """
+        agora = time.perf_counter()
+        for ordem in lote:
+            ordem.enviada = agora
+        with self._lock:
+            self._tempos_fila.extend(agora - o.enfileirada for o in lote)
+
+        if len(lote) > 1 and self.usar_lote:
+            with self._lock:
+                self._contagem['requisicoes'] += 1
+            try:
+                confirmacoes = self.conexao.enviar_ordens_lote(
+                    [dict(o.ordem, id_cliente=o.id_cliente) for o in lote])
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code not in (404, 405):
+                    raise
+                logger.warning("Corretora sem endpoint de lote; enviando uma ordem por requisição")
+                self.usar_lote = False
+            else:
+                por_id = {c.get('clientOrderId'): c for c in confirmacoes}
+                for ordem in lote:
+                    confirmacao = por_id.get(ordem.id_cliente)
+                    if confirmacao is None:
+                        self._concluir(ordem, erro=ValueError(f"Lote sem confirmação da ordem {ordem.id_cliente}"))
+                    elif confirmacao.get('status') == 'REJECTED':
+                        self._concluir(ordem, erro=ValueError(
+                            f"Ordem {ordem.id_cliente} rejeitada: {confirmacao.get('message')}"))
+                    else:
+                        self._concluir(ordem, confirmacao)
+                return
+
+        for ordem in lote:
+            with self._lock:
+                self._contagem['requisicoes'] += 1
+            try:
+                self._concluir(ordem, self.conexao.enviar_ordem(**ordem.ordem, id_cliente=ordem.id_cliente))
+            except Exception as e:
+                self._falha_envio([ordem], e)
+
+    def _falha_envio(self, ordens, erro):
+        """
+        Falha as ordens de um envio com erro, ou as deixa pendentes para
+        reconciliação se elas podem ter chegado à corretora.
+        """
+        if not _resultado_incerto(erro):
+            for ordem in ordens:
+                if not ordem.done():
+                    self._concluir(ordem, erro=erro)
+            return
+
+        intervalo = DESPACHO_CONFIG['intervalo_reconciliacao']
+        for ordem in ordens:
+            if not ordem.done():
+                logger.warning(f"Envio da ordem {ordem.id_cliente} sem resposta ({str(erro)}); "
+                               f"consultando pelo clientOrderId em {intervalo}s")
+                self._incertas[ordem.id_cliente] = [ordem, erro, time.monotonic() + intervalo, intervalo]
+
+    def _espera_reconciliacao(self):
+        """
+        Segundos até a próxima consulta de ordem incerta (None se não houver).
+        """
+        if not self._incertas:
+            return None
+        return max(min(item[2] for item in self._incertas.values()) - time.monotonic(), 0)
+
+    def _reconciliar(self, todas=False):
+        """
+        Consulta pelo clientOrderId as ordens incertas cuja vez chegou.
+
+        Args:
+            todas (bool): Consultar todas, sem esperar o intervalo de cada uma
+        """
+        agora = time.monotonic()
+        for id_cliente, item in list(self._incertas.items()):
+            ordem, erro, proxima, intervalo = item
+            if ordem.done():
+                # Resolvida por uma execução notificada
+                del self._incertas[id_cliente]
+                continue
+            if not todas and proxima > agora:
+                continue
+
+            with self._lock:
+                self._contagem['requisicoes'] += 1
+            try:
+                confirmacao = self.conexao.consultar_ordem(id_cliente)
+            except Exception as e:
+                intervalo = min(intervalo * 2, DESPACHO_CONFIG['intervalo_reconciliacao_max'])
+                logger.warning(f"Ordem {id_cliente} ainda sem reconciliação ({str(e)}); "
+                               f"nova consulta em {intervalo}s")
+                item[2:] = [time.monotonic() + intervalo, intervalo]
+                continue
+
+            del self._incertas[id_cliente]
+            if confirmacao is None:
+                # A corretora não recebeu a ordem: agora é seguro falhá-la
+                self._concluir(ordem, erro=erro)
+            elif confirmacao.get('status') == 'REJECTED':
+                self._concluir(ordem, erro=ValueError(
+                    f"Ordem {id_cliente} rejeitada: {confirmacao.get('message')}"))
+            else:
+                logger.info(f"Ordem {id_cliente} reconciliada: {confirmacao.get('orderId')}")
+                with self._lock:
+                    self._contagem['reconciliadas'] += 1
+                self._concluir(ordem, confirmacao)
+
+    def _concluir(self, ordem, confirmacao=None, erro=None):
+        """
+        Registra a latência de ponta a ponta e resolve o Future da ordem
+        (uma única vez, mesmo se a confirmação chegar por dois caminhos).
+        """
+        with self._lock:
+            if ordem._concluida:
+                return
+            ordem._concluida = True
+            self._tempos_total.append(time.perf_counter() - ordem.enfileirada)
+            self._contagem['falhas' if erro is not None else 'confirmadas'] += 1
+
+        if erro is not None:
+            logger.error(f"Erro ao enviar a ordem {ordem.id_cliente}: {str(erro)}")
+            ordem.set_exception(erro)
+        else:
+            ordem.set_result(confirmacao)
+
+    def metricas(self):
+        """
+        Contagens e latências do despacho.
+
+        Returns:
+            dict: Ordens enfileiradas, confirmadas (das quais reconciliadas
+                após envio sem resposta), com falha e requisições feitas,
+                ordens incertas, profundidade atual da fila e latências p50/p99 em ms
+                da espera na fila ('fila_*') e da fila até a confirmação
+                ('total_*')
+        """
+        with self._lock:
+            metricas = dict(self._contagem)
+            tempos = {'fila': np.asarray(self._tempos_fila), 'total': np.asarray(self._tempos_total)}
+
+        metricas['incertas'] = len(self._incertas)
+        metricas['profundidade'] = self._fila.qsize()
+        for nome, valores in tempos.items():
+            metricas[f'{nome}_p50_ms'] = float(np.percentile(valores, 50) * 1000) if len(valores) else 0.0
+            metricas[f'{nome}_p99_ms'] = float(np.percentile(valores, 99) * 1000) if len(valores) else 0.0
+        return metricas
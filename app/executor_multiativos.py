@@ -0,0 +1,297 @@
+"""
+Execução ao vivo de um universo de ativos em poucos processos.
+Os ativos são divididos em shards, um por processo. Cada processo carrega o
+modelo uma única vez, usa uma conexão com a corretora compartilhada pelos
+ativos do shard e avalia juntos os ativos cujos candles fecham ao mesmo
+tempo. Vazão e atraso de cada shard são reportados ao processo principal.
+"""
+
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from logger import logger
+from config import CONEXAO_CONFIG, EXECUTOR_CONFIG
+
+
+def dividir_shards(simbolos, processos):
+    """
+    Divide os ativos em 'processos' shards de tamanho equilibrado.
+
+    Args:
+        simbolos (list): Universo de ativos
+        processos (int): Número de shards
+
+    Returns:
+        list: Listas de símbolos, uma por shard (sem shards vazios)
+    """
+    return [shard for shard in (list(simbolos[i::processos]) for i in range(processos)) if shard]
+
+
+async def _carga_inicial(conexao, simbolos, timeframe, limite):
+    try:
+        return await conexao.obter_estado(simbolos, timeframe, limite)
+    finally:
+        await conexao.fechar()
+
+
+def _executar_shard(indice, simbolos, timeframe, caminho_modelo, api_key, api_secret, base_url,
+                    capital_inicial, modo, fila_metricas, parar):
+    """
+    Loop ao vivo de um shard, executado em um processo próprio.
+
+    Os módulos do robô são importados aqui, uma vez por processo. Ativos com
+    menos de dois candles na carga inicial não interrompem o shard: são
+    acompanhados a partir do próximo fechamento.
+    """
+    from classeRobo import RoboTrading
+    from classeConexaoCorretora import ConexaoCorretora
+    from classeConexaoAssincrona import ConexaoCorretoraAssincrona
+    from buffer_candles import BufferCandles
+    from despacho_ordens import DespachoOrdens
+    from fluxo_mercado import FluxoMercado
+
+    fluxo = despacho = None
+    try:
+        robo = RoboTrading(capital_inicial=capital_inicial)
+        robo.carregar_modelo(caminho_modelo)
+
+        # Uma conexão por shard, compartilhada por todos os seus ativos
+        corretora = ConexaoCorretora(api_key, api_secret, base_url)
+        despacho = DespachoOrdens(corretora)
+        despacho.iniciar()
+
+        buffers = {simbolo: BufferCandles() for simbolo in simbolos}
+        estado = asyncio.run(_carga_inicial(ConexaoCorretoraAssincrona(api_key, api_secret, base_url),
+                                            simbolos, timeframe, EXECUTOR_CONFIG['candles_iniciais']))
+        desde = {}
+        for simbolo in simbolos:
+            dados = estado['dados'].get(simbolo)
+            if dados is None or len(dados) < 2:
+                # Histórico curto (ex.: ativo recém-listado): sem 'desde', o fluxo o acompanha
+                # a partir do próximo fechamento e o buffer se forma com os candles ao vivo
+                logger.warning(f"Shard {indice}: {simbolo} com {0 if dados is None else len(dados)} "
+                               f"candles na carga inicial; acompanhado só a partir dos próximos fechamentos")
+                continue
+            # O último candle pode estar em formação; o fluxo retoma a partir do penúltimo
+            buffers[simbolo].carregar(dados.iloc[:-1])
+            desde[simbolo] = int(dados['timestamp'].iloc[-2])
+
+        fluxo = FluxoMercado(api_key, api_secret, simbolos, timeframe, base_url, desde=desde)
+        fluxo.iniciar()
+        passo_ms = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+
+        inicio = time.time()
+        contagem = {'candles': 0, 'avaliacoes': 0, 'sinais': 0}
+        atrasos = deque(maxlen=EXECUTOR_CONFIG['janela_latencias'])
+        tempos_avaliacao = deque(maxlen=EXECUTOR_CONFIG['janela_latencias'])
+        proximo_relatorio = time.time() + EXECUTOR_CONFIG['intervalo_metricas']
+
+        while not parar.is_set():
+            # Agrupa os candles que fecham juntos e os avalia em uma só previsão
+            fechados = {}
+            evento = fluxo.proximo(timeout=1.0)
+            prazo = time.time() + EXECUTOR_CONFIG['janela_agrupamento']
+            while evento is not None:
+                if evento['tipo'] == 'execucao':
+                    corretora.invalidar_estado()
+                    ordem = despacho.registrar_execucao(evento['execucao'])
+                    robo.registrar_execucao(evento['execucao'], ordem.ordem if ordem else None)
+                elif evento['tipo'] == 'candle':
+                    candle = evento['candle']
+                    buffers[evento['simbolo']].adicionar(candle['timestamp'], candle['open'], candle['high'],
+                                                         candle['low'], candle['close'], candle['volume'])
+                    fechados[evento['simbolo']] = candle['timestamp']
+                evento = fluxo.proximo(timeout=max(prazo - time.time(), 0))
+
+            if fechados:
+                inicio_avaliacao = time.perf_counter()
+                try:
+                    abertos = {p['symbol'] for p in corretora.verificar_posicoes()}
+                    candidatos = {s: buffers[s] for s in fechados
+                                  if s not in abertos and not despacho.tem_pendente(s)}
+                    sinais = robo.avaliar_buffers(candidatos, modo)
+                except Exception as e:
+                    # Os buffers já estão atualizados; o shard segue no próximo fechamento
+                    logger.error(f"Erro ao avaliar o shard {indice}: {str(e)}")
+                    continue
+                for sinal in sinais.values():
+                    despacho.enviar(sinal['ativo'], 'compra', sinal['tamanho_posicao'] / sinal['preco_entrada'],
+                                    preco=sinal['preco_entrada'], stop_loss=sinal['stop_loss'],
+                                    take_profit=sinal['take_profit'])
+
+                agora_ms = time.time() * 1000
+                atrasos.extend(agora_ms - (t + passo_ms) for t in fechados.values())
+                tempos_avaliacao.append(time.perf_counter() - inicio_avaliacao)
+                contagem['candles'] += len(fechados)
+                contagem['avaliacoes'] += len(candidatos)
+                contagem['sinais'] += len(sinais)
+
+            if time.time() >= proximo_relatorio:
+                proximo_relatorio = time.time() + EXECUTOR_CONFIG['intervalo_metricas']
+                fila_metricas.put(_metricas_shard(indice, simbolos, inicio, contagem, atrasos,
+                                                  tempos_avaliacao, despacho, robo))
+
+        fila_metricas.put(_metricas_shard(indice, simbolos, inicio, contagem, atrasos, tempos_avaliacao,
+                                          despacho, robo))
+
+    except Exception as e:
+        logger.error(f"Erro no shard {indice}: {str(e)}")
+        fila_metricas.put({'shard': indice, 'ativos': len(simbolos), 'erro': str(e)})
+
+    finally:
+        if fluxo is not None:
+            fluxo.parar()
+        if despacho is not None:
+            despacho.parar()
+
+
+def _metricas_shard(indice, simbolos, inicio, contagem, atrasos, tempos_avaliacao, despacho, robo):
+    """
+    Resumo das métricas de um shard.
+    """
+    duracao = time.time() - inicio
+    atrasos = np.asarray(atrasos)
+    tempos_avaliacao = np.asarray(tempos_avaliacao)
+    return {
+        'shard': indice,
+        'pid': os.getpid(),
+        'ativos': len(simbolos),
+        **contagem,
+        'ordens': despacho.metricas()['confirmadas'],
+        'vazao': contagem['candles'] / duracao if duracao > 0 else 0.0,
+        'atraso_p50_ms': float(np.percentile(atrasos, 50)) if len(atrasos) else 0.0,
+        'atraso_p99_ms': float(np.percentile(atrasos, 99)) if len(atrasos) else 0.0,
+        'avaliacao_p50_ms': float(np.percentile(tempos_avaliacao, 50) * 1000) if len(tempos_avaliacao) else 0.0,
+        'desempenho': robo.metricas_online.resumo(),
+        'instante': time.time()
+    }
+
+
+class ExecutorMultiativos:
+    """
+    Executor ao vivo de um universo de ativos dividido entre processos.
+
+    Os processos são criados com 'spawn' (sem herdar threads e conexões do
+    processo principal), então o script que inicia o executor deve fazê-lo
+    sob if __name__ == '__main__'.
+
+    Attributes:
+        simbolos (list): Universo de ativos
+        timeframe (str): Intervalo dos candles
+        caminho_modelo (str): Arquivo salvo com RoboTrading.salvar_modelo
+        processos (int): Número de processos (shards)
+        shards (list): Ativos de cada shard
+    """
+
+    def __init__(self, api_key, api_secret, simbolos, timeframe, caminho_modelo, processos=None,
+                 base_url=None, capital_inicial=10000, modo="padrao"):
+        """
+        Inicializa o executor; parâmetros omitidos vêm de EXECUTOR_CONFIG e CONEXAO_CONFIG.
+
+        Args:
+            api_key (str): Chave da API
+            api_secret (str): Segredo da API
+            simbolos (list): Universo de ativos
+            timeframe (str): Intervalo dos candles (ex.: '15min')
+            caminho_modelo (str): Arquivo salvo com RoboTrading.salvar_modelo
+            processos (int, optional): Número de processos
+            base_url (str, optional): URL base da API
+            capital_inicial (float): Capital de cada robô
+            modo (str): Preset do motor de backtest
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.simbolos = list(simbolos)
+        self.timeframe = timeframe
+        self.caminho_modelo = caminho_modelo
+        self.base_url = base_url or CONEXAO_CONFIG['base_url']
+        self.capital_inicial = capital_inicial
+        self.modo = modo
+        self.processos = min(processos or EXECUTOR_CONFIG['processos'] or os.cpu_count() or 1,
+                             len(self.simbolos))
+        self.shards = dividir_shards(self.simbolos, self.processos)
+        self._contexto = mp.get_context('spawn')
+        self._parar = None
+        self._fila = None
+        self._workers = []
+        self._metricas = {}
+
+    def iniciar(self):
+        """
+        Inicia um processo por shard.
+        """
+        logger.info(f"Iniciando {len(self.shards)} shards para {len(self.simbolos)} ativos em {self.timeframe}")
+        self._parar = self._contexto.Event()
+        self._fila = self._contexto.Queue()
+        self._workers = []
+        for indice, simbolos in enumerate(self.shards):
+            worker = self._contexto.Process(
+                target=_executar_shard, name=f"shard-{indice}", daemon=True,
+                args=(indice, simbolos, self.timeframe, self.caminho_modelo, self.api_key, self.api_secret,
+                      self.base_url, self.capital_inicial, self.modo, self._fila, self._parar))
+            worker.start()
+            self._workers.append(worker)
+
+    def metricas(self):
+        """
+        Últimas métricas recebidas de cada shard.
+
+        Returns:
+            dict: Shard -> ativos, candles, avaliações, sinais, ordens
+                confirmadas, vazão (candles/s), atraso p50/p99 em ms entre o
+                fechamento do candle e a decisão, tempo p50 da avaliação em
+                lote, 'desempenho' (MetricasOnline.resumo dos trades
+                fechados no shard) e 'vivo'; ou 'erro' se o shard falhou
+        """
+        while True:
+            try:
+                metricas = self._fila.get_nowait()
+            except (queue.Empty, AttributeError):
+                break
+            self._metricas[metricas['shard']] = metricas
+
+        for indice, worker in enumerate(self._workers):
+            self._metricas.setdefault(indice, {'shard': indice, 'ativos': len(self.shards[indice])})
+            self._metricas[indice]['vivo'] = worker.is_alive()
+        return dict(self._metricas)
+
+    def parar(self, timeout=30):
+        """
+        Sinaliza o encerramento dos shards e aguarda os processos.
+        """
+        if self._parar is None:
+            return
+        self._parar.set()
+        prazo = time.time() + timeout
+        for worker in self._workers:
+            worker.join(max(prazo - time.time(), 0))
+            if worker.is_alive():
+                logger.warning(f"{worker.name} não encerrou a tempo; terminando o processo")
+                worker.terminate()
+        self.metricas()
+
+    def executar(self, intervalo=60):
+        """
+        Executa até Ctrl+C, exibindo as métricas dos shards a cada 'intervalo' segundos.
+        """
+        self.iniciar()
+        try:
+            while True:
+                time.sleep(intervalo)
+                for m in self.metricas().values():
+                    if 'erro' in m:
+                        print(f"Shard {m['shard']}: erro {m['erro']}")
+                    elif 'vazao' in m:
+                        print(f"Shard {m['shard']} ({m['ativos']} ativos): {m['candles']} candles, "
+                              f"{m['sinais']} sinais, {m['ordens']} ordens | atraso p50 "
+                              f"{m['atraso_p50_ms']:.0f} ms p99 {m['atraso_p99_ms']:.0f} ms")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.parar()
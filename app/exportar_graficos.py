@@ -0,0 +1,170 @@
+"""
+Módulo de exportação de gráficos em lote.
+Renderiza listas de especificações de gráficos (não figuras prontas) em um
+pool de processos, pula os gráficos cujas entradas não mudaram e grava um
+manifesto com a chave e o tempo de cada gráfico.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from logger import logger
+from cache_backtest import gerar_chave
+
+# Construtores de gráfico aceitos nas especificações: nome -> (módulo, função)
+CONSTRUTORES = {
+    'plot_candlestick': ('graficos', 'plot_candlestick'),
+    'plot_correlacao': ('graficos', 'plot_correlacao'),
+    'plot_distribuicao': ('graficos', 'plot_distribuicao'),
+    'plot_series_temporais': ('graficos', 'plot_series_temporais'),
+    'plot_trades': ('visualizar_trades', 'plot_trades'),
+    'plot_equity_curve': ('visualizar_trades', 'plot_equity_curve'),
+    'plot_drawdown': ('visualizar_trades', 'plot_drawdown')
+}
+
+
+def _hash_arquivo(caminho, tamanho_bloco=2**20):
+    """
+    Hash do conteúdo de um arquivo de entrada.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _carregar_dados(caminho):
+    """
+    Carrega o DataFrame de entrada de um gráfico (CSV ou Parquet).
+    """
+    if caminho.endswith('.parquet'):
+        return pd.read_parquet(caminho)
+    return pd.read_csv(caminho, index_col=0, parse_dates=True)
+
+
+def chave_especificacao(espec):
+    """
+    Chave de conteúdo de uma especificação: construtor, parâmetros, formato
+    e o hash dos arquivos de entrada.
+
+    Args:
+        espec (dict): Especificação do gráfico
+
+    Returns:
+        str: Chave hexadecimal
+    """
+    entradas = {campo: _hash_arquivo(espec[campo]) for campo in ('dados', 'trades') if espec.get(campo)}
+    return gerar_chave('grafico', espec['grafico'], espec.get('parametros', {}),
+                       espec.get('formato', 'png'), entradas)
+
+
+def _renderizar(espec):
+    """
+    Renderiza e salva um gráfico; executada nos processos de trabalho.
+
+    Returns:
+        tuple: (arquivo, segundos, erro)
+    """
+    inicio = time.perf_counter()
+    try:
+        import importlib
+        import matplotlib.pyplot as plt
+        from graficos import salvar_grafico
+
+        plt.switch_backend('Agg')
+        modulo, funcao = CONSTRUTORES[espec['grafico']]
+        construtor = getattr(importlib.import_module(modulo), funcao)
+
+        parametros = dict(espec.get('parametros', {}))
+        if espec.get('trades'):
+            parametros['trades'] = np.load(espec['trades'])
+        fig = construtor(_carregar_dados(espec['dados']), **parametros)
+
+        os.makedirs(os.path.dirname(os.path.abspath(espec['arquivo'])), exist_ok=True)
+        salvar_grafico(fig, espec['arquivo'], formato=espec.get('formato', 'png'))
+        if hasattr(fig, 'savefig'):
+            plt.close(fig)
+        return espec['arquivo'], time.perf_counter() - inicio, None
+
+    except Exception as e:
+        return espec['arquivo'], time.perf_counter() - inicio, str(e)
+
+
+def exportar_lote(especificacoes, caminho_manifesto='graficos/manifesto.json',
+                  processos=None, forcar=False):
+    """
+    Exporta um lote de gráficos em paralelo.
+
+    Cada especificação é um dicionário com:
+        'grafico': nome do construtor em CONSTRUTORES
+        'dados': caminho do CSV/Parquet com o DataFrame de entrada
+        'arquivo': caminho do arquivo de saída
+        'formato' (opcional): 'png', 'jpg', 'html', ... (padrão 'png')
+        'parametros' (opcional): argumentos nomeados do construtor
+        'trades' (opcional): .npy com o registro de trades (plot_trades)
+
+    Gráficos cuja chave (construtor, parâmetros, formato e conteúdo das
+    entradas) é igual à do manifesto anterior e cujo arquivo ainda existe
+    são pulados.
+
+    Args:
+        especificacoes (list): Especificações dos gráficos
+        caminho_manifesto (str): Arquivo JSON do manifesto
+        processos (int, optional): Máximo de processos (None usa todos os núcleos)
+        forcar (bool): Renderizar mesmo os gráficos inalterados
+
+    Returns:
+        dict: Manifesto, por arquivo de saída: chave, status, segundos e erro
+    """
+    logger.info(f"Exportando lote de {len(especificacoes)} gráficos")
+
+    try:
+        anterior = {}
+        if os.path.exists(caminho_manifesto):
+            with open(caminho_manifesto, encoding='utf-8') as f:
+                anterior = json.load(f)
+
+        manifesto = {}
+        pendentes = []
+        for espec in especificacoes:
+            if espec['grafico'] not in CONSTRUTORES:
+                raise ValueError(f"Gráfico desconhecido: {espec['grafico']}")
+            chave = chave_especificacao(espec)
+            registro = anterior.get(espec['arquivo'], {})
+            if (not forcar and registro.get('chave') == chave and registro.get('status') != 'erro'
+                    and os.path.exists(espec['arquivo'])):
+                manifesto[espec['arquivo']] = dict(registro, status='inalterado')
+            else:
+                manifesto[espec['arquivo']] = {'chave': chave}
+                pendentes.append(espec)
+
+        logger.info(f"{len(especificacoes) - len(pendentes)} gráficos inalterados, "
+                    f"{len(pendentes)} a renderizar")
+
+        if pendentes:
+            with ProcessPoolExecutor(max_workers=processos) as executor:
+                for arquivo, segundos, erro in executor.map(_renderizar, pendentes):
+                    manifesto[arquivo].update({
+                        'status': 'erro' if erro else 'renderizado',
+                        'segundos': round(segundos, 4),
+                        'erro': erro
+                    })
+                    if erro:
+                        logger.warning(f"Falha ao renderizar {arquivo}: {erro}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(caminho_manifesto)), exist_ok=True)
+        with open(caminho_manifesto, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"Lote exportado; manifesto em {caminho_manifesto}")
+        return manifesto
+
+    except Exception as e:
+        logger.error(f"Erro ao exportar lote de gráficos: {str(e)}")
+        raise
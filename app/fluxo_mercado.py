@@ -0,0 +1,321 @@
+"""
+Módulo de fluxo de dados de mercado ao vivo.
+Entrega cada candle assim que ele fecha, por assinatura de websocket ou, como
+alternativa, por polling incremental do histórico com o parâmetro 'since',
+sem baixar de novo os candles já recebidos.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+
+import aiohttp
+from logger import logger
+from config import FLUXO_CONFIG
+from classeConexaoCorretora import gerar_assinatura
+from classeConexaoAssincrona import ConexaoCorretoraAssincrona
+from agendador_fechamentos import AgendadorFechamentos, passo_ms
+
+# Candles por consulta no polling; páginas cheias são seguidas de nova consulta imediata
+_LIMITE_PAGINA = 1000
+
+
+class _UsarPolling(Exception):
+    """Websocket indisponível no modo 'auto'."""
+
+
+class FluxoMercado:
+    """
+    Assinatura de candles e trades de um conjunto de ativos.
+
+    Os eventos são dicionários:
+        {'tipo': 'candle', 'simbolo', 'timeframe', 'candle', 'origem'} para
+        cada candle fechado, em ordem, sem repetição; e
+        {'tipo': 'trade', 'simbolo', 'preco', 'timestamp'} para os negócios
+        (apenas pelo websocket e se 'incluir_trades'); e
+        {'tipo': 'execucao', 'simbolo', 'execucao'} para cada execução de
+        ordem ou stop da conta (apenas pelo websocket).
+
+    Vários timeframes podem ser assinados no mesmo fluxo; os eventos de
+    todos chegam juntos, identificados por 'timeframe'.
+
+    No modo 'auto' o websocket é tentado primeiro; se ele falhar ou cair, o
+    fluxo passa ao polling a partir do último candle entregue, sem lacunas.
+
+    Attributes:
+        conexao (ConexaoCorretoraAssincrona): Conexão usada pelo polling e pelo websocket
+        simbolos (list): Ativos assinados
+        timeframes (list): Intervalos dos candles
+        timeframe (str): Primeiro (ou único) intervalo assinado
+        modo (str): 'websocket', 'polling' ou 'auto'
+        incluir_trades (bool): Entregar também os eventos de trade
+        ultimo_fechado (dict): (símbolo, timeframe) -> timestamp (ms) do
+            último candle entregue
+    """
+
+    def __init__(self, api_key, api_secret, simbolos, timeframe, base_url=None, modo=None,
+                 incluir_trades=False, desde=None, conexao=None):
+        """
+        Inicializa o fluxo; parâmetros omitidos vêm de FLUXO_CONFIG.
+
+        Args:
+            api_key (str): Chave da API
+            api_secret (str): Segredo da API
+            simbolos (list): Ativos assinados
+            timeframe (str or list): Intervalo dos candles (ex.: '15min'), ou
+                lista de intervalos
+            base_url (str, optional): URL base da API
+            modo (str, optional): 'websocket', 'polling' ou 'auto'
+            incluir_trades (bool): Entregar também os eventos de trade
+            desde (dict, optional): Timestamp (ms) do último candle já
+                processado, por símbolo (vale para todos os timeframes) ou
+                por (símbolo, timeframe); o fluxo retoma a partir dele
+            conexao (ConexaoCorretoraAssincrona, optional): Conexão a reutilizar
+        """
+        self.conexao = conexao or ConexaoCorretoraAssincrona(api_key, api_secret, base_url)
+        self.simbolos = list(simbolos)
+        self.timeframes = [timeframe] if isinstance(timeframe, str) else list(timeframe)
+        self.timeframe = self.timeframes[0]
+        self.modo = modo or FLUXO_CONFIG['modo']
+        self.incluir_trades = incluir_trades
+        self.ultimo_fechado = {}
+        for chave, timestamp in (desde or {}).items():
+            for tf in ([chave[1]] if isinstance(chave, tuple) else self.timeframes):
+                self.ultimo_fechado[(chave[0] if isinstance(chave, tuple) else chave, tf)] = timestamp
+        self._parar = threading.Event()
+        self._fila = None
+        self._thread = None
+
+    def _novo_candle(self, simbolo, timeframe, candle, origem):
+        """
+        Registra um candle fechado e devolve o evento, ou None se ele já foi entregue.
+        """
+        if candle['timestamp'] <= self.ultimo_fechado.get((simbolo, timeframe), -1):
+            return None
+        self.ultimo_fechado[(simbolo, timeframe)] = candle['timestamp']
+        return {'tipo': 'candle', 'simbolo': simbolo, 'timeframe': timeframe,
+                'candle': candle, 'origem': origem}
+
+    async def _eventos_websocket(self, timeframe, trades=True):
+        """
+        Eventos vindos da assinatura por websocket de um timeframe.
+
+        Args:
+            timeframe (str): Intervalo assinado
+            trades (bool): Repassar trades e execuções (só uma das conexões
+                o faz quando há vários timeframes, para não duplicá-los)
+        """
+        await self.conexao.abrir()
+        url = self.conexao.base_url.replace('http', 'ws', 1) + FLUXO_CONFIG['caminho_ws']
+        async with self.conexao.session.ws_connect(url, heartbeat=30) as ws:
+            assinatura = {'op': 'subscribe', 'symbols': self.simbolos, 'timeframe': timeframe,
+                          'timestamp': int(time.time() * 1000)}
+            assinatura['signature'] = gerar_assinatura(self.conexao.api_secret, assinatura)
+            await ws.send_json(assinatura)
+
+            resposta = await ws.receive_json(timeout=self.conexao.timeout)
+            if resposta.get('type') != 'subscribed':
+                raise ConnectionError(f"Assinatura recusada: {resposta.get('message', resposta)}")
+            logger.info(f"Fluxo de mercado por websocket: {len(self.simbolos)} ativos em {timeframe}")
+
+            while not self._parar.is_set():
+                try:
+                    msg = await ws.receive(timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise ConnectionError(f"Websocket encerrado ({msg.type.name})")
+
+                mensagem = msg.json()
+                if mensagem['type'] == 'candle' and mensagem.get('closed', True):
+                    evento = self._novo_candle(mensagem['symbol'], mensagem.get('timeframe', timeframe),
+                                               mensagem['candle'], 'websocket')
+                    if evento:
+                        yield evento
+                elif not trades:
+                    continue
+                elif mensagem['type'] == 'fill':
+                    yield {'tipo': 'execucao', 'simbolo': mensagem['symbol'], 'execucao': mensagem}
+                elif mensagem['type'] == 'trade' and self.incluir_trades:
+                    yield {'tipo': 'trade', 'simbolo': mensagem['symbol'],
+                           'preco': mensagem['price'], 'timestamp': mensagem['timestamp']}
+
+    async def _eventos_polling(self):
+        """
+        Eventos obtidos por polling incremental ('since') do histórico.
+
+        O AgendadorFechamentos desperta no fechamento de cada timeframe (mais
+        a folga configurada) e só os ativos do timeframe que fechou são
+        consultados, a partir do último candle entregue. Se a corretora
+        ainda não tiver o candle fechado, só os ativos em atraso são
+        consultados de novo a cada 'intervalo_polling' segundos, até
+        'tentativas_fechamento' vezes (ex.: mercados sem negociação). Na
+        primeira consulta de um ativo sem 'desde', o último candle fechado
+        apenas marca o ponto de partida.
+        """
+        logger.info(f"Fluxo de mercado por polling: {len(self.simbolos)} ativos em {', '.join(self.timeframes)}")
+
+        agendador = AgendadorFechamentos({tf: self.simbolos for tf in self.timeframes})
+        # (símbolo, timeframe) -> [timestamp esperado do candle fechado, tentativas restantes]
+        pendentes = {(s, tf): [None, FLUXO_CONFIG['tentativas_fechamento']]
+                     for tf in self.timeframes for s in self.simbolos}
+
+        while not self._parar.is_set():
+            if not pendentes:
+                for fechamento in await agendador.aguardar_async(self._parar):
+                    for simbolo in fechamento['simbolos']:
+                        pendentes[(simbolo, fechamento['timeframe'])] = [
+                            fechamento['candle'], FLUXO_CONFIG['tentativas_fechamento']]
+                continue
+
+            agora_ms = time.time() * 1000
+            pares = list(pendentes)
+            consultas = []
+            for simbolo, tf in pares:
+                if (simbolo, tf) in self.ultimo_fechado:
+                    consultas.append(self.conexao.obter_dados_mercado(
+                        simbolo, tf, limite=_LIMITE_PAGINA, desde=self.ultimo_fechado[(simbolo, tf)] + 1))
+                else:
+                    consultas.append(self.conexao.obter_dados_mercado(simbolo, tf, limite=2))
+
+            try:
+                respostas = await asyncio.gather(*consultas)
+            except Exception as e:
+                logger.warning(f"Falha no polling de mercado, nova tentativa em "
+                               f"{FLUXO_CONFIG['intervalo_polling']}s: {str(e)}")
+                await asyncio.sleep(FLUXO_CONFIG['intervalo_polling'])
+                continue
+
+            pagina_cheia = False
+            for (simbolo, tf), dados in zip(pares, respostas):
+                passo = passo_ms(tf)
+                fechados = [c for c in dados.to_dict('records') if c['timestamp'] + passo <= agora_ms]
+                if (simbolo, tf) not in self.ultimo_fechado:
+                    if fechados:
+                        self.ultimo_fechado[(simbolo, tf)] = fechados[-1]['timestamp']
+                    pendentes.pop((simbolo, tf))
+                    continue
+                for candle in fechados:
+                    evento = self._novo_candle(simbolo, tf, candle, 'polling')
+                    if evento:
+                        yield evento
+
+                esperado, tentativas = pendentes[(simbolo, tf)]
+                if len(dados) >= _LIMITE_PAGINA:
+                    pagina_cheia = True
+                elif esperado is None or self.ultimo_fechado[(simbolo, tf)] >= esperado or tentativas <= 1:
+                    pendentes.pop((simbolo, tf))
+                else:
+                    pendentes[(simbolo, tf)][1] -= 1
+
+            if pendentes and not pagina_cheia:
+                await asyncio.sleep(FLUXO_CONFIG['intervalo_polling'])
+
+    async def _eventos_timeframe(self, timeframe, trades=True):
+        """
+        Eventos de um timeframe, conforme o modo (websocket com fallback para polling).
+        """
+        if self.modo in ('auto', 'websocket'):
+            try:
+                async for evento in self._eventos_websocket(timeframe, trades):
+                    yield evento
+            except Exception as e:
+                if self.modo == 'websocket':
+                    logger.error(f"Erro no fluxo por websocket: {str(e)}")
+                    raise
+                if not self._parar.is_set():
+                    logger.warning(f"Websocket indisponível ({str(e) or type(e).__name__}); "
+                                   f"usando polling por 'since'")
+                    raise _UsarPolling() from e
+
+    async def eventos(self):
+        """
+        Gerador assíncrono dos eventos do fluxo, conforme o modo.
+
+        Com vários timeframes há uma conexão de websocket por timeframe; se
+        qualquer uma falhar no modo 'auto', todos passam ao polling, que
+        atende os timeframes juntos.
+
+        Yields:
+            dict: Evento de candle fechado, de trade ou de execução
+        """
+        if self.modo in ('auto', 'websocket'):
+            fila = asyncio.Queue()
+
+            async def repassar(timeframe, trades):
+                try:
+                    async for evento in self._eventos_timeframe(timeframe, trades):
+                        await fila.put(evento)
+                except BaseException as e:
+                    await fila.put(e)
+
+            tarefas = [asyncio.create_task(repassar(tf, i == 0)) for i, tf in enumerate(self.timeframes)]
+            try:
+                while not self._parar.is_set():
+                    try:
+                        item = await asyncio.wait_for(fila.get(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        continue
+                    if isinstance(item, _UsarPolling):
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+            finally:
+                for tarefa in tarefas:
+                    tarefa.cancel()
+                await asyncio.gather(*tarefas, return_exceptions=True)
+
+        if not self._parar.is_set():
+            async for evento in self._eventos_polling():
+                yield evento
+
+    # ------------------------------------------------------------------
+    # Uso a partir de código síncrono
+    # ------------------------------------------------------------------
+
+    async def _consumir(self):
+        try:
+            async for evento in self.eventos():
+                self._fila.put(evento)
+        except Exception as e:
+            self._fila.put({'tipo': 'erro', 'erro': e})
+        finally:
+            await self.conexao.fechar()
+
+    def iniciar(self):
+        """
+        Executa o fluxo em uma thread própria; os eventos são lidos com proximo.
+        """
+        self._parar.clear()
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._consumir()), daemon=True)
+        self._thread.start()
+
+    def proximo(self, timeout=None):
+        """
+        Aguarda o próximo evento do fluxo iniciado com iniciar.
+
+        Args:
+            timeout (float, optional): Segundos de espera (None espera indefinidamente)
+
+        Returns:
+            dict or None: Evento, ou None se o tempo acabar
+        """
+        try:
+            evento = self._fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if evento['tipo'] == 'erro':
+            raise evento['erro']
+        return evento
+
+    def parar(self, timeout=10):
+        """
+        Encerra o fluxo iniciado com iniciar.
+        """
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
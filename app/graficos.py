@@ -11,8 +11,14 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from logger import logger
+from nivel_detalhe import MAX_PONTOS_PADRAO, agregar_ohlcv, reduzir_serie
+
+def plotar_candle_rsi_macd(df, ticker="Ativo", max_pontos=MAX_PONTOS_PADRAO):
+    candles = agregar_ohlcv(df, max_pontos)
+    rsi = reduzir_serie(df["rsi"], max_pontos)
+    macd = reduzir_serie(df["macd"], max_pontos)
+    macd_signal = reduzir_serie(df["macd_signal"], max_pontos)
 
-def plotar_candle_rsi_macd(df, ticker="Ativo"):
     fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
                         vertical_spacing=0.02,
                         row_heights=[0.5, 0.25, 0.25],
@@ -20,19 +26,19 @@ def plotar_candle_rsi_macd(df, ticker="Ativo"):
                                         "RSI (Índice de Força Relativa)",
                                         "MACD"))
 
-    fig.add_trace(go.Candlestick(x=df.index,
-                                 open=df["open"],
-                                 high=df["high"],
-                                 low=df["low"],
-                                 close=df["close"],
+    fig.add_trace(go.Candlestick(x=candles.index,
+                                 open=candles["open"],
+                                 high=candles["high"],
+                                 low=candles["low"],
+                                 close=candles["close"],
                                  name="Candlestick"), row=1, col=1)
 
-    fig.add_trace(go.Scatter(x=df.index, y=df["rsi"], line=dict(color="blue"), name="RSI"), row=2, col=1)
+    fig.add_trace(go.Scatter(x=rsi.index, y=rsi, line=dict(color="blue"), name="RSI"), row=2, col=1)
     fig.add_hline(y=70, line_dash="dot", line_color="red", row=2, col=1)
     fig.add_hline(y=30, line_dash="dot", line_color="green", row=2, col=1)
 
-    fig.add_trace(go.Scatter(x=df.index, y=df["macd"], line=dict(color="orange"), name="MACD"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df["macd_signal"], line=dict(color="purple"), name="Sinal"), row=3, col=1)
+    fig.add_trace(go.Scatter(x=macd.index, y=macd, line=dict(color="orange"), name="MACD"), row=3, col=1)
+    fig.add_trace(go.Scatter(x=macd_signal.index, y=macd_signal, line=dict(color="purple"), name="Sinal"), row=3, col=1)
 
     fig.update_layout(height=800, width=1000, title_text=f"Análise Técnica: {ticker}",
                       xaxis_rangeslider_visible=False)
@@ -60,13 +66,18 @@ def carregar_e_plotar(ticker="AAPL"):
 if __name__ == "__main__":
     carregar_e_plotar("AAPL")  # Troque por "PETR4.SA", "BTC-USD", etc.
 
-def plot_candlestick(df, title='Gráfico de Candles'):
+def plot_candlestick(df, title='Gráfico de Candles', max_pontos=MAX_PONTOS_PADRAO):
     """
     Cria um gráfico de candlestick com indicadores técnicos.
+
+    Históricos com mais de 'max_pontos' barras são agregados em candles mais
+    longos e o RSI é reduzido pelo LTTB; a resolução completa continua em
+    'df' (ou em NivelDetalhe, para recortes por janela).
     
     Args:
         df (pd.DataFrame): DataFrame com dados OHLCV
         title (str): Título do gráfico
+        max_pontos (int or None): Máximo de barras e pontos por série (None desenha todos)
         
     Returns:
         go.Figure: Figura Plotly com o gráfico
@@ -74,6 +85,9 @@ def plot_candlestick(df, title='Gráfico de Candles'):
     logger.info("Criando gráfico de candlestick")
     
     try:
+        candles = agregar_ohlcv(df, max_pontos)
+        rsi = reduzir_serie(df['rsi'], max_pontos)
+
         # Criar figura com subplots
         fig = make_subplots(
             rows=3, cols=1,
@@ -85,11 +99,11 @@ def plot_candlestick(df, title='Gráfico de Candles'):
         # Adicionar candlesticks
         fig.add_trace(
             go.Candlestick(
-                x=df.index,
-                open=df['open'],
-                high=df['high'],
-                low=df['low'],
-                close=df['close'],
+                x=candles.index,
+                open=candles['open'],
+                high=candles['high'],
+                low=candles['low'],
+                close=candles['close'],
                 name='Candles'
             ),
             row=1, col=1
@@ -98,8 +112,8 @@ def plot_candlestick(df, title='Gráfico de Candles'):
         # Adicionar volume
         fig.add_trace(
             go.Bar(
-                x=df.index,
-                y=df['volume'],
+                x=candles.index,
+                y=candles['volume'],
                 name='Volume'
             ),
             row=2, col=1
@@ -108,8 +122,8 @@ def plot_candlestick(df, title='Gráfico de Candles'):
         # Adicionar RSI
         fig.add_trace(
             go.Scatter(
-                x=df.index,
-                y=df['rsi'],
+                x=rsi.index,
+                y=rsi,
                 name='RSI'
             ),
             row=3, col=1
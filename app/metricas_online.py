@@ -0,0 +1,203 @@
+"""
+Módulo de métricas de desempenho incrementais.
+Implementa um acumulador atualizado em O(1) a cada trade fechado, para que
+painéis e travas de risco consultem as estatísticas da operação ao vivo sem
+recalcular todo o histórico.
+"""
+
+import math
+
+from registro_trades import TIPOS_SAIDA
+
+
+class MetricasOnline:
+    """
+    Acumulador incremental de métricas de desempenho.
+
+    O retorno de cada trade é o resultado dividido pelo patrimônio antes do
+    trade, de modo que o patrimônio somado trade a trade é a curva composta
+    desses retornos. Sobre eles valem as definições de metricas_retornos:
+    trades com retorno de módulo até 'limiar' são ignorados, win rate e
+    profit factor são calculados sobre os retornos e a média e a variância
+    dos retornos logarítmicos (Sharpe) e dos logarítmicos negativos
+    (Sortino) são mantidas pelo algoritmo de Welford. Assim, registrar os
+    resultados r_i aqui dá as mesmas métricas de metricas_retornos sobre
+    r_i / patrimônio antes do trade, com o mesmo limiar e capital inicial.
+
+    Attributes:
+        capital_inicial (float): Capital inicial
+        limiar (float): Retornos com módulo até o limiar são ignorados
+        total_trades (int): Trades registrados (acima do limiar)
+        trades_lucrativos (int): Trades com resultado positivo
+        trades_prejuizo (int): Trades com resultado negativo
+        lucro_total (float): Soma dos resultados positivos
+        prejuizo_total (float): Soma dos módulos dos resultados negativos
+        capital (float): Patrimônio atual
+        pico (float): Maior patrimônio atingido
+        max_drawdown (float): Maior queda relativa desde um pico
+        contagem_por_tipo (dict): Trades por tipo de saída
+    """
+
+    def __init__(self, capital_inicial=10000, limiar=1e-6):
+        """
+        Inicializa o acumulador vazio.
+
+        Args:
+            capital_inicial (float): Capital inicial
+            limiar (float): Retornos com módulo até o limiar são ignorados,
+                como em metricas_retornos
+        """
+        self.capital_inicial = capital_inicial
+        self.limiar = limiar
+        self.total_trades = 0
+        self.trades_lucrativos = 0
+        self.trades_prejuizo = 0
+        self.lucro_total = 0.0
+        self.prejuizo_total = 0.0
+        self.capital = float(capital_inicial)
+        self.pico = float(capital_inicial)
+        self.max_drawdown = 0.0
+        self.contagem_por_tipo = {}
+        # Somas dos retornos positivos e dos módulos dos negativos (profit factor)
+        self.soma_retornos_ganho = 0.0
+        self.soma_retornos_perda = 0.0
+        # Welford: (n, média, soma dos quadrados dos desvios)
+        self._log = [0, 0.0, 0.0]
+        self._log_negativo = [0, 0.0, 0.0]
+
+    @staticmethod
+    def _welford(estado, x):
+        estado[0] += 1
+        delta = x - estado[1]
+        estado[1] += delta / estado[0]
+        estado[2] += delta * (x - estado[1])
+
+    def registrar(self, resultado, tipo_saida=None):
+        """
+        Atualiza as métricas com um trade fechado.
+
+        Args:
+            resultado (float): Resultado financeiro do trade
+            tipo_saida (str or int, optional): Tipo de saída, por nome ou código
+
+        Returns:
+            bool: False se o trade foi ignorado (retorno dentro do limiar ou
+                patrimônio anterior não positivo)
+        """
+        resultado = float(resultado)
+        capital_anterior = self.capital
+        if capital_anterior <= 0:
+            return False
+        retorno = resultado / capital_anterior
+        if abs(retorno) <= self.limiar:
+            return False
+
+        self.total_trades += 1
+        if resultado > 0:
+            self.trades_lucrativos += 1
+            self.lucro_total += resultado
+            self.soma_retornos_ganho += retorno
+        else:
+            self.trades_prejuizo += 1
+            self.prejuizo_total -= resultado
+            self.soma_retornos_perda -= retorno
+
+        if tipo_saida is not None:
+            if not isinstance(tipo_saida, str):
+                tipo_saida = TIPOS_SAIDA[int(tipo_saida)]
+            self.contagem_por_tipo[tipo_saida] = self.contagem_por_tipo.get(tipo_saida, 0) + 1
+
+        self.capital += resultado
+        if self.capital > self.pico:
+            self.pico = self.capital
+        elif self.pico > 0:
+            self.max_drawdown = max(self.max_drawdown, (self.pico - self.capital) / self.pico)
+
+        if retorno > -1:
+            retorno_log = math.log1p(retorno)
+            self._welford(self._log, retorno_log)
+            if retorno_log < 0:
+                self._welford(self._log_negativo, retorno_log)
+        return True
+
+    @property
+    def win_rate(self):
+        """Fração de trades lucrativos."""
+        return self.trades_lucrativos / self.total_trades if self.total_trades else 0.0
+
+    @property
+    def profit_factor(self):
+        """Soma dos retornos positivos dividida pela soma dos módulos dos negativos."""
+        return (self.soma_retornos_ganho / self.soma_retornos_perda
+                if self.trades_prejuizo else float('inf'))
+
+    @property
+    def drawdown_atual(self):
+        """Queda relativa do patrimônio atual em relação ao pico."""
+        return (self.pico - self.capital) / self.pico if self.pico > 0 else 0.0
+
+    @property
+    def sharpe_ratio(self):
+        """Sharpe anualizado dos retornos logarítmicos por trade."""
+        n, media, m2 = self._log
+        desvio = math.sqrt(m2 / n) if n else 0.0
+        return media / desvio * math.sqrt(252) if desvio > 0 else 0.0
+
+    @property
+    def sortino_ratio(self):
+        """Sortino anualizado dos retornos logarítmicos por trade."""
+        n_neg, _, m2_neg = self._log_negativo
+        desvio = math.sqrt(m2_neg / n_neg) if n_neg else 0.0
+        return self._log[1] / desvio * math.sqrt(252) if desvio > 0 else 0.0
+
+    def resumo(self):
+        """
+        Instantâneo das métricas, pronto para serializar.
+
+        Returns:
+            dict: Métricas atuais
+        """
+        return {
+            'total_trades': self.total_trades,
+            'win_rate': self.win_rate,
+            'profit_factor': self.profit_factor,
+            'capital': self.capital,
+            'retorno_total': (self.capital - self.capital_inicial) / self.capital_inicial,
+            'pico': self.pico,
+            'max_drawdown': self.max_drawdown,
+            'drawdown_atual': self.drawdown_atual,
+            'sharpe_ratio': self.sharpe_ratio,
+            'sortino_ratio': self.sortino_ratio,
+            'contagem_por_tipo': dict(self.contagem_por_tipo)
+        }
+
+    def para_dict(self):
+        """
+        Estado completo do acumulador, para persistir e restaurar com de_dict.
+
+        Returns:
+            dict: Estado serializável (apenas tipos nativos)
+        """
+        estado = dict(vars(self))
+        estado['contagem_por_tipo'] = dict(self.contagem_por_tipo)
+        estado['_log'] = list(self._log)
+        estado['_log_negativo'] = list(self._log_negativo)
+        return estado
+
+    @classmethod
+    def de_dict(cls, estado):
+        """
+        Restaura um acumulador salvo com para_dict.
+
+        Args:
+            estado (dict): Estado salvo
+
+        Returns:
+            MetricasOnline: Acumulador restaurado
+        """
+        metricas = cls(estado['capital_inicial'])
+        metricas.__dict__.update(estado)
+        metricas.contagem_por_tipo = dict(estado['contagem_por_tipo'])
+        metricas._log = list(estado['_log'])
+        metricas._log_negativo = list(estado['_log_negativo'])
+        return metricas
@@ -0,0 +1,873 @@
+"""
+Motor de backtest unificado.
+Implementa um núcleo único de simulação orientado a eventos, com regras de
+entrada, regras de saída (stop loss/take profit fixos, trailing stop e
+alavancagem) e modelo de custos como componentes combináveis.
+Os modos padrão, agressivo e super agressivo são presets deste motor.
+"""
+
+import bisect
+import numpy as np
+import pandas as pd
+from logger import logger
+from analisar_desempenho import achatar_series, metricas_lote
+from registro_trades import RegistroTrades, CODIGO_TIPO_SAIDA, preencher_datas
+from cache_backtest import cache_backtest, gerar_chave
+
+
+class RegraProbabilidade:
+    """
+    Regra de entrada pela probabilidade prevista pelo modelo.
+
+    Attributes:
+        limiar (float): Probabilidade mínima (exclusiva) para entrar
+    """
+
+    colunas = ()
+
+    def __init__(self, limiar=0.6):
+        self.limiar = limiar
+
+    def __call__(self, df, probs):
+        return np.asarray(probs, dtype=float) > self.limiar
+
+    def __repr__(self):
+        return f"RegraProbabilidade(limiar={self.limiar})"
+
+
+class RegraFiltros:
+    """
+    Regra de entrada que exige a coluna 'filtros_ok' de aplicar_filtros_tecnicos.
+    """
+
+    colunas = ('filtros_ok',)
+
+    def __call__(self, df, probs):
+        return np.asarray(df['filtros_ok'], dtype=bool)
+
+    def __repr__(self):
+        return "RegraFiltros()"
+
+
+class RegraTendencia:
+    """
+    Regra de entrada por confirmação de tendência: preço acima da SMA 20,
+    MACD acima do sinal ou RSI entre 30 e 70.
+    """
+
+    colunas = ('close', 'sma_20', 'macd', 'macd_signal', 'rsi')
+
+    def __call__(self, df, probs):
+        close = np.asarray(df['close'], dtype=float)
+        rsi = np.asarray(df['rsi'], dtype=float)
+        return ((close > np.asarray(df['sma_20'], dtype=float)) |
+                (np.asarray(df['macd'], dtype=float) > np.asarray(df['macd_signal'], dtype=float)) |
+                ((rsi > 30) & (rsi < 70)))
+
+    def __repr__(self):
+        return "RegraTendencia()"
+
+
+class ModeloCustos:
+    """
+    Modelo de custos: comissão e slippage por operação.
+
+    Attributes:
+        comissao (float): Comissão por operação
+        slippage (float): Deslizamento de preço
+    """
+
+    def __init__(self, comissao=0.001, slippage=0.0005):
+        self.comissao = comissao
+        self.slippage = slippage
+
+    def preco_entrada(self, preco):
+        """Preço efetivo de entrada após o slippage."""
+        return preco * (1 + self.slippage)
+
+    def fator_saida(self):
+        """Fator aplicado ao resultado bruto de cada trade."""
+        return 1 - self.comissao - self.slippage
+
+    def __repr__(self):
+        return f"ModeloCustos(comissao={self.comissao}, slippage={self.slippage})"
+
+
+class Estrategia:
+    """
+    Composição de regras de entrada, regras de saída e modelo de custos.
+
+    O stop loss e o take profit são informados em variação do ativo
+    alavancado e divididos pela alavancagem antes da simulação, como nas
+    estratégias agressivas originais.
+
+    Uma regra de entrada é qualquer chamável regra(df, probs) que devolve
+    uma máscara booleana. Para que os resultados possam ir ao cache, a
+    regra deve declarar em 'colunas' todas as colunas de 'df' que lê e ter
+    um repr estável que identifique seus parâmetros (como as regras deste
+    módulo); estratégias com regras sem 'colunas' ou com o repr padrão
+    (com endereço de memória) são sempre simuladas sem cache.
+
+    Attributes:
+        nome (str): Nome da estratégia
+        regras_entrada (list): Regras combinadas com E lógico
+        stop_loss_pct (float): Porcentagem para stop loss
+        take_profit_pct (float): Porcentagem para take profit
+        trailing_stop_offset (float or None): Offset do trailing stop (None desativa)
+        alavancagem (float): Nível de alavancagem
+        custos (ModeloCustos): Modelo de custos
+    """
+
+    def __init__(self, nome, regras_entrada, stop_loss_pct, take_profit_pct,
+                 trailing_stop_offset=None, alavancagem=1.0, custos=None):
+        self.nome = nome
+        self.regras_entrada = list(regras_entrada)
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+        self.trailing_stop_offset = trailing_stop_offset
+        self.alavancagem = alavancagem
+        self.custos = custos if custos is not None else ModeloCustos()
+
+    def com_parametros(self, **parametros):
+        """
+        Cria uma cópia da estratégia com parâmetros substituídos.
+
+        Aceita 'comissao' e 'slippage' além dos atributos da estratégia.
+
+        Returns:
+            Estrategia: Nova estratégia
+        """
+        atributos = {
+            'nome': self.nome,
+            'regras_entrada': self.regras_entrada,
+            'stop_loss_pct': self.stop_loss_pct,
+            'take_profit_pct': self.take_profit_pct,
+            'trailing_stop_offset': self.trailing_stop_offset,
+            'alavancagem': self.alavancagem,
+            'custos': ModeloCustos(parametros.pop('comissao', self.custos.comissao),
+                                   parametros.pop('slippage', self.custos.slippage))
+        }
+        atributos.update(parametros)
+        return Estrategia(**atributos)
+
+    def com_limiar(self, limiar):
+        """
+        Cria uma cópia da estratégia com outro limiar de probabilidade.
+
+        Substitui a RegraProbabilidade existente ou a acrescenta, se ausente.
+
+        Args:
+            limiar (float): Novo limiar de probabilidade
+
+        Returns:
+            Estrategia: Nova estratégia nomeada '<nome>@<limiar>'
+        """
+        regras = [r for r in self.regras_entrada if not isinstance(r, RegraProbabilidade)]
+        return self.com_parametros(nome=f"{self.nome}@{limiar}",
+                                   regras_entrada=[RegraProbabilidade(limiar)] + regras)
+
+    def colunas(self):
+        """
+        Colunas dos dados lidas pela estratégia (preço e regras de entrada).
+
+        Returns:
+            list or None: Nomes das colunas, sem repetição; None se alguma
+                regra não declarar 'colunas'
+        """
+        colunas = ['close']
+        for regra in self.regras_entrada:
+            colunas_regra = getattr(regra, 'colunas', None)
+            if colunas_regra is None:
+                return None
+            colunas += [c for c in colunas_regra if c not in colunas]
+        return colunas
+
+    def motivo_sem_cache(self):
+        """
+        Verifica se os resultados da estratégia podem ir ao cache.
+
+        Returns:
+            str or None: Motivo pelo qual o cache não pode ser usado, ou None
+        """
+        for regra in self.regras_entrada:
+            if getattr(regra, 'colunas', None) is None:
+                return f"a regra {regra!r} não declara 'colunas'"
+            if ' at 0x' in repr(regra):
+                return f"a regra {regra!r} não tem repr estável"
+        return None
+
+    def sinal_entrada(self, df, probs):
+        """
+        Avalia todas as regras de entrada de forma vetorizada.
+
+        Args:
+            df (pd.DataFrame or dict): Dados das barras; qualquer mapeamento
+                coluna -> array serve (ex.: BufferCandles.barra_atual)
+            probs (np.array): Probabilidades alinhadas às barras
+
+        Returns:
+            np.array: Máscara booleana de barras elegíveis para entrada
+        """
+        sinal = np.ones(len(probs), dtype=bool)
+        for regra in self.regras_entrada:
+            sinal &= regra(df, probs)
+        return sinal
+
+    def __repr__(self):
+        return (f"Estrategia(nome={self.nome!r}, regras_entrada={self.regras_entrada}, "
+                f"stop_loss_pct={self.stop_loss_pct}, take_profit_pct={self.take_profit_pct}, "
+                f"trailing_stop_offset={self.trailing_stop_offset}, "
+                f"alavancagem={self.alavancagem}, custos={self.custos})")
+
+
+PRESETS_ESTRATEGIA = {
+    'padrao': Estrategia(
+        'padrao',
+        [RegraProbabilidade(0.6)],
+        stop_loss_pct=0.02, take_profit_pct=0.04
+    ),
+    'agressivo': Estrategia(
+        'agressivo',
+        [RegraProbabilidade(0.60), RegraFiltros(), RegraTendencia()],
+        stop_loss_pct=0.015, take_profit_pct=0.045,
+        trailing_stop_offset=0.005, alavancagem=2.0
+    ),
+    'super_agressivo': Estrategia(
+        'super_agressivo',
+        [RegraProbabilidade(0.5)],
+        stop_loss_pct=0.05, take_profit_pct=0.10,
+        alavancagem=5.0
+    )
+}
+
+
+def estrategia_do_modo(modo, **parametros):
+    """
+    Obtém o preset de um modo de backtest, opcionalmente com parâmetros substituídos.
+
+    Args:
+        modo (str): 'padrao', 'agressivo' ou 'super_agressivo'
+        **parametros: Atributos a substituir no preset
+
+    Returns:
+        Estrategia: Estratégia configurada
+    """
+    if modo not in PRESETS_ESTRATEGIA:
+        logger.warning(f"Modo {modo} desconhecido, usando preset padrao")
+        modo = 'padrao'
+    return PRESETS_ESTRATEGIA[modo].com_parametros(**parametros)
+
+
+def permite_cache(estrategias):
+    """
+    Indica se os resultados das estratégias podem ir ao cache, avisando se não.
+
+    Args:
+        estrategias (list): Estratégias simuladas juntas
+
+    Returns:
+        bool: True se todas as regras de entrada cumprem o contrato de Estrategia
+    """
+    for estrategia in estrategias:
+        motivo = estrategia.motivo_sem_cache()
+        if motivo is not None:
+            logger.warning(f"Cache desativado para a estratégia {estrategia.nome}: {motivo}")
+            return False
+    return True
+
+
+def _simular(close, sinal, stop_loss_pct, take_profit_pct, trailing_stop_offset,
+             alavancagem, slippage, fator_saida):
+    """
+    Núcleo da simulação sobre arrays.
+
+    Returns:
+        tuple: (trades, entrada_aberta) com trades no formato de RegistroTrades
+    """
+    registro = RegistroTrades()
+    posicao = _simular_bloco(close, sinal, stop_loss_pct, take_profit_pct, trailing_stop_offset,
+                             alavancagem, slippage, fator_saida, registro)
+    entrada_aberta = (posicao[0], posicao[1]) if posicao is not None else None
+    return registro.trades, entrada_aberta
+
+
+def _simular_bloco(close, sinal, stop_loss_pct, take_profit_pct, trailing_stop_offset,
+                   alavancagem, slippage, fator_saida, registro, posicao=None, deslocamento=0):
+    """
+    Simula um bloco contíguo de barras, continuando uma posição de um bloco anterior.
+
+    Enquanto não há posição, salta direto para a próxima barra com sinal de
+    entrada; com posição aberta, verifica trailing stop, stop loss e take
+    profit barra a barra sobre o preço de fechamento.
+
+    Args:
+        registro (RegistroTrades): Registro onde os trades são acrescentados
+        posicao (tuple, optional): Posição aberta ao início do bloco, como retornada
+            pelo bloco anterior
+        deslocamento (int): Índice global da primeira barra do bloco
+
+    Returns:
+        tuple or None: (idx_entrada, preco_entrada, stop_loss, take_profit,
+            max_price_since_entry) da posição aberta ao final do bloco
+    """
+    precos = close.tolist()
+    candidatos = np.flatnonzero(sinal).tolist()
+    n = len(precos)
+    usar_trailing = trailing_stop_offset is not None
+    codigo_sl = CODIGO_TIPO_SAIDA['stop_loss']
+    codigo_tp = CODIGO_TIPO_SAIDA['take_profit']
+
+    i = 0
+
+    while True:
+        if posicao is None:
+            k = bisect.bisect_left(candidatos, i)
+            if k == len(candidatos):
+                break
+            i = candidatos[k]
+
+            idx_entrada = i + deslocamento
+            preco_entrada = precos[i] * (1 + slippage)
+            stop_loss = preco_entrada * (1 - stop_loss_pct)
+            take_profit = preco_entrada * (1 + take_profit_pct)
+            max_price_since_entry = preco_entrada
+            j = i + 1
+        else:
+            idx_entrada, preco_entrada, stop_loss, take_profit, max_price_since_entry = posicao
+            posicao = None
+            j = 0
+
+        while j < n:
+            preco_atual = precos[j]
+            if usar_trailing and preco_atual > max_price_since_entry:
+                max_price_since_entry = preco_atual
+                novo_stop = max_price_since_entry * (1 - trailing_stop_offset)
+                if novo_stop > stop_loss:
+                    stop_loss = novo_stop
+
+            if preco_atual <= stop_loss:
+                registro.adicionar(idx_entrada, j + deslocamento, 0, 0, preco_entrada, stop_loss, codigo_sl,
+                                   (stop_loss - preco_entrada) * fator_saida * alavancagem)
+                break
+            elif preco_atual >= take_profit:
+                registro.adicionar(idx_entrada, j + deslocamento, 0, 0, preco_entrada, take_profit, codigo_tp,
+                                   (take_profit - preco_entrada) * fator_saida * alavancagem)
+                break
+            j += 1
+
+        if j >= n:
+            return (idx_entrada, preco_entrada, stop_loss, take_profit, max_price_since_entry)
+
+        # Uma nova entrada pode ocorrer na mesma barra da saída
+        i = j
+
+    return None
+
+
+def _resolver_barra(abertura, maxima, minima, stop_loss, take_profit):
+    """
+    Resolve a saída dentro de uma barra OHLC.
+
+    Uma abertura além de um dos níveis (gap) executa no preço de abertura.
+
+    Returns:
+        tuple: (tipo, preço) da saída; tipo None se a barra não toca nenhum
+            nível e 'ambos' se toca os dois sem ordem conhecida
+    """
+    if abertura <= stop_loss:
+        return 'stop_loss', abertura
+    if abertura >= take_profit:
+        return 'take_profit', abertura
+    toca_sl = minima <= stop_loss
+    toca_tp = maxima >= take_profit
+    if toca_sl and toca_tp:
+        return 'ambos', None
+    if toca_sl:
+        return 'stop_loss', stop_loss
+    if toca_tp:
+        return 'take_profit', take_profit
+    return None, None
+
+
+def _simular_intrabar(abertura, maxima, minima, close, sinal, stop_loss_pct, take_profit_pct,
+                      trailing_stop_offset, alavancagem, slippage, fator_saida,
+                      tempos=None, duracao=None, sub_barras=None):
+    """
+    Núcleo da simulação com saídas resolvidas dentro de cada barra.
+
+    O stop loss e o take profit são verificados contra a máxima e a mínima
+    da barra. Quando a barra toca os dois níveis, a ordem é resolvida nas
+    sub-barras (ex.: 1 minuto) daquele intervalo, consultadas apenas nesse
+    caso; sem sub-barras, ou se uma sub-barra também tocar os dois, assume-se
+    o stop loss. O trailing stop é atualizado pela máxima depois da
+    verificação de saída e só vale a partir da barra seguinte.
+
+    Args:
+        abertura, maxima, minima, close (np.array): Preços OHLC das barras
+        sinal (np.array): Máscara de entrada
+        tempos (np.array, optional): Início de cada barra em int64 (ns)
+        duracao (int, optional): Duração de uma barra em ns; as sub-barras de
+            uma barra são as que começam em [tempos[j], tempos[j] + duracao)
+        sub_barras (tuple, optional): (tempos, abertura, maxima, minima) das sub-barras
+
+    Returns:
+        tuple: (trades, entrada_aberta) com trades no formato de RegistroTrades
+    """
+    abertura, maxima, minima, precos = (abertura.tolist(), maxima.tolist(),
+                                        minima.tolist(), close.tolist())
+    candidatos = np.flatnonzero(sinal).tolist()
+    n = len(precos)
+    usar_trailing = trailing_stop_offset is not None
+
+    registro = RegistroTrades()
+    entrada_aberta = None
+    i = 0
+
+    while True:
+        k = bisect.bisect_left(candidatos, i)
+        if k == len(candidatos):
+            break
+        i = candidatos[k]
+
+        preco_entrada = precos[i] * (1 + slippage)
+        stop_loss = preco_entrada * (1 - stop_loss_pct)
+        take_profit = preco_entrada * (1 + take_profit_pct)
+        max_price_since_entry = preco_entrada
+
+        j = i + 1
+        while j < n:
+            tipo, nivel = _resolver_barra(abertura[j], maxima[j], minima[j], stop_loss, take_profit)
+
+            if tipo == 'ambos':
+                tipo, nivel = 'stop_loss', stop_loss
+                if sub_barras is not None:
+                    t_sub, a_sub, h_sub, l_sub = sub_barras
+                    lo = np.searchsorted(t_sub, tempos[j])
+                    hi = np.searchsorted(t_sub, tempos[j] + duracao)
+                    for m in range(lo, hi):
+                        tipo_sub, nivel_sub = _resolver_barra(a_sub[m], h_sub[m], l_sub[m],
+                                                              stop_loss, take_profit)
+                        if tipo_sub is not None:
+                            if tipo_sub != 'ambos':
+                                tipo, nivel = tipo_sub, nivel_sub
+                            break
+
+            if tipo is not None:
+                registro.adicionar(i, j, 0, 0, preco_entrada, nivel, CODIGO_TIPO_SAIDA[tipo],
+                                   (nivel - preco_entrada) * fator_saida * alavancagem)
+                break
+
+            if usar_trailing and maxima[j] > max_price_since_entry:
+                max_price_since_entry = maxima[j]
+                novo_stop = max_price_since_entry * (1 - trailing_stop_offset)
+                if novo_stop > stop_loss:
+                    stop_loss = novo_stop
+            j += 1
+
+        if j >= n:
+            entrada_aberta = (i, preco_entrada)
+            break
+
+        # Uma nova entrada pode ocorrer na mesma barra da saída
+        i = j
+
+    return registro.trades, entrada_aberta
+
+
+def _montar_resultado(indice, trades, entrada_aberta, alavancagem, capital_inicial):
+    """
+    Monta o dicionário de resultado do motor a partir do registro de trades.
+
+    Args:
+        indice (pd.Index): Índice temporal dos dados simulados
+        trades (np.array): Trades no formato de RegistroTrades
+        entrada_aberta (tuple or None): (idx, preço) da entrada ainda aberta ao final
+        alavancagem (float): Nível de alavancagem
+        capital_inicial (float): Capital inicial
+
+    Returns:
+        dict: Registro de trades, entrada aberta e capital final
+    """
+    preencher_datas(trades, indice)
+    capital = sum(trades['resultado'].tolist(), capital_inicial)
+
+    return {
+        'trades': trades,
+        'indice': indice,
+        'entrada_aberta': entrada_aberta,
+        'capital_final': capital,
+        'retorno_total': (capital - capital_inicial) / capital_inicial,
+        'alavancagem': alavancagem
+    }
+
+
+def _duracao_barra(indice, timeframe=None):
+    """
+    Duração de uma barra, em ns.
+
+    Args:
+        indice (pd.DatetimeIndex): Índice temporal das barras
+        timeframe (str, optional): Intervalo das barras (ex.: '15min')
+
+    Returns:
+        int: O timeframe informado; sem ele, a frequência do índice ou, se
+            ausente, o menor intervalo entre barras consecutivas (lacunas e
+            linhas removidas só aumentam os intervalos)
+    """
+    if timeframe is not None:
+        return pd.Timedelta(timeframe).value
+    if indice.freq is not None:
+        return pd.Timedelta(indice.freq).value
+    intervalos = np.diff(indice.as_unit('ns').asi8)
+    intervalos = intervalos[intervalos > 0]
+    if not len(intervalos):
+        raise ValueError("Não foi possível inferir a duração das barras; informe 'timeframe'.")
+    return int(intervalos.min())
+
+
+def executar_estrategia(df, probs, estrategia, capital_inicial=10000, usar_cache=True,
+                        intrabar=False, sub_barras=None, timeframe=None):
+    """
+    Executa o backtest de uma estratégia no motor unificado.
+
+    Args:
+        df (pd.DataFrame): DataFrame com dados históricos
+        probs (np.array): Probabilidades de previsão
+        estrategia (Estrategia): Estratégia a simular
+        capital_inicial (float): Capital inicial
+        usar_cache (bool): Reaproveitar resultados de entradas idênticas
+        intrabar (bool): Resolver stop loss e take profit pela máxima e mínima
+            de cada barra em vez do fechamento
+        sub_barras (pd.DataFrame, optional): Barras mais finas (ex.: 1 minuto)
+            com 'open', 'high' e 'low', usadas no modo intrabar quando uma
+            barra toca os dois níveis; o índice deve ter o mesmo tratamento
+            de fuso horário que o de 'df' (ambos com ou ambos sem fuso)
+        timeframe (str, optional): Duração de cada barra (ex.: '15min'),
+            usada para delimitar as sub-barras de cada barra; se omitida,
+            vem da frequência do índice ou do menor intervalo entre barras
+
+    Returns:
+        dict: Resultado com o registro colunar de trades ('trades'), a entrada
+            aberta ao final e o capital final
+    """
+    logger.info(f"Iniciando backtest da estratégia {estrategia.nome}")
+
+    try:
+        if len(probs) != len(df):
+            raise ValueError("'probs' deve ter o mesmo tamanho de 'df'.")
+        probs = np.asarray(probs, dtype=float)
+
+        duracao = None
+        if intrabar and sub_barras is not None:
+            tz_barras = getattr(df.index, 'tz', None)
+            tz_sub = getattr(sub_barras.index, 'tz', None)
+            if (tz_barras is None) != (tz_sub is None):
+                raise ValueError(f"Fuso horário das sub-barras ({tz_sub}) incompatível com o "
+                                 f"das barras ({tz_barras}).")
+            duracao = _duracao_barra(pd.DatetimeIndex(df.index), timeframe)
+
+        def simular():
+            alavancagem = estrategia.alavancagem
+            parametros = (
+                estrategia.sinal_entrada(df, probs),
+                estrategia.stop_loss_pct / alavancagem,
+                estrategia.take_profit_pct / alavancagem,
+                estrategia.trailing_stop_offset,
+                alavancagem,
+                estrategia.custos.slippage,
+                estrategia.custos.fator_saida()
+            )
+            if intrabar:
+                tempos, sub = None, None
+                if sub_barras is not None:
+                    tempos = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+                    sub = (pd.DatetimeIndex(sub_barras.index).as_unit('ns').asi8,
+                           sub_barras['open'].to_numpy(dtype=float),
+                           sub_barras['high'].to_numpy(dtype=float),
+                           sub_barras['low'].to_numpy(dtype=float))
+                trades, entrada_aberta = _simular_intrabar(
+                    df['open'].to_numpy(dtype=float),
+                    df['high'].to_numpy(dtype=float),
+                    df['low'].to_numpy(dtype=float),
+                    df['close'].to_numpy(dtype=float),
+                    *parametros, tempos=tempos, duracao=duracao, sub_barras=sub
+                )
+            else:
+                trades, entrada_aberta = _simular(df['close'].to_numpy(dtype=float), *parametros)
+            return _montar_resultado(df.index, trades, entrada_aberta, alavancagem, capital_inicial)
+
+        if usar_cache and permite_cache([estrategia]):
+            colunas = estrategia.colunas()
+            if intrabar:
+                colunas = ['open', 'high', 'low'] + colunas
+            chave = gerar_chave('executar_estrategia', df[colunas], probs, estrategia,
+                                capital_inicial, intrabar, duracao,
+                                sub_barras[['open', 'high', 'low']] if sub_barras is not None else None)
+            resultado = cache_backtest.executar(chave, simular)
+        else:
+            resultado = simular()
+
+        logger.info(f"Backtest da estratégia {estrategia.nome} concluído: {len(resultado['trades'])} trades")
+        return resultado
+
+    except Exception as e:
+        logger.error(f"Erro durante o backtest da estratégia {estrategia.nome}: {str(e)}")
+        raise
+
+
+def ler_blocos_csv(caminho_dados, caminho_probs=None, coluna_probs='proba_alta',
+                   tamanho_bloco=100000, coluna_indice=0):
+    """
+    Lê dados e probabilidades do disco em blocos, para executar_estrategia_streaming.
+
+    Args:
+        caminho_dados (str): CSV com índice temporal, preços e colunas das regras de entrada
+        caminho_probs (str, optional): Arquivo .npy com as probabilidades, lido por
+            mapeamento de memória; se omitido, usa a coluna 'coluna_probs' do CSV
+        coluna_probs (str): Coluna de probabilidades no CSV
+        tamanho_bloco (int): Barras por bloco
+        coluna_indice (int or str): Coluna do índice temporal no CSV
+
+    Yields:
+        tuple: (DataFrame do bloco, probabilidades do bloco)
+    """
+    probs = np.load(caminho_probs, mmap_mode='r') if caminho_probs else None
+    inicio = 0
+    # 'round_trip' devolve exatamente os floats gravados, como nos dados em memória
+    for bloco in pd.read_csv(caminho_dados, index_col=coluna_indice, parse_dates=True,
+                             float_precision='round_trip', chunksize=tamanho_bloco):
+        if probs is None:
+            probs_bloco = bloco[coluna_probs].to_numpy(dtype=float)
+        else:
+            probs_bloco = np.asarray(probs[inicio:inicio + len(bloco)], dtype=float)
+        inicio += len(bloco)
+        yield bloco, probs_bloco
+
+
+def executar_estrategia_streaming(blocos, estrategia, capital_inicial=10000):
+    """
+    Executa o backtest de uma estratégia sobre blocos consecutivos de dados.
+
+    A posição aberta é carregada de um bloco para o seguinte, então o
+    resultado é idêntico ao de executar_estrategia sobre os dados completos,
+    mas apenas um bloco precisa estar em memória por vez. As regras de
+    entrada são avaliadas por bloco e devem depender apenas da própria
+    linha (indicadores já calculados).
+
+    Args:
+        blocos (iterable): Pares (DataFrame, probabilidades) em ordem temporal,
+            por exemplo de ler_blocos_csv
+        estrategia (Estrategia): Estratégia a simular
+        capital_inicial (float): Capital inicial
+
+    Returns:
+        dict: Mesmo formato de executar_estrategia, com índices globais de
+            barra e 'indice' None (o índice completo não é mantido)
+    """
+    logger.info(f"Iniciando backtest em blocos da estratégia {estrategia.nome}")
+
+    try:
+        alavancagem = estrategia.alavancagem
+        parametros = (
+            estrategia.stop_loss_pct / alavancagem,
+            estrategia.take_profit_pct / alavancagem,
+            estrategia.trailing_stop_offset,
+            alavancagem,
+            estrategia.custos.slippage,
+            estrategia.custos.fator_saida()
+        )
+        registro = RegistroTrades()
+        posicao = None
+        data_entrada_aberta = np.datetime64('NaT')
+        deslocamento = 0
+        n_blocos = 0
+
+        for df, probs in blocos:
+            if len(probs) != len(df):
+                raise ValueError("'probs' deve ter o mesmo tamanho de 'df' em cada bloco.")
+            probs = np.asarray(probs, dtype=float)
+
+            n_antes = len(registro)
+            posicao = _simular_bloco(df['close'].to_numpy(dtype=float),
+                                     estrategia.sinal_entrada(df, probs),
+                                     *parametros, registro, posicao, deslocamento)
+
+            # Datas preenchidas bloco a bloco; a entrada pode vir de um bloco anterior
+            novos = registro.trades[n_antes:]
+            if isinstance(df.index, pd.DatetimeIndex):
+                datas = df.index.as_unit('ns').asi8.view('M8[ns]')
+                no_bloco = novos['idx_entrada'] >= deslocamento
+                novos['data_entrada'] = np.where(
+                    no_bloco, datas[np.maximum(novos['idx_entrada'] - deslocamento, 0)],
+                    data_entrada_aberta)
+                novos['data_saida'] = datas[novos['idx_saida'] - deslocamento]
+                if posicao is not None and posicao[0] >= deslocamento:
+                    data_entrada_aberta = datas[posicao[0] - deslocamento]
+            else:
+                novos['data_entrada'] = np.datetime64('NaT')
+                novos['data_saida'] = np.datetime64('NaT')
+
+            deslocamento += len(df)
+            n_blocos += 1
+
+        trades = registro.trades
+        capital = sum(trades['resultado'].tolist(), capital_inicial)
+        resultado = {
+            'trades': trades,
+            'indice': None,
+            'entrada_aberta': (posicao[0], posicao[1]) if posicao is not None else None,
+            'capital_final': capital,
+            'retorno_total': (capital - capital_inicial) / capital_inicial,
+            'alavancagem': alavancagem
+        }
+
+        logger.info(f"Backtest em blocos concluído: {n_blocos} blocos, {deslocamento} barras, "
+                    f"{len(trades)} trades")
+        return resultado
+
+    except Exception as e:
+        logger.error(f"Erro durante o backtest em blocos da estratégia {estrategia.nome}: {str(e)}")
+        raise
+
+
+def comparar_estrategias(df, probs, estrategias, limiares=None, capital_inicial=10000,
+                         usar_cache=True):
+    """
+    Avalia várias estratégias e limiares de probabilidade de uma só vez.
+
+    O array de preços é extraído uma vez e as regras de entrada que não
+    dependem do limiar são avaliadas uma vez por estratégia; cada variante
+    é então simulada pelo núcleo escalar, que salta direto entre os sinais.
+    Cada linha recebe um rótulo distinto: o nome da estratégia, acrescido
+    dos parâmetros que a diferenciam quando há nomes repetidos (ex.:
+    variantes criadas com com_parametros).
+
+    Args:
+        df (pd.DataFrame): DataFrame com dados históricos
+        probs (np.array): Probabilidades de previsão
+        estrategias (list): Estratégias ou nomes de presets
+        limiares (list, optional): Limiares de probabilidade a combinar com cada estratégia
+        capital_inicial (float): Capital inicial
+        usar_cache (bool): Reaproveitar resultados de entradas idênticas
+
+    Returns:
+        pd.DataFrame: Tabela de métricas com uma linha por variante
+    """
+    logger.info("Iniciando comparação de estratégias")
+
+    try:
+        if len(probs) != len(df):
+            raise ValueError("'probs' deve ter o mesmo tamanho de 'df'.")
+
+        probs = np.asarray(probs, dtype=float)
+        estrategias = [estrategia_do_modo(e) if isinstance(e, str) else e for e in estrategias]
+
+        def comparar():
+            return _comparar(df, probs, estrategias, limiares, capital_inicial)
+
+        if usar_cache and permite_cache(estrategias):
+            colunas = []
+            for estrategia in estrategias:
+                colunas += [c for c in estrategia.colunas() if c not in colunas]
+            chave = gerar_chave('comparar_estrategias', df[colunas], probs, estrategias,
+                                limiares, capital_inicial)
+            tabela = cache_backtest.executar(chave, comparar)
+        else:
+            tabela = comparar()
+
+        logger.info(f"Comparação concluída: {len(tabela)} variantes")
+        return tabela.copy()
+
+    except Exception as e:
+        logger.error(f"Erro durante a comparação de estratégias: {str(e)}")
+        raise
+
+
+def _rotulos(estrategias):
+    """
+    Rótulos distintos para as linhas de comparar_estrategias.
+
+    Estratégias com nome único mantêm o nome; as de nome repetido recebem
+    os parâmetros que diferem entre elas (ex.: 'padrao[stop_loss_pct=0.01]')
+    e, se ainda assim forem idênticas, a posição na lista.
+    """
+    def parametros(e):
+        return {
+            'regras_entrada': repr(e.regras_entrada),
+            'stop_loss_pct': e.stop_loss_pct,
+            'take_profit_pct': e.take_profit_pct,
+            'trailing_stop_offset': e.trailing_stop_offset,
+            'alavancagem': e.alavancagem,
+            'comissao': e.custos.comissao,
+            'slippage': e.custos.slippage
+        }
+
+    rotulos = []
+    for e in estrategias:
+        iguais = [o for o in estrategias if o.nome == e.nome]
+        if len(iguais) == 1:
+            rotulos.append(e.nome)
+            continue
+        proprios = parametros(e)
+        diferentes = [k for k in proprios if any(parametros(o)[k] != proprios[k] for o in iguais)]
+        rotulos.append(f"{e.nome}[{', '.join(f'{k}={proprios[k]}' for k in diferentes)}]"
+                       if diferentes else e.nome)
+
+    repetidos = {r for r in rotulos if rotulos.count(r) > 1}
+    return [f"{r}#{i}" if r in repetidos else r for i, r in enumerate(rotulos)]
+
+
+def _comparar(df, probs, estrategias, limiares, capital_inicial):
+    """
+    Simula todas as variantes de comparar_estrategias e monta a tabela de métricas.
+    """
+    variantes = []
+    sinais = []
+    for estrategia in estrategias:
+        if limiares is None:
+            variantes.append((estrategia, None))
+            sinais.append(estrategia.sinal_entrada(df, probs))
+            continue
+        # Regras que não dependem do limiar são avaliadas uma só vez
+        base = estrategia.com_parametros(regras_entrada=[
+            r for r in estrategia.regras_entrada if not isinstance(r, RegraProbabilidade)
+        ]).sinal_entrada(df, probs)
+        for limiar in limiares:
+            variantes.append((estrategia.com_limiar(limiar), limiar))
+            sinais.append(base & (probs > limiar))
+
+    close = df['close'].to_numpy(dtype=float)
+    simulados = []
+    for (estrategia, _), sinal in zip(variantes, sinais):
+        alavancagem = estrategia.alavancagem
+        simulados.append(_simular(close, sinal,
+                                  estrategia.stop_loss_pct / alavancagem,
+                                  estrategia.take_profit_pct / alavancagem,
+                                  estrategia.trailing_stop_offset,
+                                  alavancagem,
+                                  estrategia.custos.slippage,
+                                  estrategia.custos.fator_saida()))
+
+    resultados = [_montar_resultado(df.index, trades, entrada_aberta, estrategia.alavancagem,
+                                    capital_inicial)
+                  for (estrategia, _), (trades, entrada_aberta) in zip(variantes, simulados)]
+
+    # Métricas de todas as variantes em uma única chamada vetorizada
+    valores, offsets = achatar_series([r['trades']['resultado'] for r in resultados])
+    metricas = metricas_lote(valores, offsets,
+                             np.concatenate([r['trades']['tipo_saida'] for r in resultados]))
+
+    tabela = pd.DataFrame({
+        'estrategia': _rotulos([estrategia for estrategia, _ in variantes]),
+        'limiar': [limiar for _, limiar in variantes],
+        'total_trades': metricas['total_trades'].to_numpy(),
+        'win_rate': metricas['win_rate'].to_numpy(),
+        'profit_factor': metricas['profit_factor'].to_numpy(),
+        'expectancy': metricas['expectancy'].to_numpy(),
+        'max_drawdown': metricas['max_drawdown'].to_numpy(),
+        'sharpe_ratio': metricas['sharpe_ratio'].to_numpy(),
+        'sortino_ratio': metricas['sortino_ratio'].to_numpy(),
+        'capital_final': [r['capital_final'] for r in resultados],
+        'retorno_total': [r['retorno_total'] for r in resultados]
+    })
+    return tabela.set_index('estrategia')
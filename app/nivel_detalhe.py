@@ -0,0 +1,187 @@
+"""
+Módulo de nível de detalhe (LOD) para gráficos.
+Implementa a agregação de candles OHLCV em barras mais longas e a redução de
+séries de linha pelo algoritmo LTTB, preservando extremos e marcadores de
+trades, para que o tamanho das figuras fique limitado em históricos longos.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Máximo padrão de barras ou pontos enviados ao Plotly por série
+MAX_PONTOS_PADRAO = 5000
+
+
+def agregar_ohlcv(df, max_barras=MAX_PONTOS_PADRAO):
+    """
+    Agrega candles consecutivos até caberem em 'max_barras'.
+
+    Cada grupo de k barras vira uma barra com a abertura da primeira, a
+    máxima e a mínima do grupo, o fechamento da última e a soma do volume,
+    datada pelo início do grupo. Colunas adicionais recebem o último valor.
+
+    Args:
+        df (pd.DataFrame): DataFrame com 'open', 'high', 'low' e 'close'
+        max_barras (int or None): Máximo de barras (None mantém todas)
+
+    Returns:
+        pd.DataFrame: Candles agregados (ou o próprio df, se já couber)
+    """
+    n = len(df)
+    if max_barras is None or n <= max_barras:
+        return df
+
+    k = -(-n // max_barras)
+    inicios = np.arange(0, n, k)
+    fins = np.minimum(inicios + k, n) - 1
+
+    agregado = {}
+    for coluna in df.columns:
+        valores = df[coluna].to_numpy()
+        if coluna == 'open':
+            agregado[coluna] = valores[inicios]
+        elif coluna == 'high':
+            agregado[coluna] = np.maximum.reduceat(valores, inicios)
+        elif coluna == 'low':
+            agregado[coluna] = np.minimum.reduceat(valores, inicios)
+        elif coluna == 'volume':
+            agregado[coluna] = np.add.reduceat(valores, inicios)
+        else:
+            agregado[coluna] = valores[fins]
+    return pd.DataFrame(agregado, index=df.index[inicios])
+
+
+def _eixo_numerico(indice):
+    if isinstance(indice, pd.DatetimeIndex):
+        return indice.as_unit('ns').asi8.astype(float)
+    return np.asarray(indice, dtype=float)
+
+
+def lttb(x, y, n_saida):
+    """
+    Seleciona pontos pelo Largest-Triangle-Three-Buckets.
+
+    Mantém o primeiro e o último ponto e, em cada balde intermediário, o
+    ponto que forma o maior triângulo com o ponto escolhido no balde
+    anterior e a média do balde seguinte, preservando a forma da série.
+
+    Args:
+        x (np.array): Abscissas numéricas crescentes
+        y (np.array): Ordenadas
+        n_saida (int): Número de pontos desejado (>= 3)
+
+    Returns:
+        np.array: Índices selecionados, em ordem crescente
+    """
+    n = len(y)
+    if n_saida >= n or n_saida < 3:
+        return np.arange(n)
+
+    limites = np.linspace(1, n - 1, n_saida - 1).astype(np.int64)
+    indices = np.empty(n_saida, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    anterior = 0
+
+    for b in range(n_saida - 2):
+        inicio, fim = limites[b], limites[b + 1]
+        prox_inicio, prox_fim = limites[b + 1], (limites[b + 2] if b + 2 < len(limites) else n)
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[b + 1] = anterior
+
+    return indices
+
+
+def reduzir_serie(serie, max_pontos=MAX_PONTOS_PADRAO, manter=None):
+    """
+    Reduz uma série de linha preservando forma, extremos e pontos marcados.
+
+    Args:
+        serie (pd.Series): Série indexada pelo eixo do gráfico
+        max_pontos (int or None): Pontos escolhidos pelo LTTB (None mantém todos)
+        manter (array-like, optional): Posições que devem ser mantidas, por
+            exemplo as barras com entradas e saídas de trades
+
+    Returns:
+        pd.Series: Série reduzida
+    """
+    if max_pontos is None or len(serie) <= max_pontos:
+        return serie
+
+    valores = serie.to_numpy(dtype=float)
+    validos = np.flatnonzero(~np.isnan(valores))
+    if len(validos) == 0:
+        return serie.iloc[:0]
+
+    x = _eixo_numerico(serie.index)[validos]
+    y = valores[validos]
+    escolhidos = validos[lttb(x, y, max_pontos)]
+    extremos = validos[[np.argmin(y), np.argmax(y)]]
+
+    partes = [escolhidos, extremos]
+    if manter is not None:
+        manter = np.asarray(manter, dtype=np.int64)
+        partes.append(manter[(manter >= 0) & (manter < len(serie))])
+    return serie.iloc[np.unique(np.concatenate(partes))]
+
+
+class NivelDetalhe:
+    """
+    Mantém os dados em resolução completa e entrega versões reduzidas por janela.
+
+    Attributes:
+        df (pd.DataFrame): Dados em resolução completa
+        max_pontos (int): Máximo de barras ou pontos por série na saída
+    """
+
+    def __init__(self, df, max_pontos=MAX_PONTOS_PADRAO):
+        """
+        Inicializa o nível de detalhe.
+
+        Args:
+            df (pd.DataFrame): Dados OHLCV (e indicadores) em resolução completa
+            max_pontos (int): Máximo de barras ou pontos por série na saída
+        """
+        self.df = df
+        self.max_pontos = max_pontos
+
+    def janela(self, inicio=None, fim=None):
+        """
+        Dados completos do intervalo visível, sem redução.
+
+        Args:
+            inicio, fim (optional): Limites do intervalo (rótulos do índice)
+
+        Returns:
+            pd.DataFrame: Fatia em resolução completa
+        """
+        return self.df.loc[inicio:fim]
+
+    def candles(self, inicio=None, fim=None):
+        """
+        Candles do intervalo visível, agregados até 'max_pontos'.
+        """
+        return agregar_ohlcv(self.janela(inicio, fim), self.max_pontos)
+
+    def linha(self, coluna, inicio=None, fim=None, manter_datas=None):
+        """
+        Série de linha do intervalo visível, reduzida pelo LTTB.
+
+        Args:
+            coluna (str): Coluna a reduzir (ex.: 'rsi', 'macd')
+            inicio, fim (optional): Limites do intervalo
+            manter_datas (array-like, optional): Datas que devem ser mantidas
+
+        Returns:
+            pd.Series: Série reduzida
+        """
+        serie = self.janela(inicio, fim)[coluna]
+        manter = None
+        if manter_datas is not None:
+            manter = serie.index.get_indexer(pd.Index(manter_datas))
+        return reduzir_serie(serie, self.max_pontos, manter)
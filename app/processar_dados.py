@@ -47,6 +47,40 @@ def coletar_dados_15min(ticker, dias=30):
         logger.error(f"Erro ao coletar dados: {str(e)}")
         raise
 
+def coletar_dados_1min(ticker, dias=7):
+    """
+    Coleta barras de 1 minuto do Yahoo Finance, usadas pelo backtest intrabar
+    para resolver barras de 15 minutos que tocam o stop loss e o take profit.
+
+    Args:
+        ticker (str): Símbolo do ativo (ex: 'AAPL')
+        dias (int): Número de dias de dados históricos (o Yahoo limita a 7)
+
+    Returns:
+        pd.DataFrame: DataFrame com dados OHLCV
+    """
+    logger.info(f"Coletando barras de 1 minuto de {ticker} para os últimos {dias} dias")
+
+    try:
+        fim = datetime.now()
+        inicio = fim - timedelta(days=dias)
+
+        dados = yf.download(
+            ticker,
+            start=inicio,
+            end=fim,
+            interval='1m'
+        )
+
+        dados.columns = ['open', 'high', 'low', 'close', 'volume']
+
+        logger.info(f"Barras de 1 minuto coletadas: {len(dados)} registros")
+        return dados
+
+    except Exception as e:
+        logger.error(f"Erro ao coletar barras de 1 minuto: {str(e)}")
+        raise
+
 def adicionar_indicadores(df, ticker):
     """
     Adiciona indicadores técnicos ao DataFrame.
@@ -0,0 +1,150 @@
+"""
+Módulo do registro colunar de trades.
+Implementa um buffer tipado (array estruturado NumPy) preenchido diretamente
+pelos backtests e lido sem conversão pelas métricas, pelo histórico do robô
+e pelos gráficos.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Tipos de saída e seus códigos no campo 'tipo_saida'
+TIPOS_SAIDA = ('stop_loss', 'take_profit')
+CODIGO_TIPO_SAIDA = {tipo: codigo for codigo, tipo in enumerate(TIPOS_SAIDA)}
+
+TRADE_DTYPE = np.dtype([
+    ('idx_entrada', np.int64),
+    ('idx_saida', np.int64),
+    ('data_entrada', 'M8[ns]'),
+    ('data_saida', 'M8[ns]'),
+    ('preco_entrada', np.float64),
+    ('preco_saida', np.float64),
+    ('tipo_saida', np.int8),
+    ('resultado', np.float64)
+])
+
+TRADE_DTYPE_PORTFOLIO = np.dtype(TRADE_DTYPE.descr + [
+    ('ativo', np.int32),
+    ('quantidade', np.float64)
+])
+
+
+class RegistroTrades:
+    """
+    Buffer pré-alocado de trades que cresce por duplicação.
+
+    Attributes:
+        dtype (np.dtype): Tipo estruturado de cada trade
+    """
+
+    def __init__(self, capacidade=256, dtype=TRADE_DTYPE):
+        """
+        Inicializa o registro vazio.
+
+        Args:
+            capacidade (int): Capacidade inicial do buffer
+            dtype (np.dtype): Tipo estruturado de cada trade
+        """
+        self.dtype = dtype
+        self._dados = np.zeros(max(1, capacidade), dtype=dtype)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _garantir_capacidade(self, n):
+        if n > len(self._dados):
+            novo = np.zeros(max(n, 2 * len(self._dados)), dtype=self.dtype)
+            novo[:self._n] = self._dados[:self._n]
+            self._dados = novo
+
+    def adicionar(self, *campos):
+        """
+        Acrescenta um trade com os campos na ordem do dtype.
+        """
+        self._garantir_capacidade(self._n + 1)
+        self._dados[self._n] = campos
+        self._n += 1
+
+    def estender(self, trades):
+        """
+        Acrescenta um array estruturado de trades de uma vez.
+
+        Args:
+            trades (np.array): Trades com o mesmo dtype do registro
+        """
+        self._garantir_capacidade(self._n + len(trades))
+        self._dados[self._n:self._n + len(trades)] = trades
+        self._n += len(trades)
+
+    @property
+    def trades(self):
+        """Visão (sem cópia) dos trades registrados."""
+        return self._dados[:self._n]
+
+
+def preencher_datas(trades, indice):
+    """
+    Preenche as datas de entrada e saída a partir dos índices das barras.
+
+    Índices com fuso horário são gravados em UTC; índices não temporais deixam NaT.
+
+    Args:
+        trades (np.array): Trades com 'idx_entrada' e 'idx_saida' preenchidos
+        indice (pd.Index): Índice dos dados simulados
+    """
+    if isinstance(indice, pd.DatetimeIndex) and len(trades):
+        datas = indice.as_unit('ns').asi8.view('M8[ns]')
+        trades['data_entrada'] = datas[trades['idx_entrada']]
+        trades['data_saida'] = datas[trades['idx_saida']]
+    else:
+        trades['data_entrada'] = np.datetime64('NaT')
+        trades['data_saida'] = np.datetime64('NaT')
+
+
+def data_utc(data):
+    """
+    Converte uma data para o formato do registro (datetime64[ns] em UTC).
+
+    Args:
+        data (datetime or str): Data com ou sem fuso horário
+
+    Returns:
+        np.datetime64: Data em UTC
+    """
+    data = pd.Timestamp(data)
+    if data.tz is not None:
+        data = data.tz_convert('UTC').tz_localize(None)
+    return data.to_datetime64().astype('M8[ns]')
+
+
+def nomes_tipos_saida(codigos):
+    """
+    Converte códigos de tipo de saída em nomes.
+
+    Args:
+        codigos (np.array): Códigos do campo 'tipo_saida'
+
+    Returns:
+        np.array: Nomes dos tipos de saída
+    """
+    return np.asarray(TIPOS_SAIDA)[np.asarray(codigos, dtype=np.int64)]
+
+
+def entradas_saidas(trades, indice, entrada_aberta=None):
+    """
+    Monta as listas legadas de tuplas (data, preço) de entradas e saídas.
+
+    Args:
+        trades (np.array): Trades do registro
+        indice (pd.Index): Índice dos dados simulados
+        entrada_aberta (tuple, optional): (idx, preço) da posição aberta ao final
+
+    Returns:
+        tuple: (entradas, saidas)
+    """
+    entradas = list(zip(indice[trades['idx_entrada']], trades['preco_entrada'].tolist()))
+    if entrada_aberta is not None:
+        entradas.append((indice[entrada_aberta[0]], entrada_aberta[1]))
+    saidas = list(zip(indice[trades['idx_saida']], trades['preco_saida'].tolist()))
+    return entradas, saidas
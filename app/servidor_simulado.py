@@ -0,0 +1,439 @@
+"""
+Servidor local que simula a API da corretora.
+Implementa /market/history, /order (envio e consulta por clientOrderId),
+/orders/batch, /position e
+/account/balance com a mesma verificação de assinatura HMAC da API real,
+latência e erros injetáveis, e um feed de mercado por websocket (/ws), para
+exercitar ConexaoCorretora e o loop ao vivo sem acessar a corretora.
+"""
+
+import asyncio
+import hmac
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from aiohttp import web, WSMsgType
+from logger import logger
+from classeConexaoCorretora import gerar_assinatura
+
+
+class CorretoraSimulada:
+    """
+    Corretora simulada sobre aiohttp.web.
+
+    Os candles de cada símbolo são gerados de forma determinística a partir
+    do símbolo e do período (ciclos de preço mais ruído por hash), alinhados
+    ao timeframe e terminando no candle corrente. Ordens de compra abrem
+    posições e ordens de venda as encerram, ao preço informado ou ao último
+    fechamento.
+
+    Attributes:
+        api_secret (str): Segredo usado para verificar as assinaturas
+        latencia (float): Atraso fixo por requisição, em segundos
+        jitter (float): Atraso adicional aleatório máximo, em segundos
+        taxa_erro (float): Probabilidade de responder 503 a uma requisição
+        janela_recebimento (int): Diferença máxima, em ms, entre o timestamp
+            assinado e o relógio do servidor
+        intervalo_ws (float): Segundos entre as atualizações do websocket
+        saldo (float): Saldo disponível da conta
+        posicoes (dict): Símbolo -> posição aberta
+        execucoes (list): Execuções (ordens e stops disparados), na ordem
+        ordens (dict): clientOrderId -> confirmação das ordens executadas
+        contagem (dict): Requisições recebidas por endpoint
+    """
+
+    def __init__(self, api_secret, latencia=0.0, jitter=0.0, taxa_erro=0.0,
+                 saldo_inicial=10000.0, janela_recebimento=5000, semente=42, intervalo_ws=0.25):
+        """
+        Inicializa a corretora simulada.
+
+        Args:
+            api_secret (str): Segredo usado para verificar as assinaturas
+            latencia (float): Atraso fixo por requisição, em segundos
+            jitter (float): Atraso adicional aleatório máximo, em segundos
+            taxa_erro (float): Probabilidade de responder 503
+            saldo_inicial (float): Saldo inicial da conta
+            janela_recebimento (int): Tolerância do timestamp assinado, em ms
+            semente (int): Semente dos preços e das falhas injetadas
+            intervalo_ws (float): Intervalo entre as atualizações do websocket
+        """
+        self.api_secret = api_secret
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.janela_recebimento = janela_recebimento
+        self.semente = semente
+        self.intervalo_ws = intervalo_ws
+        self.saldo = float(saldo_inicial)
+        self.posicoes = {}
+        self.execucoes = []
+        self.ordens = {}
+        self.contagem = {}
+        self._aleatorio = random.Random(semente)
+        self._proxima_ordem = 1
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Dados de mercado
+    # ------------------------------------------------------------------
+
+    def _uniforme(self, base, periodos, canal):
+        """
+        Números uniformes em [0, 1) determinísticos por (símbolo, período, canal).
+        """
+        x = (periodos.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+             + np.uint64((base * 31 + canal) & 0xFFFFFFFFFFFFFFFF))
+        # Finalizador do splitmix64
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+        return (x >> np.uint64(11)).astype(np.float64) / float(2**53)
+
+    def _fechamentos(self, base, periodos):
+        fase = (base % 628) / 100.0
+        log_preco = (np.log(100 + base % 900)
+                     + 0.08 * np.sin(periodos / 700.0 + fase)
+                     + 0.03 * np.sin(periodos / 90.0 + 2 * fase)
+                     + 0.01 * np.sin(periodos / 13.0)
+                     + 0.004 * (self._uniforme(base, periodos, 0) - 0.5))
+        return np.exp(log_preco)
+
+    def candles(self, simbolo, timeframe, limite, fim=None, desde=None):
+        """
+        Gera os últimos 'limite' candles do símbolo até o candle que contém 'fim'.
+
+        Com 'desde', gera os primeiros 'limite' candles com timestamp a partir
+        dele (sem passar do candle corrente). Cada candle depende só do
+        símbolo e do seu período, então janelas sobrepostas de requisições
+        diferentes são consistentes entre si.
+
+        Args:
+            simbolo (str): Símbolo do ativo
+            timeframe (str): Intervalo dos candles (ex.: '15min')
+            limite (int): Número máximo de candles
+            fim (float, optional): Instante final em segundos (padrão: agora)
+            desde (int, optional): Timestamp mínimo em ms
+
+        Returns:
+            list: Candles com 'timestamp' (ms), 'open', 'high', 'low', 'close' e 'volume'
+        """
+        passo_ms = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+        ultimo = int((time.time() if fim is None else fim) * 1000) // passo_ms
+        if desde is not None:
+            primeiro = -(-int(desde) // passo_ms)
+            periodos = np.arange(primeiro, min(primeiro + limite - 1, ultimo) + 1, dtype=np.int64)
+        else:
+            periodos = np.arange(ultimo - limite + 1, ultimo + 1, dtype=np.int64)
+        base = zlib.crc32(simbolo.encode('utf-8')) ^ self.semente
+
+        close = self._fechamentos(base, periodos)
+        abertura = self._fechamentos(base, periodos - 1)
+        amplitude = np.abs(close - abertura) + close * 0.002 * self._uniforme(base, periodos, 1)
+        maxima = np.maximum(abertura, close) + amplitude * self._uniforme(base, periodos, 2)
+        minima = np.minimum(abertura, close) - amplitude * self._uniforme(base, periodos, 3)
+        volume = 1000 + 9000 * self._uniforme(base, periodos, 4)
+
+        return [
+            {'timestamp': int(p * passo_ms), 'open': float(o), 'high': float(h),
+             'low': float(lo), 'close': float(c), 'volume': float(v)}
+            for p, o, h, lo, c, v in zip(periodos, abertura, maxima, minima, close, volume)
+        ]
+
+    # ------------------------------------------------------------------
+    # Infraestrutura das requisições
+    # ------------------------------------------------------------------
+
+    def _verificar_assinatura(self, params):
+        params = dict(params)
+        assinatura = params.pop('signature', '')
+        esperada = gerar_assinatura(self.api_secret, params)
+        if not hmac.compare_digest(esperada, assinatura):
+            raise web.HTTPUnauthorized(reason='Assinatura inválida')
+        try:
+            atraso = abs(time.time() * 1000 - int(params['timestamp']))
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(reason='Timestamp ausente')
+        if atraso > self.janela_recebimento:
+            raise web.HTTPBadRequest(reason='Timestamp fora da janela de recebimento')
+        return params
+
+    async def _preparar(self, request):
+        """
+        Conta a requisição, aplica latência e falhas injetadas e valida a assinatura.
+
+        Returns:
+            dict: Parâmetros da requisição, sem a assinatura
+        """
+        endpoint = request.path
+        self.contagem[endpoint] = self.contagem.get(endpoint, 0) + 1
+
+        atraso = self.latencia + (self._aleatorio.uniform(0, self.jitter) if self.jitter else 0.0)
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        if self.taxa_erro and self._aleatorio.random() < self.taxa_erro:
+            raise web.HTTPServiceUnavailable(reason='Falha injetada')
+
+        params = await request.json() if request.method == 'POST' else request.query
+        return self._verificar_assinatura(params)
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    async def _historico(self, request):
+        params = await self._preparar(request)
+        limite = min(int(params.get('limit', 1000)), 5000)
+        return web.json_response(self.candles(params['symbol'], params.get('timeframe', '15min'), limite,
+                                              desde=params.get('since')))
+
+    def _registrar_execucao(self, simbolo, lado, quantidade, preco, id_cliente=None):
+        """
+        Gera o id de uma execução e a acrescenta às notificações do websocket.
+
+        Returns:
+            dict: Execução registrada
+        """
+        execucao = {
+            'orderId': f"SIM-{self._proxima_ordem}",
+            'clientOrderId': id_cliente,
+            'symbol': simbolo,
+            'side': lado,
+            'quantity': quantidade,
+            'price': preco,
+            'timestamp': int(time.time() * 1000)
+        }
+        self._proxima_ordem += 1
+        self.execucoes.append(execucao)
+        return execucao
+
+    def _disparar_stops(self):
+        """
+        Encerra as posições cujo último preço atingiu o stop loss ou o take profit.
+        """
+        for simbolo, posicao in list(self.posicoes.items()):
+            preco = self.candles(simbolo, '1min', 1)[-1]['close']
+            stop, alvo = posicao.get('stopLoss'), posicao.get('takeProfit')
+            if (stop and preco <= float(stop)) or (alvo and preco >= float(alvo)):
+                del self.posicoes[simbolo]
+                self.saldo += posicao['quantity'] * preco
+                self._registrar_execucao(simbolo, 'SELL', posicao['quantity'], preco)
+
+    def _executar_ordem(self, params):
+        """
+        Executa uma ordem a mercado ou ao preço limite informado.
+
+        Returns:
+            dict: Confirmação com 'orderId', 'clientOrderId' e 'status'
+        """
+        simbolo = params['symbol']
+        quantidade = float(params['quantity'])
+        preco = float(params.get('price') or self.candles(simbolo, '1min', 1)[-1]['close'])
+
+        if params['side'] in ('COMPRA', 'BUY'):
+            self.posicoes[simbolo] = {
+                'symbol': simbolo,
+                'side': 'BUY',
+                'quantity': quantidade,
+                'price': preco,
+                'stopLoss': params.get('stopLoss'),
+                'takeProfit': params.get('takeProfit')
+            }
+            self.saldo -= quantidade * preco
+        else:
+            posicao = self.posicoes.pop(simbolo, None)
+            if posicao is not None:
+                self.saldo += posicao['quantity'] * preco
+
+        execucao = self._registrar_execucao(simbolo, params['side'], quantidade, preco,
+                                            params.get('clientOrderId'))
+        confirmacao = {
+            'orderId': execucao['orderId'],
+            'clientOrderId': execucao['clientOrderId'],
+            'symbol': simbolo,
+            'side': params['side'],
+            'type': params['type'],
+            'quantity': quantidade,
+            'price': preco,
+            'status': 'FILLED'
+        }
+        if confirmacao['clientOrderId']:
+            self.ordens[confirmacao['clientOrderId']] = confirmacao
+        return confirmacao
+
+    async def _ordem(self, request):
+        params = await self._preparar(request)
+        return web.json_response(self._executar_ordem(params))
+
+    async def _consulta_ordem(self, request):
+        params = await self._preparar(request)
+        confirmacao = self.ordens.get(params.get('clientOrderId'))
+        if confirmacao is None:
+            raise web.HTTPNotFound(reason='Ordem não encontrada')
+        return web.json_response(confirmacao)
+
+    async def _lote(self, request):
+        params = await self._preparar(request)
+        confirmacoes = []
+        for ordem in params['orders']:
+            try:
+                confirmacoes.append(self._executar_ordem(ordem))
+            except (KeyError, TypeError, ValueError) as e:
+                confirmacoes.append({'clientOrderId': ordem.get('clientOrderId'), 'status': 'REJECTED',
+                                     'message': f"Ordem inválida: {str(e)}"})
+        return web.json_response(confirmacoes)
+
+    async def _posicoes(self, request):
+        await self._preparar(request)
+        self._disparar_stops()
+        return web.json_response(list(self.posicoes.values()))
+
+    async def _saldo(self, request):
+        await self._preparar(request)
+        self._disparar_stops()
+        investido = sum(p['quantity'] * p['price'] for p in self.posicoes.values())
+        return web.json_response({'asset': 'USD', 'available': self.saldo, 'total': self.saldo + investido})
+
+    async def _websocket(self, request):
+        """
+        Feed de mercado por websocket.
+
+        A primeira mensagem do cliente é a assinatura, assinada como as
+        requisições REST: {'op': 'subscribe', 'symbols': [...], 'timeframe':
+        ..., 'timestamp': ..., 'signature': ...}. Depois disso o servidor envia,
+        a cada 'intervalo_ws' segundos, um 'trade' com o último preço de cada
+        símbolo, assim que um candle fecha, uma mensagem 'candle' com ele, e
+        uma mensagem 'fill' para cada execução (ordem ou stop disparado) dos
+        símbolos assinados.
+        """
+        self.contagem['/ws'] = self.contagem.get('/ws', 0) + 1
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        try:
+            params = self._verificar_assinatura(await ws.receive_json(timeout=self.intervalo_ws * 20))
+        except (web.HTTPException, ValueError, TypeError, asyncio.TimeoutError) as e:
+            await ws.send_json({'type': 'error', 'message': getattr(e, 'reason', str(e))})
+            await ws.close()
+            return ws
+
+        simbolos = list(params['symbols'])
+        timeframe = params['timeframe']
+        passo_ms = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+        fechados = {s: self.candles(s, timeframe, 2)[0]['timestamp'] for s in simbolos}
+        notificadas = len(self.execucoes)
+        await ws.send_json({'type': 'subscribed', 'symbols': simbolos, 'timeframe': timeframe})
+
+        try:
+            while not ws.closed:
+                for simbolo in simbolos:
+                    atual = self.candles(simbolo, timeframe, 1)[-1]
+                    # Candles fechados desde o último envio (pode haver mais de um)
+                    for candle in self.candles(simbolo, timeframe, 5000, desde=fechados[simbolo] + 1):
+                        if candle['timestamp'] + passo_ms > time.time() * 1000:
+                            break
+                        await ws.send_json({'type': 'candle', 'symbol': simbolo, 'timeframe': timeframe,
+                                            'closed': True, 'candle': candle})
+                        fechados[simbolo] = candle['timestamp']
+                    await ws.send_json({'type': 'trade', 'symbol': simbolo, 'price': atual['close'],
+                                        'timestamp': int(time.time() * 1000)})
+
+                self._disparar_stops()
+                for execucao in self.execucoes[notificadas:]:
+                    if execucao['symbol'] in simbolos:
+                        await ws.send_json(dict(execucao, type='fill'))
+                notificadas = len(self.execucoes)
+
+                try:
+                    msg = await ws.receive(timeout=self.intervalo_ws)
+                except asyncio.TimeoutError:
+                    continue
+                if msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED, WSMsgType.ERROR):
+                    break
+        except ConnectionResetError:
+            pass
+
+        return ws
+
+    def criar_app(self):
+        """
+        Cria a aplicação aiohttp com as rotas da API.
+
+        Returns:
+            web.Application: Aplicação pronta para servir
+        """
+        app = web.Application()
+        app.router.add_get('/market/history', self._historico)
+        app.router.add_post('/order', self._ordem)
+        app.router.add_get('/order', self._consulta_ordem)
+        app.router.add_post('/orders/batch', self._lote)
+        app.router.add_get('/position', self._posicoes)
+        app.router.add_get('/account/balance', self._saldo)
+        app.router.add_get('/ws', self._websocket)
+        return app
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    async def iniciar(self, host='127.0.0.1', porta=0):
+        """
+        Inicia o servidor no loop de eventos corrente.
+
+        Args:
+            host (str): Endereço de escuta
+            porta (int): Porta (0 escolhe uma porta livre)
+
+        Returns:
+            str: URL base para ConexaoCorretora
+        """
+        self._runner = web.AppRunner(self.criar_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, porta)
+        await site.start()
+        porta = self._runner.addresses[0][1]
+
+        logger.info(f"Corretora simulada ouvindo em http://{host}:{porta}")
+        return f"http://{host}:{porta}"
+
+    async def parar(self):
+        """
+        Encerra o servidor iniciado com iniciar.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def iniciar_em_thread(self, host='127.0.0.1', porta=0):
+        """
+        Inicia o servidor em uma thread com loop próprio, para clientes síncronos.
+
+        Args:
+            host (str): Endereço de escuta
+            porta (int): Porta (0 escolhe uma porta livre)
+
+        Returns:
+            str: URL base para ConexaoCorretora
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.iniciar(host, porta), self._loop).result()
+
+    def parar_thread(self):
+        """
+        Encerra o servidor iniciado com iniciar_em_thread.
+        """
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.parar(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
@@ -0,0 +1,298 @@
+"""
+Teste de carga do caminho até a corretora.
+Executa o cliente da corretora e o loop ao vivo contra a corretora simulada e
+relata vazão de requisições, latências p50/p99 e quantos ativos um processo
+consegue acompanhar por candle.
+
+Uso:
+    python teste_carga.py --simbolos 50 --rodadas 3 --latencia 0.02 --taxa-erro 0.01
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+from logger import logger
+from classeConexaoCorretora import ConexaoCorretora
+from classeConexaoAssincrona import ConexaoCorretoraAssincrona
+from agendador_requisicoes import AgendadorRequisicoes
+from despacho_ordens import DespachoOrdens
+from classeRobo import RoboTrading
+from servidor_simulado import CorretoraSimulada
+from walk_forward import matriz_features, treinar_janela
+
+SEGREDO_TESTE = 'segredo-teste'
+
+
+class MedidorLatencia:
+    """
+    Acumula a latência e o resultado de cada requisição, por endpoint.
+
+    Attributes:
+        latencias (dict): Endpoint -> lista de latências em segundos
+        erros (dict): Endpoint -> número de falhas
+    """
+
+    def __init__(self):
+        self.latencias = {}
+        self.erros = {}
+        self.inicio = time.perf_counter()
+
+    def registrar(self, endpoint, segundos, erro=False):
+        self.latencias.setdefault(endpoint, []).append(segundos)
+        if erro:
+            self.erros[endpoint] = self.erros.get(endpoint, 0) + 1
+
+    def medir(self, endpoint, funcao, *args, **kwargs):
+        """
+        Executa uma chamada síncrona registrando sua latência.
+
+        Returns:
+            Resultado da chamada, ou None se ela falhar
+        """
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args, **kwargs)
+        except Exception:
+            self.registrar(endpoint, time.perf_counter() - inicio, erro=True)
+            return None
+        self.registrar(endpoint, time.perf_counter() - inicio)
+        return resultado
+
+    async def medir_async(self, endpoint, corrotina):
+        """
+        Aguarda uma chamada assíncrona registrando sua latência.
+
+        Returns:
+            Resultado da chamada, ou None se ela falhar
+        """
+        inicio = time.perf_counter()
+        try:
+            resultado = await corrotina
+        except Exception:
+            self.registrar(endpoint, time.perf_counter() - inicio, erro=True)
+            return None
+        self.registrar(endpoint, time.perf_counter() - inicio)
+        return resultado
+
+    def relatorio(self):
+        """
+        Consolida as medições.
+
+        Returns:
+            dict: Total de requisições e erros, duração, vazão (req/s) e
+                latências p50/p99 em ms, no geral e por endpoint
+        """
+        duracao = time.perf_counter() - self.inicio
+        todas = np.concatenate([np.asarray(v) for v in self.latencias.values()]) if self.latencias else np.empty(0)
+
+        def _resumo(latencias, erros):
+            latencias = np.asarray(latencias)
+            return {
+                'requisicoes': int(len(latencias)),
+                'erros': int(erros),
+                'p50_ms': float(np.percentile(latencias, 50) * 1000) if len(latencias) else 0.0,
+                'p99_ms': float(np.percentile(latencias, 99) * 1000) if len(latencias) else 0.0
+            }
+
+        relatorio = _resumo(todas, sum(self.erros.values()))
+        relatorio['duracao'] = duracao
+        relatorio['vazao'] = relatorio['requisicoes'] / duracao if duracao > 0 else 0.0
+        relatorio['por_endpoint'] = {e: _resumo(v, self.erros.get(e, 0)) for e, v in self.latencias.items()}
+        return relatorio
+
+
+def _percentis_ms(tempos):
+    tempos = np.asarray(tempos)
+    if not len(tempos):
+        return 0.0, 0.0
+    return float(np.percentile(tempos, 50) * 1000), float(np.percentile(tempos, 99) * 1000)
+
+
+def preparar_robo(base_url, simbolo='SIM0', timeframe='15min', n_candles=3000):
+    """
+    Cria um robô com um modelo leve treinado sobre o histórico simulado.
+
+    O modelo usa o treino de uma janela walk-forward (sem busca em grade),
+    suficiente para exercitar monitorar_mercado no teste de carga.
+
+    Args:
+        base_url (str): URL da corretora simulada
+        simbolo (str): Símbolo usado no treino
+        timeframe (str): Intervalo dos candles
+        n_candles (int): Candles de histórico
+
+    Returns:
+        RoboTrading: Robô com modelo e scaler prontos
+    """
+    conexao = ConexaoCorretora('chave-teste', SEGREDO_TESTE, base_url)
+    robo = RoboTrading()
+    df = robo.preparar_dados(conexao.obter_dados_mercado(simbolo, timeframe, limite=n_candles))
+    X = matriz_features(df).to_numpy(dtype=float)
+    modelo = treinar_janela(X, df['target_class'].to_numpy(), X[-1:],
+                            {'n_estimators': 50, 'max_depth': 8, 'random_state': 42})
+    robo.scaler, robo.modelo = modelo['scaler'], modelo['modelo']
+    return robo
+
+
+def carga_loop(base_url, robo, simbolos, timeframe='15min', rodadas=1, limite=100):
+    """
+    Executa o loop ao vivo síncrono (dados -> posições -> sinal -> ordem) para cada ativo.
+
+    As ordens saem pelo DespachoOrdens, então o tempo por ativo não inclui o
+    envio; a latência das ordens, da fila à confirmação, vem à parte.
+
+    Args:
+        base_url (str): URL da corretora simulada
+        robo (RoboTrading): Robô com modelo treinado
+        simbolos (list): Ativos acompanhados
+        timeframe (str): Intervalo dos candles
+        rodadas (int): Passagens por todos os ativos
+        limite (int): Candles baixados por ativo a cada passagem
+
+    Returns:
+        dict: Relatório do MedidorLatencia mais a latência por ativo
+            ('tick_p50_ms', 'tick_p99_ms'), ordens confirmadas, métricas do
+            agendador (retentativas) e do despacho de ordens e a estimativa
+            de ativos acompanhados por candle
+    """
+    # Sem limite de taxa, para medir o caminho até a corretora e não o agendador
+    agendador = AgendadorRequisicoes(limites={'padrao': (1e6, 1e6), '/market/history': (1e6, 1e6),
+                                              '/order': (1e6, 1e6)}, backoff_base=0.01)
+    conexao = ConexaoCorretora('chave-teste', SEGREDO_TESTE, base_url, agendador=agendador)
+    medidor = MedidorLatencia()
+    despacho = DespachoOrdens(conexao)
+    despacho.iniciar()
+    tempos_tick = []
+
+    for _ in range(rodadas):
+        for simbolo in simbolos:
+            inicio = time.perf_counter()
+            dados = medidor.medir('/market/history', conexao.obter_dados_mercado, simbolo, timeframe, limite)
+            posicoes = medidor.medir('/position', conexao.verificar_posicoes)
+            if dados is not None and posicoes is not None and \
+                    not any(p['symbol'] == simbolo for p in posicoes) and not despacho.tem_pendente(simbolo):
+                sinal = robo.monitorar_mercado(dados, ativo=simbolo)
+                if sinal:
+                    despacho.enviar(simbolo, 'compra', sinal['tamanho_posicao'] / sinal['preco_entrada'],
+                                    preco=sinal['preco_entrada'],
+                                    stop_loss=sinal['stop_loss'],
+                                    take_profit=sinal['take_profit'])
+            tempos_tick.append(time.perf_counter() - inicio)
+
+    despacho.parar()
+    relatorio = medidor.relatorio()
+    relatorio['tick_p50_ms'], relatorio['tick_p99_ms'] = _percentis_ms(tempos_tick)
+    relatorio['despacho'] = despacho.metricas()
+    relatorio['ordens'] = relatorio['despacho']['confirmadas']
+    relatorio['agendador'] = agendador.metricas()
+    relatorio['ativos_por_candle'] = int(pd.Timedelta(timeframe).total_seconds() / np.mean(tempos_tick))
+    return relatorio
+
+
+async def carga_cliente(base_url, simbolos, timeframe='15min', rodadas=1, limite=100, max_conexoes=20):
+    """
+    Consulta dados, posições e saldo de todos os ativos em paralelo com o cliente assíncrono.
+
+    Args:
+        base_url (str): URL da corretora simulada
+        simbolos (list): Ativos consultados
+        timeframe (str): Intervalo dos candles
+        rodadas (int): Passagens por todos os ativos
+        limite (int): Candles baixados por ativo a cada passagem
+        max_conexoes (int): Conexões simultâneas do pool
+
+    Returns:
+        dict: Relatório do MedidorLatencia mais a duração média de uma
+            rodada e a estimativa de ativos acompanhados por candle
+    """
+    medidor = MedidorLatencia()
+    tempos_rodada = []
+
+    async with ConexaoCorretoraAssincrona('chave-teste', SEGREDO_TESTE, base_url,
+                                          max_conexoes=max_conexoes) as conexao:
+        for _ in range(rodadas):
+            inicio = time.perf_counter()
+            tarefas = [medidor.medir_async('/market/history', conexao.obter_dados_mercado(s, timeframe, limite))
+                       for s in simbolos]
+            tarefas += [medidor.medir_async('/position', conexao.verificar_posicoes()),
+                        medidor.medir_async('/account/balance', conexao.obter_saldo())]
+            await asyncio.gather(*tarefas)
+            tempos_rodada.append(time.perf_counter() - inicio)
+
+    relatorio = medidor.relatorio()
+    relatorio['rodada_ms'] = float(np.mean(tempos_rodada) * 1000)
+    relatorio['ativos_por_candle'] = int(pd.Timedelta(timeframe).total_seconds()
+                                         / (np.mean(tempos_rodada) / len(simbolos)))
+    return relatorio
+
+
+def imprimir_relatorio(titulo, relatorio):
+    """
+    Exibe um relatório de carga no console.
+    """
+    print(f"\n=== {titulo} ===")
+    print(f"Requisições: {relatorio['requisicoes']} ({relatorio['erros']} erros) "
+          f"em {relatorio['duracao']:.2f}s -> {relatorio['vazao']:.1f} req/s")
+    print(f"Latência: p50 {relatorio['p50_ms']:.1f} ms | p99 {relatorio['p99_ms']:.1f} ms")
+    for endpoint, resumo in relatorio['por_endpoint'].items():
+        print(f"  {endpoint:<18} {resumo['requisicoes']:>6} req  {resumo['erros']:>4} erros  "
+              f"p50 {resumo['p50_ms']:7.1f} ms  p99 {resumo['p99_ms']:7.1f} ms")
+    if 'tick_p50_ms' in relatorio:
+        print(f"Tempo por ativo: p50 {relatorio['tick_p50_ms']:.1f} ms | p99 {relatorio['tick_p99_ms']:.1f} ms "
+              f"| ordens {relatorio['ordens']}")
+    if 'despacho' in relatorio:
+        despacho = relatorio['despacho']
+        print(f"Ordens: {despacho['requisicoes']} requisições | fila p50 {despacho['fila_p50_ms']:.1f} ms "
+              f"| da fila à confirmação p50 {despacho['total_p50_ms']:.1f} ms p99 {despacho['total_p99_ms']:.1f} ms")
+    if 'agendador' in relatorio:
+        retentativas = sum(m['retentativas'] for m in relatorio['agendador']['endpoints'].values())
+        print(f"Agendador: {retentativas} retentativas | disjuntor {relatorio['agendador']['disjuntor']['estado']}")
+    print(f"Estimativa: {relatorio['ativos_por_candle']} ativos por candle em um processo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga contra a corretora simulada')
+    parser.add_argument('--simbolos', type=int, default=20, help='Número de ativos')
+    parser.add_argument('--rodadas', type=int, default=3, help='Passagens por todos os ativos')
+    parser.add_argument('--timeframe', default='15min')
+    parser.add_argument('--limite', type=int, default=100, help='Candles por consulta')
+    parser.add_argument('--latencia', type=float, default=0.02, help='Latência injetada (s)')
+    parser.add_argument('--jitter', type=float, default=0.01, help='Jitter injetado (s)')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração de respostas 503')
+    parser.add_argument('--conexoes', type=int, default=20, help='Pool do cliente assíncrono')
+    parser.add_argument('--sem-loop', action='store_true', help='Não executar o loop ao vivo síncrono')
+    args = parser.parse_args()
+
+    # Os logs por requisição distorcem a medição
+    nivel = logger.level
+    logger.setLevel('WARNING')
+
+    corretora = CorretoraSimulada(SEGREDO_TESTE, latencia=args.latencia, jitter=args.jitter,
+                                  taxa_erro=args.taxa_erro)
+    base_url = corretora.iniciar_em_thread()
+    simbolos = [f"SIM{i}" for i in range(args.simbolos)]
+
+    try:
+        relatorio = asyncio.run(carga_cliente(base_url, simbolos, args.timeframe, args.rodadas,
+                                              args.limite, args.conexoes))
+        imprimir_relatorio('Cliente assíncrono', relatorio)
+
+        if not args.sem_loop:
+            taxa_erro, corretora.taxa_erro = corretora.taxa_erro, 0.0
+            robo = preparar_robo(base_url, timeframe=args.timeframe)
+            corretora.taxa_erro = taxa_erro
+            corretora.contagem.clear()
+            relatorio = carga_loop(base_url, robo, simbolos, args.timeframe, args.rodadas, args.limite)
+            imprimir_relatorio('Loop ao vivo síncrono', relatorio)
+            # Chamadas servidas pelo cache de posições e saldo não chegam à corretora
+            print(f"Recebidas pela corretora: {corretora.contagem}")
+    finally:
+        corretora.parar_thread()
+        logger.setLevel(nivel)
+
+
+if __name__ == "__main__":
+    main()
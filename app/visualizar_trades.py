@@ -8,8 +8,44 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from logger import logger
+from registro_trades import nomes_tipos_saida
+from nivel_detalhe import MAX_PONTOS_PADRAO, agregar_ohlcv, reduzir_serie
 
-def plot_trades(df, entradas, saidas, tipos_saida=None, title='Visualização de Trades'):
+# Cores dos marcadores de saída por tipo (inclui as siglas antigas TP/TS)
+CORES_TIPO_SAIDA = {
+    'stop_loss': 'red',
+    'take_profit': 'blue',
+    'trailing_stop': 'orange',
+    'TP': 'blue',
+    'TS': 'orange'
+}
+
+# Total de marcadores a partir do qual o gráfico usa Scattergl (WebGL)
+LIMIAR_WEBGL = 1000
+
+
+def _colunas_marcadores(pontos):
+    """
+    Converte uma sequência de tuplas (data, preço) em duas colunas.
+    """
+    pontos = list(pontos) if pontos is not None else []
+    if not pontos:
+        return [], []
+    datas, precos = zip(*pontos)
+    return list(datas), list(precos)
+
+
+def _datas_registro(datas, indice):
+    """
+    Converte datas do registro de trades (UTC) para o fuso do índice do gráfico.
+    """
+    datas = pd.DatetimeIndex(datas)
+    tz = getattr(indice, 'tz', None)
+    return datas.tz_localize('UTC').tz_convert(tz) if tz is not None else datas
+
+
+def plot_trades(df, entradas=None, saidas=None, tipos_saida=None, title='Visualização de Trades',
+                trades=None, max_barras=MAX_PONTOS_PADRAO):
     """
     Cria um gráfico interativo mostrando os trades realizados.
     
@@ -19,6 +55,14 @@ def plot_trades(df, entradas, saidas, tipos_saida=None, title='Visualização de
         saidas (list): Lista de tuplas (data, preço) de saídas
         tipos_saida (list): Lista de tipos de saída (opcional)
         title (str): Título do gráfico
+        trades (np.array, optional): Registro colunar de trades; substitui
+            entradas, saídas e tipos de saída. Os marcadores são posicionados
+            por 'data_entrada' e 'data_saida', então servem trades de
+            backtest sobre qualquer recorte de 'df' e trades ao vivo;
+            trades sem data (NaT) não são desenhados
+        max_barras (int or None): Máximo de candles desenhados; históricos
+            maiores são agregados em barras mais longas (None desenha todos).
+            Os marcadores mantêm as datas e preços originais
         
     Returns:
         plotly.graph_objects.Figure: Figura com o gráfico
@@ -26,6 +70,28 @@ def plot_trades(df, entradas, saidas, tipos_saida=None, title='Visualização de
     logger.info("Criando visualização de trades")
     
     try:
+        if trades is not None:
+            x_entradas, y_entradas = _datas_registro(trades['data_entrada'], df.index), trades['preco_entrada']
+            x_saidas, y_saidas = _datas_registro(trades['data_saida'], df.index), trades['preco_saida']
+            tipos_saida = nomes_tipos_saida(trades['tipo_saida'])
+        else:
+            x_entradas, y_entradas = _colunas_marcadores(entradas)
+            x_saidas, y_saidas = _colunas_marcadores(saidas)
+            if tipos_saida is not None:
+                tipos_saida = np.asarray(tipos_saida, dtype=object)
+
+        # Cor de cada saída pelo tipo; sem tipo, vermelho
+        if tipos_saida is not None and len(tipos_saida) == len(x_saidas):
+            cores_saida = [CORES_TIPO_SAIDA.get(tipo, 'red') for tipo in tipos_saida]
+        else:
+            tipos_saida = None
+            cores_saida = 'red'
+
+        # Acima do limiar os marcadores são desenhados com WebGL
+        Marcadores = go.Scattergl if len(x_entradas) + len(x_saidas) > LIMIAR_WEBGL else go.Scatter
+        
+        df = agregar_ohlcv(df, max_barras)
+
         # Criar figura
         fig = make_subplots(rows=2, cols=1, 
                            shared_xaxes=True,
@@ -47,33 +113,26 @@ def plot_trades(df, entradas, saidas, tipos_saida=None, title='Visualização de
                             name='Volume'),
                      row=2, col=1)
         
-        # Adicionar pontos de entrada
-        for entrada in entradas:
-            fig.add_trace(go.Scatter(x=[entrada[0]],
-                                    y=[entrada[1]],
-                                    mode='markers',
-                                    marker=dict(symbol='triangle-up',
-                                              size=10,
-                                              color='green'),
-                                    name='Entrada'),
-                         row=1, col=1)
-        
-        # Adicionar pontos de saída
-        for i, saida in enumerate(saidas):
-            cor = 'red'
-            if tipos_saida and tipos_saida[i] == 'TP':
-                cor = 'blue'
-            elif tipos_saida and tipos_saida[i] == 'TS':
-                cor = 'orange'
-                
-            fig.add_trace(go.Scatter(x=[saida[0]],
-                                    y=[saida[1]],
-                                    mode='markers',
-                                    marker=dict(symbol='triangle-down',
-                                              size=10,
-                                              color=cor),
-                                    name='Saída'),
-                         row=1, col=1)
+        # Adicionar pontos de entrada, em um único trace
+        fig.add_trace(Marcadores(x=x_entradas,
+                                 y=y_entradas,
+                                 mode='markers',
+                                 marker=dict(symbol='triangle-up',
+                                             size=10,
+                                             color='green'),
+                                 name='Entrada'),
+                      row=1, col=1)
+        
+        # Adicionar pontos de saída, com o tipo codificado na cor
+        fig.add_trace(Marcadores(x=x_saidas,
+                                 y=y_saidas,
+                                 mode='markers',
+                                 marker=dict(symbol='triangle-down',
+                                             size=10,
+                                             color=cores_saida),
+                                 text=list(tipos_saida) if tipos_saida is not None else None,
+                                 name='Saída'),
+                      row=1, col=1)
         
         # Configurar layout
         fig.update_layout(
@@ -135,7 +194,8 @@ def plot_retornos(retornos, title='Distribuição de Retornos'):
         logger.error(f"Erro ao criar visualização de distribuição de retornos: {str(e)}")
         raise
 
-def plot_equity_curve(df_trades, capital_inicial=10000, title='Curva de Equity'):
+def plot_equity_curve(df_trades, capital_inicial=10000, title='Curva de Equity',
+                      max_pontos=MAX_PONTOS_PADRAO):
     """
     Cria um gráfico da curva de equity ao longo do tempo.
     
@@ -143,6 +203,8 @@ def plot_equity_curve(df_trades, capital_inicial=10000, title='Curva de Equity')
         df_trades (pd.DataFrame): DataFrame com informações dos trades
         capital_inicial (float): Capital inicial
         title (str): Título do gráfico
+        max_pontos (int or None): Máximo de pontos da curva, reduzida pelo LTTB
+            preservando os extremos (None desenha todos)
         
     Returns:
         plotly.graph_objects.Figure: Figura com o gráfico
@@ -153,13 +215,14 @@ def plot_equity_curve(df_trades, capital_inicial=10000, title='Curva de Equity')
         # Calcular equity ao longo do tempo
         df_trades = df_trades.sort_values('data')
         df_trades['equity'] = capital_inicial + df_trades['resultado'].cumsum()
+        equity = reduzir_serie(df_trades.set_index('data')['equity'], max_pontos)
         
         # Criar figura
         fig = go.Figure()
         
         # Adicionar linha de equity
-        fig.add_trace(go.Scatter(x=df_trades['data'],
-                                y=df_trades['equity'],
+        fig.add_trace(go.Scatter(x=equity.index,
+                                y=equity,
                                 mode='lines',
                                 name='Equity'))
         
@@ -178,7 +241,8 @@ def plot_equity_curve(df_trades, capital_inicial=10000, title='Curva de Equity')
         logger.error(f"Erro ao criar visualização da curva de equity: {str(e)}")
         raise
 
-def plot_drawdown(df_trades, capital_inicial=10000, title='Drawdown'):
+def plot_drawdown(df_trades, capital_inicial=10000, title='Drawdown',
+                  max_pontos=MAX_PONTOS_PADRAO):
     """
     Cria um gráfico do drawdown ao longo do tempo.
     
@@ -186,6 +250,8 @@ def plot_drawdown(df_trades, capital_inicial=10000, title='Drawdown'):
         df_trades (pd.DataFrame): DataFrame com informações dos trades
         capital_inicial (float): Capital inicial
         title (str): Título do gráfico
+        max_pontos (int or None): Máximo de pontos da curva, reduzida pelo LTTB
+            preservando os extremos (None desenha todos)
         
     Returns:
         plotly.graph_objects.Figure: Figura com o gráfico
@@ -198,13 +264,14 @@ def plot_drawdown(df_trades, capital_inicial=10000, title='Drawdown'):
         df_trades['equity'] = capital_inicial + df_trades['resultado'].cumsum()
         df_trades['max_equity'] = df_trades['equity'].cummax()
         df_trades['drawdown'] = (df_trades['equity'] - df_trades['max_equity']) / df_trades['max_equity']
+        drawdown = reduzir_serie(df_trades.set_index('data')['drawdown'], max_pontos)
         
         # Criar figura
         fig = go.Figure()
         
         # Adicionar área de drawdown
-        fig.add_trace(go.Scatter(x=df_trades['data'],
-                                y=df_trades['drawdown'],
+        fig.add_trace(go.Scatter(x=drawdown.index,
+                                y=drawdown,
                                 fill='tozeroy',
                                 name='Drawdown'))
         
@@ -0,0 +1,269 @@
+"""
+Módulo de avaliação walk-forward.
+Executa janelas móveis de treino -> previsão -> backtest ao longo de todo o
+histórico, reaproveitando os modelos de janelas já calculadas e costurando
+uma curva de patrimônio fora da amostra.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from imblearn.over_sampling import SMOTE
+
+from logger import logger
+from config import MODEL_CONFIG, WALK_FORWARD_CONFIG
+from cache_backtest import CacheBacktest, gerar_chave
+from motor_backtest import executar_estrategia
+
+# Colunas usadas como entrada do modelo
+FEATURES_MODELO = ['open', 'high', 'low', 'close', 'volume', 'rsi', 'macd', 'macd_signal',
+                   'sma_20', 'ema_20', 'bb_upper', 'bb_lower', 'atr', 'volume_change',
+                   'obv', 'adx']
+
+
+def matriz_features(df):
+    """
+    Extrai a matriz de features do modelo, trocando infinitos e NaN por zero.
+
+    Args:
+        df (pd.DataFrame): DataFrame com as colunas de FEATURES_MODELO
+
+    Returns:
+        pd.DataFrame: Matriz de features
+    """
+    return df[FEATURES_MODELO].replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+def gerar_janelas(n_barras, tamanho_treino, tamanho_teste, passo=None):
+    """
+    Gera as janelas walk-forward móveis, posicionadas a partir do início do histórico.
+
+    A janela de treino tem tamanho fixo e avança 'passo' barras por vez.
+    Como as posições partem do início do histórico, novos dados só
+    acrescentam janelas ao final e não deslocam as já calculadas.
+
+    Args:
+        n_barras (int): Total de barras do histórico
+        tamanho_treino (int): Barras de treino por janela
+        tamanho_teste (int): Barras de teste por janela
+        passo (int, optional): Deslocamento entre janelas (padrão: tamanho_teste)
+
+    Returns:
+        list: Tuplas (inicio_treino, inicio_teste, fim_teste)
+    """
+    passo = passo or tamanho_teste
+    janelas = []
+    inicio = 0
+    while inicio + tamanho_treino < n_barras:
+        inicio_teste = inicio + tamanho_treino
+        janelas.append((inicio, inicio_teste, min(inicio_teste + tamanho_teste, n_barras)))
+        inicio += passo
+    return janelas
+
+
+def treinar_janela(X_treino, y_treino, X_teste, parametros_modelo):
+    """
+    Treina o modelo de uma janela e prevê as probabilidades do período de teste.
+
+    Executada nos processos de trabalho; recebe apenas arrays e dicionários.
+
+    Args:
+        X_treino (np.array): Features de treino
+        y_treino (np.array): Classes de treino
+        X_teste (np.array): Features de teste
+        parametros_modelo (dict): Parâmetros do RandomForestClassifier
+
+    Returns:
+        dict: Scaler, modelo treinado e probabilidades de alta no teste
+    """
+    if len(np.unique(y_treino)) < 2:
+        raise ValueError("A janela de treino precisa conter as duas classes.")
+
+    scaler = StandardScaler()
+    X_treino_scaled = scaler.fit_transform(X_treino)
+    sm = SMOTE(random_state=parametros_modelo.get('random_state', 42))
+    X_res, y_res = sm.fit_resample(X_treino_scaled, y_treino)
+
+    modelo = RandomForestClassifier(class_weight='balanced', n_jobs=1, **parametros_modelo)
+    modelo.fit(X_res, y_res)
+    probs = modelo.predict_proba(scaler.transform(X_teste))[:, 1]
+
+    return {'scaler': scaler, 'modelo': modelo, 'probs': probs}
+
+
+class WalkForward:
+    """
+    Orquestrador de backtests walk-forward.
+
+    Cada janela é identificada pelo hash das suas features, classes e
+    parâmetros do modelo; janelas já treinadas são lidas do cache e apenas as
+    novas ou alteradas são treinadas, em paralelo entre processos. O backtest
+    de cada janela passa pelo cache do motor de backtest, então trocar só a
+    estratégia não retreina nenhum modelo.
+
+    Attributes:
+        tamanho_treino (int): Barras de treino por janela
+        tamanho_teste (int): Barras de teste por janela
+        passo (int): Deslocamento entre janelas
+        parametros_modelo (dict): Parâmetros do RandomForestClassifier
+        processos (int or None): Máximo de processos de treino (None usa todos os núcleos)
+        cache (CacheBacktest): Cache dos modelos por janela
+    """
+
+    def __init__(self, tamanho_treino=None, tamanho_teste=None, passo=None,
+                 parametros_modelo=None, processos=None, cache=None):
+        """
+        Inicializa o orquestrador; parâmetros omitidos vêm de WALK_FORWARD_CONFIG.
+
+        Args:
+            tamanho_treino (int, optional): Barras de treino por janela
+            tamanho_teste (int, optional): Barras de teste por janela
+            passo (int, optional): Deslocamento entre janelas
+            parametros_modelo (dict, optional): Parâmetros do RandomForestClassifier
+            processos (int, optional): Máximo de processos de treino
+            cache (CacheBacktest, optional): Cache dos modelos por janela
+        """
+        self.tamanho_treino = tamanho_treino or WALK_FORWARD_CONFIG['tamanho_treino']
+        self.tamanho_teste = tamanho_teste or WALK_FORWARD_CONFIG['tamanho_teste']
+        self.passo = passo or WALK_FORWARD_CONFIG['passo'] or self.tamanho_teste
+        self.parametros_modelo = parametros_modelo or {
+            'n_estimators': MODEL_CONFIG['n_estimators'],
+            'max_depth': MODEL_CONFIG['max_depth'],
+            'min_samples_split': MODEL_CONFIG['min_samples_split'],
+            'random_state': MODEL_CONFIG['random_state']
+        }
+        self.processos = processos if processos is not None else WALK_FORWARD_CONFIG['processos']
+        self.cache = cache or CacheBacktest(
+            max_itens=WALK_FORWARD_CONFIG['max_janelas_memoria'],
+            diretorio=WALK_FORWARD_CONFIG['diretorio_cache']
+        )
+
+    def _treinar_janelas(self, df, janelas):
+        """
+        Obtém os modelos das janelas, treinando em paralelo apenas as ausentes do cache.
+
+        Janelas cujo treino tem uma única classe não são treinadas.
+
+        Returns:
+            list: Resultado de treinar_janela para cada janela, na mesma
+                ordem; None nas janelas não treinadas
+        """
+        X = matriz_features(df).to_numpy(dtype=float)
+        y = df['target_class'].to_numpy()
+
+        modelos = [None] * len(janelas)
+        pendentes = []
+        for k, (inicio, inicio_teste, fim) in enumerate(janelas):
+            if len(np.unique(y[inicio:inicio_teste])) < 2:
+                logger.warning(f"Walk-forward: janela {k} ignorada, treino com uma única classe")
+                continue
+            chave = gerar_chave('walk_forward', X[inicio:inicio_teste], y[inicio:inicio_teste],
+                                X[inicio_teste:fim], self.parametros_modelo)
+            encontrado, valor = self.cache.obter(chave)
+            if encontrado:
+                modelos[k] = valor
+            else:
+                pendentes.append((k, chave))
+
+        logger.info(f"Walk-forward: {len(janelas) - len(pendentes)} janelas do cache, "
+                    f"{len(pendentes)} a treinar")
+
+        if pendentes:
+            with ProcessPoolExecutor(max_workers=self.processos) as executor:
+                futuros = {
+                    k: executor.submit(treinar_janela,
+                                       X[janelas[k][0]:janelas[k][1]],
+                                       y[janelas[k][0]:janelas[k][1]],
+                                       X[janelas[k][1]:janelas[k][2]],
+                                       self.parametros_modelo)
+                    for k, _ in pendentes
+                }
+                for k, chave in pendentes:
+                    modelos[k] = futuros[k].result()
+                    self.cache.guardar(chave, modelos[k])
+
+        return modelos
+
+    def executar(self, df, estrategia, capital_inicial=10000):
+        """
+        Executa o walk-forward completo sobre o histórico.
+
+        Cada janela contribui com um trecho fora da amostra que não se
+        sobrepõe ao das demais: do início do seu teste até o início do teste
+        da janela seguinte (ou o fim do teste, se vier antes). Com passo
+        menor que o teste, a previsão de cada barra vem, portanto, do modelo
+        mais recente treinado antes dela. O backtest de cada janela roda só
+        sobre o seu trecho e posições ainda abertas ao fim dele são
+        descartadas, como no backtest de janela única. Os resultados dos
+        trades estão em unidades de preço e não dependem do capital, então a
+        curva de patrimônio é a soma cumulativa dos resultados dos trechos.
+
+        Janelas cujo treino tem uma única classe não são treinadas: o trecho
+        fica sem previsões (NaN) e sem trades, e a janela é listada em
+        'janelas_ignoradas'.
+
+        Args:
+            df (pd.DataFrame): DataFrame preparado (features, 'target_class' e colunas da estratégia)
+            estrategia (Estrategia): Estratégia do motor de backtest
+            capital_inicial (float): Capital inicial
+
+        Returns:
+            dict: Janelas, resultado do backtest do trecho de cada janela
+                (None nas ignoradas), índices das janelas ignoradas,
+                probabilidades fora da amostra, curva de patrimônio
+                costurada, capital final e retorno total
+        """
+        logger.info("Iniciando walk-forward")
+
+        try:
+            janelas = gerar_janelas(len(df), self.tamanho_treino, self.tamanho_teste, self.passo)
+            if not janelas:
+                raise ValueError("Histórico menor que a janela de treino.")
+
+            modelos = self._treinar_janelas(df, janelas)
+            ignoradas = [k for k, modelo in enumerate(modelos) if modelo is None]
+            if len(ignoradas) == len(janelas):
+                raise ValueError("Nenhuma janela de treino contém as duas classes.")
+
+            inicio_oos = janelas[0][1]
+            fim_oos = janelas[-1][2]
+            probs_oos = np.full(fim_oos - inicio_oos, np.nan)
+            pnl = np.zeros(fim_oos - inicio_oos)
+            resultados = []
+
+            for k, ((inicio, inicio_teste, fim), modelo) in enumerate(zip(janelas, modelos)):
+                if modelo is None:
+                    resultados.append(None)
+                    continue
+                # Trecho próprio da janela: termina onde começa o teste da seguinte
+                fim_trecho = min(fim, janelas[k + 1][1]) if k + 1 < len(janelas) else fim
+                probs = modelo['probs'][:fim_trecho - inicio_teste]
+                resultado = executar_estrategia(df.iloc[inicio_teste:fim_trecho], probs, estrategia,
+                                                capital_inicial=capital_inicial)
+                trades = resultado['trades']
+                probs_oos[inicio_teste - inicio_oos:fim_trecho - inicio_oos] = probs
+                np.add.at(pnl, trades['idx_saida'] + (inicio_teste - inicio_oos), trades['resultado'])
+                resultados.append(resultado)
+
+            indice_oos = df.index[inicio_oos:fim_oos]
+            equity = pd.Series(capital_inicial + np.cumsum(pnl), index=indice_oos, name='equity')
+            capital_final = float(equity.iloc[-1])
+
+            logger.info(f"Walk-forward concluído: {len(janelas)} janelas ({len(ignoradas)} ignoradas), "
+                        f"capital final {capital_final:.2f}")
+            return {
+                'janelas': janelas,
+                'resultados': resultados,
+                'janelas_ignoradas': ignoradas,
+                'probs': pd.Series(probs_oos, index=indice_oos, name='proba_alta'),
+                'equity': equity,
+                'capital_final': capital_final,
+                'retorno_total': (capital_final - capital_inicial) / capital_inicial
+            }
+
+        except Exception as e:
+            logger.error(f"Erro durante o walk-forward: {str(e)}")
+            raise
@@ -1,3 +1,28 @@
+"""
+Loop ao vivo do robô de trading.
+Executa um ativo (executar_robo) ou um universo de ativos dividido entre
+processos (executar_robo_multiativos). Os módulos do robô são importados de
+app/; execute a partir da raiz do projeto:
+
+    python main.py               # um ativo
+    python main.py multiativos   # vários ativos em shards
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from classeRobo import RoboTrading
+from classeConexaoCorretora import ConexaoCorretora
+from agendador_requisicoes import CircuitoAberto
+from buffer_candles import BufferCandles
+from fluxo_mercado import FluxoMercado
+from despacho_ordens import DespachoOrdens
+from executor_multiativos import ExecutorMultiativos
+
+
 # Loop principal do robô de trading
 def executar_robo():
     # Configurações
@@ -19,7 +44,7 @@ def executar_robo():
     probs = robo.treinar_modelo(dados_processados)
 
     # Executar backtest para validação
-    metricas, _ = robo.executar_backtest(dados_processados, probs)
+    metricas, *_ = robo.executar_backtest(dados_processados, probs)
     print(f"Métricas do backtest: {metricas}")
 
     # Verificar se o modelo é bom o suficiente para operar
@@ -27,37 +52,107 @@ def executar_robo():
         print("Modelo não atende aos critérios mínimos. Abortando operações.")
         return
 
+    # Buffer de candles com os indicadores atualizados a cada fechamento e assinatura
+    # do fluxo de mercado (websocket ou polling por 'since'). O buffer recebe os
+    # candles até o penúltimo, de onde o fluxo parte, pois o último pode ainda estar
+    # em formação.
+    buffer = BufferCandles()
+    dados_atuais = corretora.obter_dados_mercado(ativo, timeframe, limite=buffer.capacidade)
+    buffer.carregar(dados_atuais.iloc[:-1])
+    fluxo = FluxoMercado(api_key, api_secret, [ativo], timeframe,
+                         desde={ativo: int(dados_atuais['timestamp'].iloc[-2])})
+    fluxo.iniciar()
+
+    # Ordens saem por uma thread de fundo; o loop não espera a resposta da corretora
+    despacho = DespachoOrdens(corretora)
+    despacho.iniciar()
+
     # Loop de monitoramento do mercado
     posicao_aberta = False
     while True:
         try:
-            # Obter dados atualizados
-            dados_atuais = corretora.obter_dados_mercado(ativo, timeframe, limite=100)
+            # Aguardar o fechamento do próximo candle
+            evento = fluxo.proximo(timeout=60)
+            if evento is None:
+                continue
+            if evento['tipo'] == 'execucao':
+                # Ordem executada ou stop disparado: posições e saldo em cache mudaram
+                corretora.invalidar_estado()
+                ordem = despacho.registrar_execucao(evento['execucao'])
+                # Vendas fecham o trade e atualizam as métricas ao vivo
+                resumo = robo.registrar_execucao(evento['execucao'], ordem.ordem if ordem else None)
+                if resumo:
+                    print(f"Trade fechado | win rate {resumo['win_rate']:.1%} | "
+                          f"drawdown {resumo['drawdown_atual']:.1%} | capital {resumo['capital']:.2f}")
+                continue
+            candle = evento['candle']
+            buffer.adicionar(candle['timestamp'], candle['open'], candle['high'],
+                             candle['low'], candle['close'], candle['volume'])
 
-            # Verificar posições existentes
-            posicoes = corretora.verificar_posicoes_abertas()
-            posicao_aberta = any(p['ativo'] == ativo for p in posicoes)
+            # Verificar posições existentes (em cache até a próxima ordem ou execução)
+            posicoes = corretora.verificar_posicoes()
+            posicao_aberta = any(p['symbol'] == ativo for p in posicoes) or despacho.tem_pendente(ativo)
 
             # Se não tiver posição aberta, procurar por novos sinais
             if not posicao_aberta:
-                sinal = robo.monitorar_mercado(dados_atuais)
+                sinal = robo.monitorar_mercado(buffer, ativo=ativo)
 
                 if sinal:
                     print(f"Sinal gerado: {sinal}")
-                    # Enviar ordem para a corretora
-                    corretora.enviar_ordem(
-                        ativo=sinal['ativo'],
+                    # Enfileirar a ordem; a confirmação chega pelo clientOrderId
+                    ordem = despacho.enviar(
+                        simbolo=sinal['ativo'],
                         tipo='compra',
                         quantidade=sinal['tamanho_posicao'] / sinal['preco_entrada'],
                         preco=sinal['preco_entrada'],
                         stop_loss=sinal['stop_loss'],
                         take_profit=sinal['take_profit']
                     )
-                    print(f"Ordem enviada para {sinal['ativo']} a {sinal['preco_entrada']}")
-
-            # Aguardar próxima verificação
-            time.sleep(60)  # Verificar a cada minuto
+                    ordem.add_done_callback(lambda o: print(
+                        f"Ordem {o.id_cliente} confirmada: {o.result()['orderId']}" if o.exception() is None
+                        else f"Ordem {o.id_cliente} falhou: {o.exception()}"))
+                    print(f"Ordem {ordem.id_cliente} enfileirada para {sinal['ativo']} a {sinal['preco_entrada']}")
 
+        except CircuitoAberto as e:
+            # Corretora fora do ar: aguardar só até o disjuntor liberar a requisição de teste
+            print(f"Corretora indisponível: {e}")
+            time.sleep(e.espera)
         except Exception as e:
+            # Falhas transitórias já foram repetidas pelo agendador da conexão;
+            # o próximo candle segue normalmente
             print(f"Erro no loop principal: {e}")
-            time.sleep(300)  # Esperar 5 minutos em caso de erro
\ No newline at end of file
+
+# Execução ao vivo de vários ativos, divididos entre processos
+def executar_robo_multiativos():
+    # Configurações
+    api_key = 'SUA_API_KEY'
+    api_secret = 'SUA_API_SECRET'
+    ativos = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'JPM']
+    timeframe = '15min'
+    capital_inicial = 10000
+    caminho_modelo = 'modelo_robo.pkl'
+
+    # Treinar e validar o modelo uma vez; cada processo o carrega do arquivo
+    corretora = ConexaoCorretora(api_key, api_secret)
+    robo = RoboTrading(capital_inicial=capital_inicial)
+    dados_processados = robo.preparar_dados(corretora.obter_dados_mercado(ativos[0], timeframe, limite=5000))
+    probs = robo.treinar_modelo(dados_processados)
+    metricas, *_ = robo.executar_backtest(dados_processados, probs)
+    print(f"Métricas do backtest: {metricas}")
+    if metricas['win_rate'] < 0.5 or metricas['profit_factor'] < 1.5:
+        print("Modelo não atende aos critérios mínimos. Abortando operações.")
+        return
+    robo.salvar_modelo(caminho_modelo)
+
+    # Shards em processos; vazão e atraso de cada um são exibidos periodicamente
+    executor = ExecutorMultiativos(api_key, api_secret, ativos, timeframe, caminho_modelo,
+                                   capital_inicial=capital_inicial)
+    executor.executar()
+
+
+if __name__ == '__main__':
+    # O guard é necessário: o executor cria os shards com 'spawn'
+    if sys.argv[1:] == ['multiativos']:
+        executar_robo_multiativos()
+    else:
+        executar_robo()
@@ -0,0 +1,12 @@
+"""
+Configuração dos testes: os módulos do robô são importados de app/, como
+quando os scripts são executados de dentro dessa pasta.
+"""
+
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'app'))
+
+DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
@@ -0,0 +1,62 @@
+"""
+Testes de regressão de calcular_metricas contra as saídas da implementação
+anterior (linha a linha), gravadas em fixtures/metricas_trades.json.
+"""
+
+import json
+import math
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import DIRETORIO_FIXTURES
+from analisar_desempenho import calcular_metricas, analisar_drawdown, analisar_risco
+
+with open(os.path.join(DIRETORIO_FIXTURES, 'metricas_trades.json'), encoding='utf-8') as arquivo:
+    CASOS = json.load(arquivo)['casos']
+
+
+def _trades(caso):
+    trades = pd.DataFrame(caso['trades'])
+    trades['data'] = pd.to_datetime(trades['data'].tolist())
+    return trades
+
+
+def _igual(obtido, esperado, tolerancia=0.0):
+    if isinstance(esperado, str):
+        return pd.Timestamp(obtido) == pd.Timestamp(esperado)
+    if math.isnan(esperado):
+        return math.isnan(obtido)
+    return obtido == esperado or math.isclose(obtido, esperado, rel_tol=tolerancia, abs_tol=tolerancia)
+
+
+@pytest.mark.parametrize('caso', CASOS, ids=[c['nome'] for c in CASOS])
+def test_metricas_iguais_a_implementacao_anterior(caso):
+    metricas = calcular_metricas(_trades(caso), capital_inicial=caso['capital_inicial'])
+
+    for chave, esperado in caso['esperado']['metricas'].items():
+        assert _igual(metricas[chave], esperado), chave
+        assert type(metricas[chave]).__name__ == caso['esperado']['tipos'][chave], chave
+
+
+@pytest.mark.parametrize('caso', CASOS, ids=[c['nome'] for c in CASOS])
+def test_drawdown_e_risco_iguais_a_implementacao_anterior(caso):
+    trades = _trades(caso)
+    metricas = calcular_metricas(trades, capital_inicial=caso['capital_inicial'])
+    separados = {'drawdown': analisar_drawdown(trades),
+                 'risco': analisar_risco(trades, caso['capital_inicial'])}
+
+    for secao in ('drawdown', 'risco'):
+        for chave, esperado in caso['esperado'][secao].items():
+            assert _igual(metricas[secao][chave], esperado, 1e-12), (secao, chave)
+            assert _igual(separados[secao][chave], esperado, 1e-12), (secao, chave)
+
+
+def test_nao_altera_o_dataframe():
+    trades = _trades(CASOS[0])
+    colunas = list(trades.columns)
+    calcular_metricas(trades, capital_inicial=CASOS[0]['capital_inicial'])
+    analisar_drawdown(trades)
+    analisar_risco(trades, CASOS[0]['capital_inicial'])
+    assert list(trades.columns) == colunas
@@ -0,0 +1,111 @@
+"""
+Testes de ConexaoCorretoraAssincrona contra a corretora simulada local
+(servidor_simulado.CorretoraSimulada): assinatura, consultas concorrentes
+sobre o pool de conexões e timeout por requisição.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from classeConexaoAssincrona import ConexaoCorretoraAssincrona
+from servidor_simulado import CorretoraSimulada
+
+SEGREDO = 'segredo-teste'
+SIMBOLOS = [f'ATV{i}' for i in range(10)]
+
+
+class CorretoraContandoConexoes(CorretoraSimulada):
+    """Corretora simulada que registra a conexão TCP de origem de cada requisição."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conexoes = set()
+
+    async def _preparar(self, request):
+        self.conexoes.add(request.transport.get_extra_info('peername'))
+        return await super()._preparar(request)
+
+
+def _executar(teste, **parametros_corretora):
+    """Sobe a corretora simulada no loop do teste e executa 'teste(corretora, url)'."""
+    async def principal():
+        corretora = CorretoraContandoConexoes(SEGREDO, **parametros_corretora)
+        url = await corretora.iniciar()
+        try:
+            return await teste(corretora, url)
+        finally:
+            await corretora.parar()
+    return asyncio.run(principal())
+
+
+def test_assinatura_aceita_e_rejeitada():
+    async def teste(corretora, url):
+        async with ConexaoCorretoraAssincrona('chave', SEGREDO, base_url=url) as conexao:
+            assert await conexao.verificar_posicoes() == []
+            confirmacao = await conexao.enviar_ordem('ATV1', 'compra', 2.0, preco=101.5, stop_loss=99.0)
+            assert confirmacao['status'] == 'FILLED'
+            assert [p['symbol'] for p in await conexao.verificar_posicoes()] == ['ATV1']
+
+        async with ConexaoCorretoraAssincrona('chave', 'outro-segredo', base_url=url) as conexao:
+            with pytest.raises(aiohttp.ClientResponseError) as erro:
+                await conexao.obter_saldo()
+            assert erro.value.status == 401
+
+    _executar(teste)
+
+
+def test_obter_estado_concorrente_no_pool():
+    latencia = 0.2
+
+    async def teste(corretora, url):
+        async with ConexaoCorretoraAssincrona('chave', SEGREDO, base_url=url, max_conexoes=4) as conexao:
+            inicio = time.perf_counter()
+            estado = await conexao.obter_estado(SIMBOLOS, '15min', limite=50)
+            duracao = time.perf_counter() - inicio
+            await conexao.obter_estado(SIMBOLOS, '15min', limite=50)
+
+        # 12 requisições (10 históricos, posições e saldo) em até 4 conexões:
+        # ao menos 3 rodadas de latência, bem menos que as 12 em série
+        assert 3 * latencia <= duracao < 12 * latencia * 0.6
+        # As duas consultas reaproveitam as mesmas conexões do pool
+        assert len(corretora.conexoes) <= 4
+
+        assert list(estado['dados']) == SIMBOLOS
+        for simbolo, dados in estado['dados'].items():
+            esperados = corretora.candles(simbolo, '15min', 50)
+            assert len(dados) == 50
+            assert dados['timestamp'].iloc[-1] == esperados[-1]['timestamp']
+            assert dados['close'].iloc[0] == esperados[0]['close']
+        assert estado['posicoes'] == []
+        assert estado['saldo']['available'] == 10000.0
+
+    _executar(teste, latencia=latencia)
+
+
+def test_timeout_por_requisicao():
+    async def teste(corretora, url):
+        async with ConexaoCorretoraAssincrona('chave', SEGREDO, base_url=url, timeout=5) as conexao:
+            inicio = time.perf_counter()
+            with pytest.raises(asyncio.TimeoutError):
+                await conexao.verificar_posicoes(timeout=0.05)
+            assert time.perf_counter() - inicio < 0.4
+
+            # O timeout padrão da conexão continua valendo nas requisições seguintes
+            assert await conexao.verificar_posicoes() == []
+
+    _executar(teste, latencia=0.5)
+
+
+def test_carga_paginada_sem_desde():
+    async def teste(corretora, url):
+        async with ConexaoCorretoraAssincrona('chave', SEGREDO, base_url=url) as conexao:
+            dados = await conexao.obter_dados_mercado('ATV1', '15min', limite=2500)
+
+        esperados = corretora.candles('ATV1', '15min', 2500)
+        assert dados['timestamp'].tolist() == [c['timestamp'] for c in esperados]
+        assert corretora.contagem['/market/history'] == 3
+
+    _executar(teste)
@@ -0,0 +1,79 @@
+"""
+Testes de CargaHistorico: paginação com 'since' de cargas longas em mercados
+com pausas, sem 'desde' e a partir dele.
+"""
+
+import numpy as np
+import pytest
+
+from decodificar_candles import CargaHistorico
+
+PASSO = 15 * 60 * 1000
+AGORA = 1_760_000_000_000 // PASSO * PASSO + PASSO // 3
+
+
+def _historico_pregao(inicio_historico=None):
+    """
+    Timestamps de candles de 15min só no pregão (14:30 às 21:00 UTC, dias úteis),
+    até o candle corrente de AGORA.
+    """
+    primeiro = AGORA - 400 * 86_400_000 if inicio_historico is None else inicio_historico
+    tempos = np.arange(primeiro // PASSO * PASSO, AGORA + 1, PASSO, dtype=np.int64)
+    minuto_dia = tempos // 60_000 % 1440
+    dia_semana = (tempos // 86_400_000 + 3) % 7  # 1970-01-01 foi quinta-feira
+    return tempos[(minuto_dia >= 870) & (minuto_dia < 1260) & (dia_semana < 5)]
+
+
+def _executar(carga, tempos):
+    """Atende os pedidos da carga como /market/history com 'since' e 'limit'."""
+    pedido = carga.proxima()
+    while pedido is not None:
+        if 'since' in pedido:
+            inicio = np.searchsorted(tempos, pedido['since'])
+            pagina = tempos[inicio:inicio + pedido['limit']]
+        else:
+            pagina = tempos[-pedido['limit']:]
+        carga.receber([{'timestamp': int(t), 'open': 1.0, 'high': 1.0, 'low': 1.0,
+                        'close': 1.0, 'volume': 1.0} for t in pagina])
+        pedido = carga.proxima()
+    return carga.para_dataframe()
+
+
+@pytest.mark.parametrize('limite', [1001, 5000])
+def test_carga_longa_com_pausas_reune_todos_os_candles(limite):
+    tempos = _historico_pregao()
+    carga = CargaHistorico('15min', limite, pagina=1000, agora_ms=AGORA)
+    dados = _executar(carga, tempos)
+
+    assert carga.completa
+    np.testing.assert_array_equal(dados['timestamp'].to_numpy(), tempos[-limite:])
+    # Poucas janelas: a densidade do pregão (~27%) dimensiona o recuo
+    assert carga.requisicoes <= 2 * (limite // 1000 + 1) + 4
+
+
+def test_historico_menor_que_o_limite():
+    tempos = _historico_pregao(inicio_historico=AGORA - 30 * 86_400_000)
+    carga = CargaHistorico('15min', 5000, pagina=1000, agora_ms=AGORA)
+    dados = _executar(carga, tempos)
+
+    assert not carga.completa
+    np.testing.assert_array_equal(dados['timestamp'].to_numpy(), tempos)
+
+
+def test_carga_a_partir_de_desde_nao_recua():
+    tempos = _historico_pregao()
+    desde = int(tempos[-2500])
+    carga = CargaHistorico('15min', 5000, desde=desde, pagina=1000, agora_ms=AGORA)
+    dados = _executar(carga, tempos)
+
+    np.testing.assert_array_equal(dados['timestamp'].to_numpy(), tempos[-2500:])
+    assert carga.requisicoes == 3
+
+
+def test_uma_pagina_sem_desde():
+    tempos = _historico_pregao()
+    carga = CargaHistorico('15min', 300, pagina=1000, agora_ms=AGORA)
+    dados = _executar(carga, tempos)
+
+    np.testing.assert_array_equal(dados['timestamp'].to_numpy(), tempos[-300:])
+    assert carga.requisicoes == 1
@@ -0,0 +1,110 @@
+"""
+Testes de DespachoOrdens contra a corretora simulada local: envio em lote
+assinado e reconciliação pelo clientOrderId de ordens com envio sem resposta.
+"""
+
+import asyncio
+
+import pytest
+import requests
+from aiohttp import web
+
+from classeConexaoCorretora import ConexaoCorretora, gerar_assinatura
+from config import DESPACHO_CONFIG
+from despacho_ordens import DespachoOrdens
+from servidor_simulado import CorretoraSimulada
+
+SEGREDO = 'segredo-teste'
+
+
+class CorretoraInstavel(CorretoraSimulada):
+    """
+    Corretora simulada em que POST /order executa a ordem e demora
+    'atraso_resposta' segundos para responder, ou falha antes de executá-la
+    se 'falhar_envio'.
+    """
+
+    atraso_resposta = 0.0
+    falhar_envio = False
+
+    async def _ordem(self, request):
+        params = await self._preparar(request)
+        if self.falhar_envio:
+            raise web.HTTPBadGateway(reason='Gateway indisponível')
+        confirmacao = self._executar_ordem(params)
+        await asyncio.sleep(self.atraso_resposta)
+        return web.json_response(confirmacao)
+
+
+@pytest.fixture
+def corretora(monkeypatch):
+    monkeypatch.setitem(DESPACHO_CONFIG, 'intervalo_reconciliacao', 0.05)
+    corretora = CorretoraInstavel(SEGREDO)
+    corretora.url = corretora.iniciar_em_thread()
+    yield corretora
+    corretora.parar_thread()
+
+
+def test_assinatura_canonica_de_listas():
+    ordens = [{'symbol': 'ATV1', 'quantity': 1.5, 'side': 'BUY'}]
+    reordenadas = [{'side': 'BUY', 'quantity': 1.5, 'symbol': 'ATV1'}]
+    assert gerar_assinatura(SEGREDO, {'orders': ordens, 'timestamp': 1}) == \
+        gerar_assinatura(SEGREDO, {'timestamp': 1, 'orders': reordenadas})
+
+
+def test_lote_assinado_aceito(corretora):
+    despacho = DespachoOrdens(ConexaoCorretora('chave', SEGREDO, base_url=corretora.url), espera_lote=0.2)
+    despacho.iniciar()
+    ordens = [despacho.enviar(f'ATV{i}', 'compra', 1.5, preco=100.0 + i, stop_loss=90.0) for i in range(3)]
+    confirmacoes = [ordem.result(timeout=5) for ordem in ordens]
+    despacho.parar()
+
+    assert corretora.contagem['/orders/batch'] == 1
+    assert [c['clientOrderId'] for c in confirmacoes] == [o.id_cliente for o in ordens]
+    assert all(c['status'] == 'FILLED' for c in confirmacoes)
+
+
+def test_envio_sem_resposta_reconciliado_sem_duplicar(corretora):
+    corretora.atraso_resposta = 1.0
+    despacho = DespachoOrdens(ConexaoCorretora('chave', SEGREDO, base_url=corretora.url, timeout=0.3))
+    despacho.iniciar()
+    ordem = despacho.enviar('ATV1', 'compra', 2.0, preco=101.0)
+
+    confirmacao = ordem.result(timeout=5)
+    despacho.parar()
+
+    assert confirmacao['clientOrderId'] == ordem.id_cliente
+    assert confirmacao['orderId'] == corretora.ordens[ordem.id_cliente]['orderId']
+    assert [e['clientOrderId'] for e in corretora.execucoes] == [ordem.id_cliente]
+    assert despacho.metricas()['reconciliadas'] == 1
+    assert despacho.metricas()['falhas'] == 0
+
+
+def test_envio_nao_recebido_falha_apos_consulta(corretora):
+    corretora.falhar_envio = True
+    despacho = DespachoOrdens(ConexaoCorretora('chave', SEGREDO, base_url=corretora.url))
+    despacho.iniciar()
+    ordem = despacho.enviar('ATV1', 'compra', 2.0, preco=101.0)
+
+    with pytest.raises(requests.HTTPError):
+        ordem.result(timeout=5)
+    despacho.parar()
+
+    assert corretora.contagem['/order'] >= 2  # envio e consulta
+    assert corretora.execucoes == []
+    assert not despacho.tem_pendente('ATV1')
+
+
+def test_ordem_incerta_continua_pendente_ate_a_execucao(monkeypatch):
+    monkeypatch.setitem(DESPACHO_CONFIG, 'intervalo_reconciliacao', 60)
+    despacho = DespachoOrdens(conexao=None)
+    ordem = despacho.enviar('ATV1', 'compra', 2.0, preco=101.0)
+    despacho._falha_envio([ordem], requests.Timeout('sem resposta'))
+
+    assert despacho.tem_pendente('ATV1')
+    assert despacho.metricas()['incertas'] == 1
+
+    despacho.registrar_execucao({'orderId': 'X-1', 'clientOrderId': ordem.id_cliente, 'symbol': 'ATV1',
+                                 'side': 'BUY', 'quantity': 2.0, 'price': 101.0})
+    assert ordem.result(timeout=0)['orderId'] == 'X-1'
+    assert not despacho.tem_pendente('ATV1')
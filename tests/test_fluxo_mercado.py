@@ -0,0 +1,93 @@
+"""
+Testes de FluxoMercado contra a corretora simulada local: entrega dos
+candles em ordem e sem repetição, fallback do websocket para o polling e
+retomada a partir de 'desde'.
+"""
+
+import time
+
+import pytest
+
+from config import FLUXO_CONFIG
+from fluxo_mercado import FluxoMercado
+from servidor_simulado import CorretoraSimulada
+
+SEGREDO = 'segredo-teste'
+SIMBOLOS = ['ATV1', 'ATV2']
+TIMEFRAME = '1s'
+
+
+@pytest.fixture
+def corretora(monkeypatch):
+    """Corretora simulada em thread própria e fluxo com esperas curtas."""
+    monkeypatch.setitem(FLUXO_CONFIG, 'folga_fechamento', 0.1)
+    monkeypatch.setitem(FLUXO_CONFIG, 'intervalo_polling', 0.1)
+    corretora = CorretoraSimulada(SEGREDO, intervalo_ws=0.05)
+    corretora.url = corretora.iniciar_em_thread()
+    yield corretora
+    corretora.parar_thread()
+
+
+def _coletar(fluxo, por_simbolo, prazo=8.0):
+    """Candles entregues pelo fluxo até 'por_simbolo' de cada ativo (ou o prazo)."""
+    candles = {simbolo: [] for simbolo in fluxo.simbolos}
+    limite = time.monotonic() + prazo
+    fluxo.iniciar()
+    try:
+        while min(map(len, candles.values())) < por_simbolo and time.monotonic() < limite:
+            evento = fluxo.proximo(timeout=0.5)
+            if evento is not None and evento['tipo'] == 'candle':
+                candles[evento['simbolo']].append(evento)
+    finally:
+        fluxo.parar()
+    return candles
+
+
+def _verificar_sequencia(corretora, eventos, primeiro=None):
+    """Candles consecutivos, sem repetição, iguais aos da corretora e já fechados."""
+    timestamps = [e['candle']['timestamp'] for e in eventos]
+    assert timestamps == list(range(timestamps[0], timestamps[0] + 1000 * len(timestamps), 1000))
+    if primeiro is not None:
+        assert timestamps[0] == primeiro
+    for evento in eventos:
+        esperado = corretora.candles(evento['simbolo'], TIMEFRAME, 1, desde=evento['candle']['timestamp'])[0]
+        assert evento['candle']['timestamp'] == esperado['timestamp']
+        assert evento['candle']['close'] == pytest.approx(esperado['close'])
+        assert evento['candle']['timestamp'] + 1000 <= time.time() * 1000
+
+
+def test_websocket_entrega_em_ordem_sem_repeticao(corretora):
+    fluxo = FluxoMercado('chave', SEGREDO, SIMBOLOS, TIMEFRAME, base_url=corretora.url, modo='websocket')
+    candles = _coletar(fluxo, 3)
+
+    for simbolo in SIMBOLOS:
+        assert len(candles[simbolo]) >= 3
+        assert {e['origem'] for e in candles[simbolo]} == {'websocket'}
+        _verificar_sequencia(corretora, candles[simbolo])
+    assert corretora.contagem.get('/market/history', 0) == 0
+
+
+def test_fallback_do_websocket_para_polling(corretora, monkeypatch):
+    monkeypatch.setitem(FLUXO_CONFIG, 'caminho_ws', '/inexistente')
+    fluxo = FluxoMercado('chave', SEGREDO, SIMBOLOS, TIMEFRAME, base_url=corretora.url, modo='auto')
+    candles = _coletar(fluxo, 3)
+
+    for simbolo in SIMBOLOS:
+        assert len(candles[simbolo]) >= 3
+        assert {e['origem'] for e in candles[simbolo]} == {'polling'}
+        _verificar_sequencia(corretora, candles[simbolo])
+    assert corretora.contagem['/market/history'] > 0
+
+
+def test_polling_retoma_a_partir_de_desde(corretora):
+    # Último candle processado há 6 candles: os fechados desde então chegam
+    # logo na primeira consulta, e os seguintes a cada fechamento
+    desde = {simbolo: corretora.candles(simbolo, TIMEFRAME, 8)[0]['timestamp'] for simbolo in SIMBOLOS}
+    fluxo = FluxoMercado('chave', SEGREDO, SIMBOLOS, TIMEFRAME, base_url=corretora.url,
+                         modo='polling', desde=desde)
+    candles = _coletar(fluxo, 9)
+
+    for simbolo in SIMBOLOS:
+        assert len(candles[simbolo]) >= 9
+        _verificar_sequencia(corretora, candles[simbolo], primeiro=desde[simbolo] + 1000)
+        assert fluxo.ultimo_fechado[(simbolo, TIMEFRAME)] == candles[simbolo][-1]['candle']['timestamp']
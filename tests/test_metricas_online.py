@@ -0,0 +1,78 @@
+"""
+Testes do acumulador de métricas ao vivo: mesmas definições de
+metricas_retornos e alimentação a partir das execuções da corretora.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from analisar_desempenho import metricas_retornos
+from metricas_online import MetricasOnline
+
+
+def _acumular(resultados, capital_inicial, limiar=1e-6):
+    """
+    Registra os resultados no acumulador e devolve também os retornos
+    equivalentes (resultado / patrimônio antes do trade).
+    """
+    metricas = MetricasOnline(capital_inicial, limiar=limiar)
+    retornos = []
+    for resultado in resultados:
+        retornos.append(resultado / metricas.capital)
+        metricas.registrar(resultado)
+    return metricas, np.array(retornos)
+
+
+@pytest.mark.parametrize('semente', range(5))
+def test_igual_a_metricas_retornos(semente):
+    rng = np.random.default_rng(semente)
+    resultados = rng.normal(5, 120, 200)
+    resultados[::17] = 1e-5  # abaixo do limiar, ignorados nos dois
+    metricas, retornos = _acumular(resultados, 10000)
+
+    lote = metricas_retornos(retornos, capital_inicial=10000)
+    resumo = metricas.resumo()
+    assert resumo['total_trades'] == lote['total_trades']
+    for chave in ('win_rate', 'profit_factor', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio'):
+        assert math.isclose(resumo[chave], lote[chave], rel_tol=1e-9, abs_tol=1e-12), chave
+
+
+def test_sem_perdas():
+    metricas, retornos = _acumular([10.0, 20.0, 5.0], 1000)
+    lote = metricas_retornos(retornos, capital_inicial=1000)
+    assert metricas.profit_factor == lote['profit_factor'] == float('inf')
+    assert metricas.sortino_ratio == lote['sortino_ratio'] == 0
+    assert metricas.max_drawdown == lote['max_drawdown'] == 0
+
+
+def test_estado_restaurado():
+    metricas, _ = _acumular([50.0, -20.0, 35.0], 10000)
+    restaurado = MetricasOnline.de_dict(metricas.para_dict())
+    restaurado.registrar(-10.0)
+    metricas.registrar(-10.0)
+    assert restaurado.resumo() == metricas.resumo()
+
+
+def test_execucoes_fecham_trades():
+    from classeRobo import RoboTrading
+
+    robo = RoboTrading(capital_inicial=10000)
+    ordem = {'stop_loss': 95.0, 'take_profit': 110.0}
+    compra = {'symbol': 'AAPL', 'side': 'COMPRA', 'quantity': 10.0, 'price': 100.0, 'timestamp': 1_700_000_000_000}
+    assert robo.registrar_execucao(compra, ordem) is None
+
+    venda = {'symbol': 'AAPL', 'side': 'SELL', 'quantity': 10.0, 'price': 110.5, 'timestamp': 1_700_000_900_000}
+    resumo = robo.registrar_execucao(venda)
+    assert resumo['total_trades'] == 1
+    assert resumo['capital'] == pytest.approx(10105.0)
+
+    trade = robo.historico_trades.trades[-1]
+    assert trade['resultado'] == pytest.approx(105.0)
+    assert trade['tipo_saida'] == 1  # take_profit
+    assert trade['data_saida'] == np.datetime64(1_700_000_900_000, 'ms')
+
+    # Venda sem entrada conhecida não gera trade
+    assert robo.registrar_execucao(venda) is None
+    assert robo.metricas_online.total_trades == 1